@@ -0,0 +1,62 @@
+import sys
+import json
+import argparse
+
+# So sánh hai kết quả của benchmarks/suite.py (thường là hai commit chạy trên cùng một máy)
+# In các chỉ số của hai lần chạy và tỉ lệ sau / trước (< 1 là nhanh hơn hoặc nhỏ hơn)
+
+def load(file_path):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# Các chỉ số có thể so sánh của một lần chạy: {tên chỉ số: giá trị}
+def metrics(result):
+    values = {}
+    for dataset, record in result["mdh"].items():
+        values[f"mdh {dataset} seconds"] = record["seconds"]
+    for record in result["indexes"]:
+        tag = f"{record['method']} M={record['M']} m={record['m']} p={record['p']}"
+        values[f"{tag} build seconds"] = record["build_seconds"]
+        values[f"{tag} kdtree seconds"] = record["kdtree_array_seconds"]
+        for kind, size in record["size_bytes"].items():
+            values[f"{tag} {kind} bytes"] = size
+        for engine, report in record["queries"].items():
+            for key in ("p50_ms", "p99_ms"):
+                values[f"{tag} {engine} {key}"] = report["latency"].get(key)
+        if "knn" in record:
+            values[f"{tag} knn p50_ms"] = record["knn"]["latency"].get("p50_ms")
+    return values
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark results of benchmarks/suite.py")
+    parser.add_argument("before", type=str, help="JSON result of the baseline run")
+    parser.add_argument("after", type=str, help="JSON result of the run to compare")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    for key in ("hostname", "machine", "cpu_count", "python", "numpy"):
+        if before["metadata"].get(key) != after["metadata"].get(key):
+            print(f"CẢNH BÁO: {key} khác nhau ({before['metadata'].get(key)} / {after['metadata'].get(key)}), kết quả không so sánh được trực tiếp")
+    run_args = lambda meta: {key: value for key, value in meta.get("args", {}).items() if key != "output"}
+    if run_args(before["metadata"]) != run_args(after["metadata"]):
+        print("CẢNH BÁO: hai lần chạy dùng tham số khác nhau")
+    for name, result in (("trước", before), ("sau", after)):
+        meta = result["metadata"]
+        print(f"{name}: {meta.get('commit')}{' (có thay đổi chưa commit)' if meta.get('dirty') else ''} {meta.get('timestamp')}")
+
+    old, new = metrics(before), metrics(after)
+    width = max((len(key) for key in old), default=10)
+    print(f"\n{'chỉ số':<{width}} {'trước':>12} {'sau':>12} {'sau/trước':>10}")
+    for key in old:
+        if key not in new or old[key] is None or new[key] is None:
+            continue
+        ratio = new[key] / old[key] if old[key] else float('nan')
+        print(f"{key:<{width}} {old[key]:>12.4g} {new[key]:>12.4g} {ratio:>10.3f}")
+
+    mismatches = sum(engine["mismatches"] for record in after["indexes"] for engine in record["queries"].values())
+    if mismatches:
+        print(f"\nCẢNH BÁO: {mismatches} truy vấn có kết quả khác với phép quét toàn bộ")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
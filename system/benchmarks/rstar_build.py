@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+# Thêm đường dẫn để nhập các module cần thiết
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rstar_tree.rstartree as rstartree
+import rstar_tree.rectangle as rct
+
+# Sinh các điểm ngẫu nhiên có dạng (id, [x, y, z, alpha, beta]) giống dữ liệu MDH
+def generate_points(n, seed=42):
+    rng = random.Random(seed)
+    return [(i, [rng.random(), rng.random(), rng.random(), rng.randint(0, 10), rng.randint(0, 10)]) for i in range(n)]
+
+# Chiều cao của cây (số cấp từ gốc đến lá)
+def tree_height(rt):
+    height = 1
+    while not rt.is_leaf:
+        rt = rt.children[0]
+        height += 1
+    return height
+
+# Đo thời gian chèn từng điểm, gom theo từng đợt `window` điểm
+def benchmark_build(n, M, m, p, window, seed=42):
+    pts = generate_points(n, seed)
+    starting = {k: (v[0:3], v[3:5]) for k, v in pts[0:M-1]}
+    cursor = rstartree.RTCursor(rstartree.RStarTree(children=[], point_data=starting, is_leaf=True), M=M, m=m, p=p)
+
+    rows = []
+    start = time.perf_counter()
+    for count, (k, v) in enumerate(pts[M-1:], start=M):
+        cursor.insert((k, v[0:3]), v[3:5])
+        if count % window == 0:
+            elapsed = time.perf_counter() - start
+            rows.append((count, tree_height(cursor.root), elapsed / window * 1e6))
+            start = time.perf_counter()
+    return rows
+
+# Chất lượng cây: số lá, tổng thể tích các lá và số nút trung bình được duyệt bởi các truy vấn cửa sổ
+def tree_quality(rt, windows):
+    leaves, _ = rstartree.window_query(rt, rct.Rectangle([0.0, 0.0, 0.0], [1.0, 1.0, 1.0]))
+    volume = sum(leaf.key.volume() for leaf in leaves)
+    visited = sum(rstartree.window_query(rt, window)[1] for window in windows) / len(windows)
+    return len(leaves), volume, visited
+
+# Đo thời gian chèn thêm `append` điểm vào cây đã có `n` điểm: từng điểm một (insert)
+# và theo từng lô `batch` điểm (insert_many), cùng chất lượng của hai cây thu được
+def benchmark_append(n, append, batch, M, m, p, seed=42):
+    pts = generate_points(n + append, seed)
+    rng = random.Random(seed)
+    windows = []
+    for _ in range(200):
+        lower = [rng.random() * 0.9 for _ in range(3)]
+        windows.append(rct.Rectangle(lower, [x + 0.1 for x in lower]))
+
+    rows = []
+    for name in ("insert", "insert_many"):
+        cursor = rstartree.create_tree_from_pts_bulk(pts[:n], M=M, m=m, p=p, print_output=False)
+        start = time.perf_counter()
+        if name == "insert":
+            for k, v in pts[n:]:
+                cursor.insert((k, v[0:3]), v[3:5])
+        else:
+            for i in range(n, n + append, batch):
+                cursor.insert_many(pts[i:i+batch])
+        elapsed = time.perf_counter() - start
+        rows.append((name, elapsed / append * 1e6, cursor.counters["choose_subtree_levels"]) + tree_quality(cursor.root, windows))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark R*-tree build time")
+    parser.add_argument("--n", type=int, default=20000, help="number of points to insert")
+    parser.add_argument("--M", type=int, default=8, help="maximum number of children")
+    parser.add_argument("--m", type=int, default=3, help="minimum number of children")
+    parser.add_argument("--p", type=int, default=2, help="number of points reinserted on overflow")
+    parser.add_argument("--window", type=int, default=2000, help="number of inserts per measurement")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--append", type=int, default=0, help="number of points appended to a tree of n points, one by one and with insert_many")
+    parser.add_argument("--batch", type=int, default=10000, help="batch size of insert_many")
+    args = parser.parse_args()
+
+    if args.append:
+        rows = benchmark_append(args.n, args.append, args.batch, args.M, args.m, args.p, args.seed)
+        print(f"{'method':>12} {'us/point':>9} {'descents':>9} {'leaves':>7} {'leaf volume':>12} {'nodes/query':>12}")
+        for name, us, levels, leaves, volume, visited in rows:
+            print(f"{name:>12} {us:>9.1f} {levels:>9} {leaves:>7} {volume:>12.4f} {visited:>12.1f}")
+        return
+
+    rows = benchmark_build(args.n, args.M, args.m, args.p, args.window, args.seed)
+
+    # Chi phí mỗi lần chèn phải tăng theo chiều cao của cây, không theo số điểm
+    print(f"{'points':>10} {'height':>7} {'us/insert':>10}")
+    for count, height, us in rows:
+        print(f"{count:>10} {height:>7} {us:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import subprocess
+import contextlib
+import numpy as np
+
+# Thêm đường dẫn để nhập các module cần thiết
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rstar_tree.rstartree as rstartree
+import rstar_tree.rectangle as rct
+import instrument.instrument as instrument
+from mdh.mdh import factorize_triples, encode_triples
+from mdh.stream import iter_triples, is_rdf_file
+from rstar_tree.rtvis_3d import save_rstar_tree
+from rstar_tree.pagefile import write_page_file, PagedRStarTree
+from kdtree.kdtree import process_rtree_json, load_array_kd_trees
+from kdtree.search import load_kdtrees, refine_phase
+from query.query import filter_phase, run_paged
+from query.knn import k_nearest
+
+# Bộ benchmark chạy offline trên dữ liệu tổng hợp hoặc dữ liệu đã lưu (../data/LUBM_Data/<data>):
+# thông lượng MDH, thời gian xây R*-tree theo (M, m, p) và cách xây, thời gian xây
+# cây k-d, kích thước chỉ mục đã lưu, độ trễ truy vấn (phân vị) và kiểm tra kết quả
+# truy vấn với phép quét toàn bộ (brute force). Kết quả được ghi thành JSON kèm
+# thông tin commit và máy để so sánh hai commit trên cùng một máy (benchmarks/compare.py).
+
+# Các dạng mẫu truy vấn: 1 là vị trí ràng buộc (s, p, o), 0 là biến
+PATTERN_SHAPES = ("100", "010", "001", "110", "011", "101", "111")
+
+PREDICATES = ["type", "name", "emailAddress", "telephone", "memberOf", "worksFor", "subOrganizationOf",
+              "takesCourse", "teacherOf", "advisor", "publicationAuthor", "undergraduateDegreeFrom"]
+
+# Sinh n bộ ba (subj, pred, obj) đã nén URI có dạng gần giống LUBM: thực thể được chọn
+# theo phân phối lệch (một số ít thực thể xuất hiện rất nhiều lần)
+def generate_triples(n, seed=42):
+    rng = random.Random(seed)
+    n_entities = max(10, n // 4)
+    entity = lambda prefix: f"{prefix}{int(n_entities * rng.random() ** 2)}"
+    triples = []
+    for _ in range(n):
+        pred = rng.choice(PREDICATES)
+        if pred == "type":
+            obj = rng.choice(["GraduateStudent", "UndergraduateStudent", "FullProfessor", "Course", "Department"])
+        else:
+            obj = entity("Entity")
+        triples.append((entity("Entity"), pred, obj))
+    return triples
+
+# Đọc các bộ ba của bộ dữ liệu đã lưu, theo từng tệp
+def stored_triples(data):
+    rdf_directory = "../data/LUBM_Data/" + data
+    return {file_name: list(iter_triples(os.path.join(rdf_directory, file_name)))
+            for file_name in sorted(os.listdir(rdf_directory)) if is_rdf_file(file_name)}
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def percentiles(seconds):
+    ms = np.asarray(seconds) * 1e3
+    if len(ms) == 0:
+        return {}
+    return {
+        "count": len(ms),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p90_ms": float(np.percentile(ms, 90)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+    }
+
+def git(*args):
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Thông tin để so sánh hai lần chạy: commit, máy, phiên bản Python/NumPy
+def metadata(args):
+    status = git("status", "--porcelain")
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git("rev-parse", "HEAD"),
+        "branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "hostname": platform.node(),
+        "argv": sys.argv,
+        "args": vars(args),
+    }
+
+def tree_stats(rt):
+    height, nodes, leaves = 0, 0, 0
+    stack = [(rt, 1)]
+    while stack:
+        node, level = stack.pop()
+        nodes += 1
+        height = max(height, level)
+        if node.is_leaf:
+            leaves += 1
+        else:
+            stack.extend((child, level + 1) for child in node.children)
+    return {"height": height, "nodes": nodes, "leaves": leaves}
+
+def build_tree(points, M, m, p, method):
+    pts_tuples = list(enumerate(points.tolist()))
+    if method == "insert":
+        return rstartree.create_tree_from_pts(pts_tuples, M=M, m=m, p=p, print_output=False)
+    return rstartree.create_tree_from_pts_bulk(pts_tuples, M=M, m=m, p=p, method=method, print_output=False)
+
+# Sinh các truy vấn từ chính các bộ ba đã lưu: với mỗi dạng mẫu, vị trí ràng buộc lấy
+# tọa độ của một bộ ba ngẫu nhiên (luôn có ít nhất một kết quả)
+def generate_queries(points, n_queries, seed=42):
+    rng = random.Random(seed)
+    queries = []
+    for k in range(n_queries):
+        shape = PATTERN_SHAPES[k % len(PATTERN_SHAPES)]
+        row = points[rng.randrange(len(points))]
+        minima = [float(row[i]) if shape[i] == "1" else 0.0 for i in range(3)]
+        maxima = [float(row[i]) if shape[i] == "1" else 1.0 for i in range(3)]
+        queries.append((shape, (minima, maxima)))
+    return queries
+
+# Kết quả đúng của một truy vấn hộp: quét toàn bộ các điểm
+def brute_force(points, box):
+    minima, maxima = box
+    mask = np.all((points[:, :3] >= minima) & (points[:, :3] <= maxima), axis=1)
+    return set(map(tuple, points[mask].tolist()))
+
+def brute_force_knn(points, point, k):
+    axes = [i for i, c in enumerate(point) if c is not None]
+    target = np.array([point[i] for i in axes])
+    dist = np.sqrt(((points[:, axes] - target) ** 2).sum(axis=1))
+    return np.sort(dist)[:k].tolist()
+
+# Đo độ trễ của từng cách trả lời truy vấn và so sánh kết quả với phép quét toàn bộ
+def run_queries(engines, points, queries):
+    latencies = {name: [] for name in engines}
+    by_shape = {name: {} for name in engines}
+    mismatches = {name: 0 for name in engines}
+    for shape, box in queries:
+        expected = brute_force(points, box)
+        for name, engine in engines.items():
+            result, seconds = timed(engine, box)
+            latencies[name].append(seconds)
+            by_shape[name].setdefault(shape, []).append(seconds)
+            if set(map(tuple, result)) != expected:
+                mismatches[name] += 1
+    report = {name: {"latency": percentiles(latencies[name]),
+                     "by_shape": {shape: percentiles(s) for shape, s in sorted(by_shape[name].items())},
+                     "mismatches": mismatches[name]} for name in engines}
+    return report
+
+def run_knn_queries(rtrees, points, queries, k):
+    latencies = []
+    mismatches = 0
+    for shape, (minima, maxima) in queries:
+        point = [minima[i] if shape[i] == "1" else None for i in range(3)]
+        result, seconds = timed(k_nearest, rtrees, point, k)
+        latencies.append(seconds)
+        expected = brute_force_knn(points, point, k)
+        if not np.allclose([dist for dist, _ in result], expected, rtol=0, atol=1e-12):
+            mismatches += 1
+    return {"k": k, "latency": percentiles(latencies), "mismatches": mismatches}
+
+def benchmark_mdh(datasets, repeat):
+    results = {}
+    encoded = {}
+    for name, triples in datasets.items():
+        runs = []
+        for _ in range(repeat):
+            (terms, ids), factorize_seconds = timed(factorize_triples, triples)
+            (points, _), encode_seconds = timed(encode_triples, terms, ids)
+            runs.append(factorize_seconds + encode_seconds)
+        encoded[name] = points
+        results[name] = {
+            "triples": len(triples),
+            "entities": len(terms),
+            "seconds": min(runs),
+            "runs": runs,
+            "triples_per_second": len(triples) / min(runs) if min(runs) > 0 else None,
+        }
+    return results, encoded
+
+# Xây R*-tree, cây k-d, các file chỉ mục cho một cấu hình và đo truy vấn trên chúng
+def benchmark_index(points, M, m, p, method, queries, knn_k, directory, repeat):
+    runs = []
+    for _ in range(repeat):
+        cursor, seconds = timed(build_tree, points, M, m, p, method)
+        runs.append(seconds)
+    record = {"M": M, "m": m, "p": p, "method": method, "build_seconds": min(runs), "build_runs": runs}
+    record.update(tree_stats(cursor.root))
+    record["counters"] = dict(cursor.counters)
+
+    tag = f"{method}_M{M}_m{m}_p{p}"
+    json_path = os.path.join(directory, f"{tag}.json")
+    kd_json_path = os.path.join(directory, f"kdtree_{tag}.json")
+    page_path = os.path.join(directory, f"{tag}.rtp")
+    with contextlib.redirect_stdout(None):
+        _, record["save_json_seconds"] = timed(save_rstar_tree, cursor.root, json_path)
+        _, record["kdtree_json_seconds"] = timed(process_rtree_json, json_path, kd_json_path, False, False)
+        _, record["kdtree_array_seconds"] = timed(process_rtree_json, json_path, kd_json_path, False, True)
+    _, record["page_file_seconds"] = timed(write_page_file, cursor.root, page_path)
+    record["size_bytes"] = {
+        "rstar_tree_json": os.path.getsize(json_path),
+        "kdtree_json": os.path.getsize(kd_json_path),
+        "kdtree_npz": os.path.getsize(kd_json_path.replace('.json', '.npz')),
+        "pages": os.path.getsize(page_path),
+    }
+
+    kdtrees_nodes = load_kdtrees(kd_json_path, as_nodes=True)
+    kdtrees_array = load_array_kd_trees(kd_json_path.replace('.json', '.npz'))
+    root = cursor.root
+
+    def in_memory(box):
+        leaves, _ = rstartree.window_query(root, rct.Rectangle(*box))
+        minima, maxima = box
+        return [tuple(coords) + tuple(extend) for leaf in leaves for coords, extend in leaf.points.values()
+                if all(minima[i] <= coords[i] <= maxima[i] for i in range(3))]
+
+    def json_nodes(box):
+        kdtree_ids, _ = filter_phase(rtree_data, box)
+        return refine_phase(kdtrees_nodes, kdtree_ids, box)
+
+    def json_array(box):
+        kdtree_ids, _ = filter_phase(rtree_data, box)
+        return refine_phase(kdtrees_array, kdtree_ids, box)
+
+    with PagedRStarTree(page_path) as paged_tree:
+        engines = {
+            "rtcursor": in_memory,
+            "json_kdtree": json_nodes,
+            "json_kdtree_array": json_array,
+            "pages": lambda box: run_paged(paged_tree, box)[0],
+        }
+        record["queries"] = run_queries(engines, points, queries)
+    if knn_k:
+        record["knn"] = run_knn_queries([(rtree_data, kdtrees_nodes)], points, queries, knn_k)
+    return record
+
+def parse_configs(configs):
+    return [tuple(int(v) for v in config.split(",")) for config in configs.split()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the mdh, r*-tree, k-d tree and query stages")
+    parser.add_argument("--data", type=str, default=None, help="use the rdf files in ../data/LUBM_Data/<data> instead of synthetic triples")
+    parser.add_argument("--n", type=int, default=20000, help="number of synthetic triples")
+    parser.add_argument("--configs", type=str, default="4,2,1 8,3,2 32,12,10", help="space separated M,m,p settings")
+    parser.add_argument("--methods", type=str, default="insert,str,hilbert", help="comma separated build methods: insert, str, hilbert")
+    parser.add_argument("--queries", type=int, default=140, help="number of queries, spread evenly over the pattern shapes")
+    parser.add_argument("--knn", type=int, default=10, help="k of the k-nearest-neighbour queries, 0 to skip")
+    parser.add_argument("--repeat", type=int, default=1, help="number of runs of each build, the fastest one is reported")
+    parser.add_argument("--seed", type=int, default=42, help="random seed of the synthetic data and the queries")
+    parser.add_argument("--output", type=str, default=None, help="path of the JSON result (default storage/benchmarks/<time>_<commit>.json)")
+    args = parser.parse_args()
+
+    # các dòng in theo từng bộ ba / từng nút không được tính vào thời gian đo
+    instrument.set_log_level("warning")
+
+    result = {"metadata": metadata(args)}
+    if args.data:
+        datasets = stored_triples(args.data)
+    else:
+        datasets = {f"synthetic_{args.n}": generate_triples(args.n, args.seed)}
+
+    print("MDH...")
+    result["mdh"], encoded = benchmark_mdh(datasets, args.repeat)
+
+    # các chỉ mục được xây trên tệp lớn nhất
+    name = max(encoded, key=lambda k: len(encoded[k]))
+    points = encoded[name]
+    queries = generate_queries(points, args.queries, args.seed)
+    result["index_dataset"] = {"name": name, "triples": len(points)}
+    result["indexes"] = []
+    with tempfile.TemporaryDirectory() as directory:
+        for M, m, p in parse_configs(args.configs):
+            for method in args.methods.split(","):
+                print(f"{method} M={M} m={m} p={p}...")
+                result["indexes"].append(benchmark_index(points, M, m, p, method, queries, args.knn, directory, args.repeat))
+
+    commit = (result["metadata"]["commit"] or "unknown")[:10]
+    output = args.output or f"storage/benchmarks/{time.strftime('%Y%m%d_%H%M%S')}_{commit}.json"
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=4)
+
+    print(f"\n{'dataset':>24} {'triples':>9} {'triples/s':>12}")
+    for dataset, record in result["mdh"].items():
+        print(f"{dataset:>24} {record['triples']:>9} {record['triples_per_second'] or 0:>12.0f}")
+    print(f"\n{'index':>22} {'build s':>9} {'height':>7} {'pages KB':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    failed = False
+    for record in result["indexes"]:
+        tag = f"{record['method']} {record['M']},{record['m']},{record['p']}"
+        pages = record["queries"]["pages"]["latency"]
+        errors = sum(engine["mismatches"] for engine in record["queries"].values()) + record.get("knn", {}).get("mismatches", 0)
+        failed = failed or errors > 0
+        print(f"{tag:>22} {record['build_seconds']:>9.3f} {record['height']:>7} {record['size_bytes']['pages'] / 1024:>9.1f} "
+              f"{pages.get('p50_ms', 0):>8.3f} {pages.get('p99_ms', 0):>8.3f} {errors:>7}")
+    print(f"\nKết quả benchmark đã được lưu vào file: {output}")
+    if failed:
+        # kết quả truy vấn khác với phép quét toàn bộ
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import tracemalloc
+import contextlib
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Đo đạc các bước của main.py: thời gian và bộ nhớ đỉnh theo từng bước, từng tệp,
+# các bộ đếm (ví dụ RTCursor.counters) và, khi bật --profile, cProfile/tracemalloc.
+# Kết quả được ghi thành báo cáo JSON bởi write_report.
+# Khi chưa gọi start(), stage/track_file/add_counters không làm gì, nên các hàm
+# run_* vẫn dùng được trực tiếp (ví dụ từ benchmarks/).
+
+# Mức log: các dòng in theo từng bộ ba / từng nút chỉ được in ở mức "debug"
+LOG_LEVELS = ("debug", "info", "warning")
+_log_level = 0
+
+def set_log_level(level):
+    global _log_level
+    _log_level = LOG_LEVELS.index(level)
+
+def debug_enabled():
+    return _log_level == 0
+
+# Bộ nhớ thường trú đỉnh của tiến trình (byte), None nếu không đo được
+def max_rss_bytes():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux trả về KiB, macOS trả về byte
+    return rss if sys.platform == "darwin" else rss * 1024
+
+# Các hàm tốn thời gian nhất (theo thời gian tích lũy) của một lần chạy cProfile
+def top_functions(profiler, limit=25):
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [{
+        "function": f"{os.path.basename(file_name)}:{line}({name})",
+        "calls": nc,
+        "tottime": round(tt, 6),
+        "cumtime": round(ct, 6),
+    } for (file_name, line, name), (cc, nc, tt, ct, callers) in rows]
+
+class Profiler:
+    def __init__(self, profile=False):
+        """
+        Collects one record per pipeline stage, each with its wall time,
+        peak memory, counters and per-file records. With profile=True every
+        stage also runs under cProfile and tracemalloc.
+        """
+        self.profile = profile
+        self.started = time.time()
+        self.stages = []
+        self._profiles = {}
+        self._stage = None
+        self._record = None
+        self._stage_peak = 0
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        record = {"stage": name, "files": []}
+        self.stages.append(record)
+        self._stage = self._record = record
+        profiler = None
+        if self.profile:
+            tracemalloc.start()
+            self._stage_peak = 0
+            profiler = cProfile.Profile()
+            profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                record["top_functions"] = top_functions(profiler)
+                self._profiles[name] = profiler
+                record["peak_traced_bytes"] = max(self._stage_peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+            record["max_rss_bytes"] = max_rss_bytes()
+            self._stage = self._record = None
+
+    @contextlib.contextmanager
+    def track_file(self, name):
+        if self._stage is None:
+            yield None
+            return
+        record = {"file": name}
+        self._stage["files"].append(record)
+        self._record = record
+        if self.profile:
+            # đỉnh của bước được giữ lại trước khi đặt lại đỉnh cho tệp
+            self._stage_peak = max(self._stage_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            if self.profile:
+                record["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+                self._stage_peak = max(self._stage_peak, record["peak_traced_bytes"])
+            self._record = self._stage
+
+    # Cộng các bộ đếm vào tệp (hoặc bước) đang được đo
+    def add_counters(self, counters):
+        if self._record is None:
+            return
+        total = self._record.setdefault("counters", {})
+        for key, value in counters.items():
+            total[key] = total.get(key, 0) + value
+
+    def report(self):
+        return {
+            "argv": sys.argv,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "seconds": time.time() - self.started,
+            "profile": self.profile,
+            "max_rss_bytes": max_rss_bytes(),
+            "stages": self.stages,
+        }
+
+    # Ghi báo cáo JSON; khi profile, thống kê cProfile đầy đủ của mỗi bước được
+    # ghi cạnh báo cáo (<báo cáo>.<bước>.prof, mở bằng pstats hoặc snakeviz)
+    def write_report(self, file_path):
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=4)
+        for name, profiler in self._profiles.items():
+            profiler.dump_stats(f"{os.path.splitext(file_path)[0]}.{name}.prof")
+        return file_path
+
+# Bộ đo của lần chạy hiện tại (None nếu không đo)
+_current = None
+
+def start(profile=False):
+    global _current
+    _current = Profiler(profile=profile)
+    return _current
+
+def stage(name):
+    return _current.stage(name) if _current is not None else contextlib.nullcontext()
+
+def track_file(name):
+    return _current.track_file(name) if _current is not None else contextlib.nullcontext()
+
+def add_counters(counters):
+    if _current is not None:
+        _current.add_counters(counters)
+
+def write_report(file_path):
+    return _current.write_report(file_path) if _current is not None else None
@@ -1,7 +1,14 @@
 import os
+import sys
 import json
 import numpy as np
 
+# Thêm đường dẫn để nhập các module cần thiết
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import instrument.instrument as instrument
+from instrument.instrument import debug_enabled
+
 # Class đại diện cho một nút trong cây k-d
 class Node:
     def __init__(self, point, left=None, right=None, axis=None):
@@ -36,8 +43,68 @@ def build_kd_tree(points, depth=0, use_variance=False):
         axis=axis
     )
 
+# Class đại diện cho một cây k-d lưu ngầm định trong mảng
+# Nút gốc của đoạn [lo, hi) nằm ở vị trí mid = lo + (hi - lo) // 2, cây con trái
+# là đoạn [lo, mid) và cây con phải là đoạn [mid + 1, hi), nên không cần lưu con trỏ.
+class ArrayKDTree:
+    def __init__(self, points, axes):
+        self.points = points  # Mảng (n, d) các điểm đã sắp theo thứ tự của cây
+        self.axes = axes  # Mảng (n,) trục phân chia của nút tại mỗi vị trí
+
+    def __len__(self):
+        return len(self.axes)
+
+# Hàm xây dựng cây k-d dạng mảng, cùng cách chọn trục như build_kd_tree
+# Trung vị được tìm bằng lựa chọn từng phần (argpartition, O(n)) thay vì sắp xếp
+# lại toàn bộ ở mỗi cấp, nên tổng chi phí là O(n log n).
+def build_array_kd_tree(points, use_variance=False, k=3):
+    pts = np.array(points, dtype=float)
+    n = len(pts)
+    axes = np.zeros(n, dtype=np.int8)
+
+    stack = [(0, n, 0)]
+    while stack:
+        lo, hi, depth = stack.pop()
+        if hi <= lo:
+            continue
+        if hi - lo == 1:
+            # nút lá: phương sai bằng 0 trên mọi trục nên argmax chọn trục 0
+            axes[lo] = 0 if use_variance else depth % k
+            continue
+        block = pts[lo:hi]
+        if use_variance:
+            # Chọn trục phân chia dựa trên phương sai lớn nhất của các tọa độ
+            axis = int(np.argmax(block[:, :k].var(axis=0)))
+        else:
+            axis = depth % k
+        median = (hi - lo) // 2
+        pts[lo:hi] = block[np.argpartition(block[:, axis], median)]
+        axes[lo + median] = axis
+        stack.append((lo, lo + median, depth + 1))
+        stack.append((lo + median + 1, hi, depth + 1))
+
+    return ArrayKDTree(pts, axes)
+
+# Hàm lưu các cây k-d dạng mảng {id: ArrayKDTree} của một file R*-tree vào 1 file .npz
+# Tất cả các điểm được nối thành một mảng, offsets[i]:offsets[i+1] là đoạn của cây thứ i
+def save_array_kd_trees(kdtrees, file_path):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    ids = list(kdtrees)
+    offsets = np.cumsum([0] + [len(kdtrees[kdtree_id]) for kdtree_id in ids])
+    points = np.concatenate([kdtrees[kdtree_id].points for kdtree_id in ids]) if ids else np.zeros((0, 5))
+    axes = np.concatenate([kdtrees[kdtree_id].axes for kdtree_id in ids]) if ids else np.zeros(0, dtype=np.int8)
+    np.savez(file_path, ids=np.array(ids, dtype=str), offsets=offsets, points=points, axes=axes)
+
+# Hàm đọc lại các cây k-d dạng mảng, mỗi cây là một lát cắt (view) của mảng chung
+def load_array_kd_trees(file_path):
+    with np.load(file_path) as f:
+        ids, offsets, points, axes = f['ids'], f['offsets'], f['points'], f['axes']
+    return {str(kdtree_id): ArrayKDTree(points[offsets[i]:offsets[i+1]], axes[offsets[i]:offsets[i+1]])
+            for i, kdtree_id in enumerate(ids)}
+
 # Hàm xử lý một file R*-tree JSON và tạo file k-d tree tương ứng
-def process_rtree_json(rtree_json_path, kdtree_output_path):
+# array_format=True lưu các cây k-d dạng mảng vào file .npz thay vì JSON
+def process_rtree_json(rtree_json_path, kdtree_output_path, print_output=True, array_format=False):
     # Tạo thư mục nếu chưa tồn tại
     os.makedirs(os.path.dirname(kdtree_output_path), exist_ok=True)
     
@@ -52,21 +119,27 @@ def process_rtree_json(rtree_json_path, kdtree_output_path):
         nonlocal kdtree_id_counter
         if node['is_leaf'] and node['points']:
             # Xây dựng cây k-d cho các điểm trong lá
-            points = list(node['points'].values())
-            kd_tree = build_kd_tree(points, use_variance=True)
+            # mỗi điểm được lưu dạng [tọa độ (x, y, z), (alpha, beta)] -> [x, y, z, alpha, beta]
+            points = [list(coords) + list(extend) for coords, extend in node['points'].values()]
 
             # Gán một ID duy nhất cho cây k-d này và lưu lại
             kdtree_id = f"kdtree_{kdtree_id_counter}"
             kdtree_id_counter += 1
-            kdtrees[kdtree_id] = kd_tree_to_dict(kd_tree)
 
             # Cập nhật nút R*-tree với ID của cây k-d
             node['kdtree'] = kdtree_id
 
+            if array_format:
+                kdtrees[kdtree_id] = build_array_kd_tree(points, use_variance=True)
+                return
+            kd_tree = build_kd_tree(points, use_variance=True)
+            kdtrees[kdtree_id] = kd_tree_to_dict(kd_tree)
+
             # In ra cây k-d đã tạo
-            print(f"Cấu trúc cây k-d với ID {kdtree_id}:")
-            print_kd_tree_readable(kd_tree)
-            print("***********")
+            if print_output and debug_enabled():
+                print(f"Cấu trúc cây k-d với ID {kdtree_id}:")
+                print_kd_tree_readable(kd_tree)
+                print("***********")
         else:
             # Duyệt qua các nút con
             for child in node.get('children', []):
@@ -78,10 +151,25 @@ def process_rtree_json(rtree_json_path, kdtree_output_path):
     with open(rtree_json_path, 'w') as f:
         json.dump(rtree_data, f, indent=4)
 
-    # Lưu các cây k-d vào file JSON mới
-    with open(kdtree_output_path, 'w') as f:
-        json.dump(kdtrees, f, indent=4)
-    print(f"Cấu trúc kdtree đã được lưu vào file: {os.path.relpath(kdtree_output_path, start=current_directory)}")
+    # Lưu các cây k-d vào file JSON mới (hoặc file .npz với dạng mảng)
+    if array_format:
+        kdtree_output_path = kdtree_output_path.replace('.json', '.npz')
+        save_array_kd_trees(kdtrees, kdtree_output_path)
+    else:
+        with open(kdtree_output_path, 'w') as f:
+            json.dump(kdtrees, f, indent=4)
+    print(f"Cấu trúc kdtree đã được lưu vào file: {kdtree_output_path}")
+
+# Hàm chuyển đổi dạng từ điển đã lưu trở lại thành cây k-d gồm các Node
+def dict_to_kd_tree(node_dict):
+    if node_dict is None:
+        return None
+    return Node(
+        point=node_dict['point'],
+        left=dict_to_kd_tree(node_dict['left']),
+        right=dict_to_kd_tree(node_dict['right']),
+        axis=node_dict['axis']
+    )
 
 # Hàm chuyển đổi cây k-d thành dạng từ điển để lưu trữ
 def kd_tree_to_dict(node):
@@ -110,12 +198,18 @@ def print_kd_tree_readable(root, depth=0, prefix="Root"):
         print_kd_tree_readable(root.right, depth + 1, prefix="Right")
 
 # Hàm xử lý tất cả các file R*-tree JSON trong thư mục được chỉ định
-def process_all_rtree_files(rstar_directory, kdtree_directory):
+def process_all_rtree_files(rstar_directory, kdtree_directory, print_output=True, array_format=False):
     for file_name in os.listdir(rstar_directory):
         if file_name.endswith('.json'):
             rtree_json_path = os.path.join(rstar_directory, file_name)
             kdtree_output_path = os.path.join(kdtree_directory, f"kdtree_{file_name}")
-            process_rtree_json(rtree_json_path, kdtree_output_path)
+            with instrument.track_file(file_name):
+                process_rtree_json(rtree_json_path, kdtree_output_path, print_output, array_format)
+
+# Xây dựng các cây k-d cho bộ dữ liệu `data` (chạy từ thư mục system)
+def run_kdtree(data, print_output=False, array_format=False):
+    print("\n\nXÂY DỰNG CẤU TRÚC CHỈ MỤC K-D TREE CHO : " + data)
+    process_all_rtree_files(f"storage/rstar_tree/{data}", f"storage/kdtree/{data}", print_output, array_format)
 
 # Chương trình chính
 if __name__ == "__main__":
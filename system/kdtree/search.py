@@ -0,0 +1,134 @@
+import os
+import json
+import math
+
+import numpy as np
+
+from kdtree.kdtree import ArrayKDTree, dict_to_kd_tree, load_array_kd_trees
+
+# Hộp tìm kiếm của mẫu truy vấn: vị trí ràng buộc là khoảng suy biến [c, c],
+# vị trí tự do là (-inf, inf). Trả về (minima, maxima) cho 3 trục x, y, z.
+def partial_match_box(pattern_point):
+    minima = [-math.inf if c is None else c for c in pattern_point]
+    maxima = [math.inf if c is None else c for c in pattern_point]
+    return minima, maxima
+
+def _in_box(point, minima, maxima):
+    return all(minima[i] <= point[i] <= maxima[i] for i in range(len(minima)))
+
+# Tìm kiếm theo vùng trên cây k-d dạng Node (trong bộ nhớ)
+# Cây được xây bằng cách chia theo trung vị, nên các điểm có tọa độ bằng
+# point[axis] có thể nằm ở cả hai nhánh: nhánh trái chứa giá trị <= point[axis],
+# nhánh phải chứa giá trị >= point[axis].
+def range_search(root, minima, maxima):
+    result = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        point, axis = node.point, node.axis
+        if _in_box(point, minima, maxima):
+            result.append(tuple(point))
+        if minima[axis] <= point[axis]:
+            stack.append(node.left)
+        if maxima[axis] >= point[axis]:
+            stack.append(node.right)
+    return result
+
+# Tìm kiếm theo vùng trực tiếp trên dạng từ điển đã lưu (không chuyển thành Node)
+def range_search_dict(root, minima, maxima):
+    result = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        point, axis = node['point'], node['axis']
+        if _in_box(point, minima, maxima):
+            result.append(tuple(point))
+        if minima[axis] <= point[axis]:
+            stack.append(node['left'])
+        if maxima[axis] >= point[axis]:
+            stack.append(node['right'])
+    return result
+
+# Dưới kích thước này, đoạn mảng được lọc trực tiếp bằng NumPy thay vì duyệt từng nút
+ARRAY_SCAN_SIZE = 32
+
+# Tìm kiếm theo vùng trên cây k-d dạng mảng (ArrayKDTree)
+def range_search_array(tree, minima, maxima):
+    points, axes = tree.points, tree.axes
+    d = len(minima)
+    lower = np.asarray(minima, dtype=float)
+    upper = np.asarray(maxima, dtype=float)
+    result = []
+    stack = [(0, len(tree))]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo <= ARRAY_SCAN_SIZE:
+            block = points[lo:hi]
+            mask = np.all((block[:, :d] >= lower) & (block[:, :d] <= upper), axis=1)
+            result.extend(map(tuple, block[mask].tolist()))
+            continue
+        mid = lo + (hi - lo) // 2
+        point, axis = points[mid], axes[mid]
+        if _in_box(point, minima, maxima):
+            result.append(tuple(point.tolist()))
+        if minima[axis] <= point[axis]:
+            stack.append((lo, mid))
+        if maxima[axis] >= point[axis]:
+            stack.append((mid + 1, hi))
+    return result
+
+# Chọn hàm tìm kiếm theo dạng lưu trữ của cây k-d
+def search_kd_tree(root, minima, maxima):
+    if isinstance(root, dict):
+        return range_search_dict(root, minima, maxima)
+    if isinstance(root, ArrayKDTree):
+        return range_search_array(root, minima, maxima)
+    return range_search(root, minima, maxima)
+
+# Tìm kiếm khớp một phần: pattern_point gồm 3 tọa độ, None cho vị trí tự do
+def partial_match_search(root, pattern_point):
+    minima, maxima = partial_match_box(pattern_point)
+    return search_kd_tree(root, minima, maxima)
+
+# Đọc các cây k-d của một file R*-tree. as_nodes=True chuyển sẵn thành dạng Node
+# để các truy vấn sau không phải duyệt lại từ điển JSON.
+def load_kdtrees(kdtree_json_path, as_nodes=False):
+    with open(kdtree_json_path, 'r', encoding='utf-8') as f:
+        kdtrees = json.load(f)
+    if as_nodes:
+        kdtrees = {kdtree_id: dict_to_kd_tree(tree) for kdtree_id, tree in kdtrees.items()}
+    return kdtrees
+
+# Đọc tất cả các cây k-d của bộ dữ liệu `data` (file .json hoặc .npz dạng mảng)
+# Nếu một file R*-tree có cả hai dạng, file được xây gần nhất được dùng.
+# Trả về từ điển {tên file R*-tree: {id cây k-d: cây}}
+def load_all_kdtrees(data, as_nodes=False):
+    kdtree_directory = f"storage/kdtree/{data}"
+    latest = {}
+    for file_name in os.listdir(kdtree_directory):
+        name, ext = os.path.splitext(file_name[len("kdtree_"):])
+        if not file_name.startswith("kdtree_") or ext not in (".json", ".npz"):
+            continue
+        path = os.path.join(kdtree_directory, file_name)
+        if name not in latest or os.path.getmtime(path) > os.path.getmtime(latest[name]):
+            latest[name] = path
+    all_kdtrees = {}
+    for name in sorted(latest):
+        if latest[name].endswith(".json"):
+            all_kdtrees[name] = load_kdtrees(latest[name], as_nodes)
+        else:
+            all_kdtrees[name] = load_array_kd_trees(latest[name])
+    return all_kdtrees
+
+# RefinePhase: tìm kiếm trên các cây k-d được FilterPhase trả về
+# Trả về tập các bộ (x, y, z, alpha, beta) khớp với mẫu truy vấn
+def refine_phase(kdtrees, kdtree_ids, box):
+    minima, maxima = box
+    tupleset = set()
+    for kdtree_id in kdtree_ids:
+        tupleset.update(search_kd_tree(kdtrees[kdtree_id], minima, maxima))
+    return tupleset
@@ -3,14 +3,41 @@ import sys
 import io
 from mdh.mdh import run_mdh
 from rstar_tree.rtvis_3d import run_rstar_tree
+from kdtree.kdtree import run_kdtree
+from query.query import run_query, run_count
+from query.bgp import is_sparql, run_sparql
+from query.knn import run_knn
+import instrument.instrument as instrument
 
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
 def run(args):
+    instrument.set_log_level(args.log_level)
+    instrument.start(profile=args.profile)
     if(args.mdh):
-        run_mdh(data=args.data, print_output=args.print, visualize = args.visualize, number_charts = args.number_charts)
+        with instrument.stage("mdh"):
+            run_mdh(data=args.data, print_output=args.print, visualize = args.visualize, number_charts = args.number_charts, workers = args.workers, csv_export = args.mdh_csv)
     if(args.rstar_tree):
-        run_rstar_tree(data=args.data, M=args.M, m=args.m, p=args.p, print_output=args.print, number_charts = args.number_charts, depth_chart=args.depth_chart)
+        with instrument.stage("rstar_tree"):
+            run_rstar_tree(data=args.data, M=args.M, m=args.m, p=args.p, print_output=args.print, number_charts = args.number_charts, depth_chart=args.depth_chart, bulk_load=args.bulk_load, pool_size=args.pool_size, rstar_format=args.rstar_format)
+    if(args.kdtree):
+        with instrument.stage("kdtree"):
+            run_kdtree(data=args.data, print_output=args.print, array_format=args.kdtree_array)
+    if(args.query and args.knn):
+        with instrument.stage("knn"):
+            run_knn(data=args.data, pattern=args.query, k=args.knn, print_output=args.print)
+    elif(args.query and args.count):
+        with instrument.stage("count"):
+            run_count(data=args.data, pattern=args.query)
+    elif(args.query and is_sparql(args.query)):
+        with instrument.stage("sparql"):
+            run_sparql(data=args.data, query=args.query, print_output=args.print)
+    elif(args.query):
+        with instrument.stage("query"):
+            run_query(data=args.data, pattern=args.query, print_output=args.print, paged=args.paged, pool_size=args.pool_size)
+    # Báo cáo thời gian, bộ nhớ và các bộ đếm của từng bước
+    report_path = instrument.write_report(args.report or f"storage/reports/{args.data}.json")
+    print(f"Báo cáo đo đạc đã được lưu vào file: {report_path}")
 
 def main():
     parser = argparse.ArgumentParser(description="Run RDF Graph Visualization")
@@ -20,12 +47,30 @@ def main():
     parser.add_argument("--print", type=bool, default=False, help="Print the results of each step or not")
     parser.add_argument("--visualize", type=bool, default=False, help="visualize model rdf data into graph")
     parser.add_argument("--number_charts", type=int, default=10, help="Maximum number of charts")
+    parser.add_argument("--mdh_csv", type=bool, default=False, help="also export the triple data of the mdh step as csv (the r*-tree step reads the binary .tri files)")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes used to build the mdh of the rdf files in parallel")
     parser.add_argument("--M", type=int, default=4, help="maximum number of children")
     parser.add_argument("--m", type=int, default=2, help="minimum number of children. try m = floor(0.4*M)")
     parser.add_argument("--p", type=int, default=1, help="Parameter controlling how overflow is treated. try p = floor(0.3*M)")
     parser.add_argument("--depth_chart", type=int, default=3, help="depth of chart")
+    parser.add_argument("--bulk_load", type=str, default=None, choices=["str", "hilbert"], help="build r*-tree by bulk loading (Sort-Tile-Recursive or Hilbert packing) instead of one-by-one inserts")
+    parser.add_argument("--pool_size", type=int, default=None, help="build the r*-tree on disk (storage/rstar_tree_disk) keeping at most this many nodes in memory; with --query, answer the single pattern from those disk trees. --kdtree, --count, --knn and SPARQL queries still read the JSON trees")
+    parser.add_argument("--rstar_format", type=str, default="json", choices=["json", "pages", "both"], help="save the built r*-trees as JSON (storage/rstar_tree, read by --kdtree and --query), as binary page files (storage/pages, read by --query with --paged) or both")
+    parser.add_argument("--kdtree", type=bool, default=False, help="build k-d tree index structure for the leaves of the r*-trees")
+    parser.add_argument("--kdtree_array", type=bool, default=False, help="store k-d trees as implicit NumPy arrays (.npz) instead of nested JSON")
+    parser.add_argument("--query", type=str, default=None, help="triple pattern 's p o' to query, or a SPARQL basic graph pattern 'SELECT ... WHERE { ... }', variables start with '?'")
+    parser.add_argument("--paged", type=bool, default=False, help="answer --query from the binary page files in storage/pages (see rstar_tree/pagefile.py)")
+    parser.add_argument("--knn", type=int, default=0, help="return the k triples nearest to the --query encoding instead of exact matches")
+    parser.add_argument("--count", type=bool, default=False, help="only count the triples matching --query, from the per-node counts stored in the R*-trees")
+    parser.add_argument("--log_level", type=str, default="debug", choices=["debug", "info", "warning"], help="per-triple and per-node output is only printed at the debug level")
+    parser.add_argument("--profile", type=bool, default=False, help="run every stage under cProfile and tracemalloc, the stats are added to the report")
+    parser.add_argument("--report", type=str, default=None, help="path of the JSON report with the time, memory and counters of each stage (default storage/reports/<data>.json)")
 
     args = parser.parse_args()
+    if args.rstar_tree and args.pool_size and (args.bulk_load or args.kdtree or args.rstar_format != "json"):
+        parser.error("--pool_size builds the r*-trees on disk only: --bulk_load, --kdtree and --rstar_format are not supported with it")
+    if args.rstar_tree and args.kdtree and args.rstar_format == "pages":
+        parser.error("--kdtree reads the JSON r*-trees, use --rstar_format=json or both")
 
     run(args)
 
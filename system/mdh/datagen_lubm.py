@@ -0,0 +1,232 @@
+import os
+import time
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape, quoteattr
+
+# Sinh dữ liệu tổng hợp có dạng LUBM (trường đại học, khoa, giảng viên, sinh viên,
+# môn học, bài báo) không cần tải dữ liệu hay chạy bộ sinh Java của LUBM.
+# - mỗi khoa được ghi ra một tệp University{u}_{d}.rdf (RDF/XML như LUBM) hoặc .nt
+#   (N-Triples) trong ../data/LUBM_Data/<data>/, đọc trực tiếp được bởi run_mdh
+# - số lượng mỗi loại thực thể theo các khoảng của LUBM, ~6 nghìn bộ ba mỗi khoa,
+#   ~130 nghìn bộ ba mỗi trường: 10 triệu bộ ba cần khoảng 75 trường
+# - bậc của các môn học (takesCourse) và giảng viên hướng dẫn (advisor) lệch theo
+#   luật lũy thừa (Zipf) với tham số skew; số thành viên (memberOf) thay đổi theo khoa
+# - mỗi khoa dùng bộ sinh số ngẫu nhiên riêng được khởi tạo từ (seed, u, d), nên kết
+#   quả giống hệt nhau giữa các lần chạy và không phụ thuộc số tiến trình
+
+UB = "http://swat.cse.lehigh.edu/onto/univ-bench.owl#"
+RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+
+# Số lượng theo từng khoa (khoảng [min, max]) như bộ sinh của LUBM
+FACULTY = (("FullProfessor", 7, 10), ("AssociateProfessor", 10, 14), ("AssistantProfessor", 8, 11), ("Lecturer", 5, 7))
+UNDERGRADUATES_PER_FACULTY = (8, 14)
+GRADUATES_PER_FACULTY = (3, 4)
+RESEARCH_GROUPS = (10, 20)
+COURSES_PER_FACULTY = (1, 2)
+GRADUATE_COURSES_PER_FACULTY = (1, 2)
+PUBLICATIONS_PER_FACULTY = (5, 15)
+UNDERGRADUATE_COURSES = (2, 4)
+GRADUATE_COURSES = (1, 3)
+DEPARTMENTS = (15, 25)
+
+def university_uri(u):
+    return f"http://www.University{u}.edu"
+
+def department_uri(u, d):
+    return f"http://www.Department{d}.University{u}.edu"
+
+# Trọng số tích lũy của phân phối Zipf trên n phần tử: phần tử thứ i có trọng số 1 / (i + 1)^skew
+def zipf_weights(n, skew):
+    return list(itertools.accumulate(1.0 / (i + 1) ** skew for i in range(n)))
+
+# Chọn k phần tử khác nhau theo trọng số tích lũy
+def skewed_sample(rng, items, cum_weights, k):
+    k = min(k, len(items))
+    picked = []
+    while len(picked) < k:
+        item = rng.choices(items, cum_weights=cum_weights)[0]
+        if item not in picked:
+            picked.append(item)
+    return picked
+
+# Hàm sinh các mô tả của một khoa: mỗi mô tả là (chủ ngữ, lớp, [(vị từ, đối tượng, là literal)])
+def generate_department(u, d, n_universities, seed=42, skew=1.0):
+    rng = random.Random(f"{seed}-{u}-{d}")
+    department = department_uri(u, d)
+    university = university_uri(u)
+    other_university = lambda: university_uri(rng.randrange(n_universities))
+
+    if d == 0:
+        yield university, "University", [("name", f"University{u}", True)]
+    yield department, "Department", [("name", f"Department{d}", True), ("subOrganizationOf", university, False)]
+
+    # giảng viên và các môn học họ dạy
+    faculty = []
+    courses = []
+    graduate_courses = []
+    teaching = {}
+    for kind, low, high in FACULTY:
+        for i in range(rng.randint(low, high)):
+            member = f"{department}/{kind}{i}"
+            faculty.append((member, kind, i))
+            taught = []
+            for _ in range(rng.randint(*COURSES_PER_FACULTY)):
+                taught.append(f"{department}/Course{len(courses)}")
+                courses.append(taught[-1])
+            if kind != "Lecturer":
+                for _ in range(rng.randint(*GRADUATE_COURSES_PER_FACULTY)):
+                    taught.append(f"{department}/GraduateCourse{len(graduate_courses)}")
+                    graduate_courses.append(taught[-1])
+            teaching[member] = taught
+
+    professors = [member for member, kind, i in faculty if kind != "Lecturer"]
+    for member, kind, i in faculty:
+        name = f"{kind}{i}"
+        properties = [
+            ("name", name, True),
+            ("emailAddress", f"{name}@Department{d}.University{u}.edu", True),
+            ("telephone", f"xxx-xxx-{rng.randrange(10000):04d}", True),
+            ("worksFor", department, False),
+            ("undergraduateDegreeFrom", other_university(), False),
+        ]
+        if kind != "Lecturer":
+            properties.append(("mastersDegreeFrom", other_university(), False))
+            properties.append(("doctoralDegreeFrom", other_university(), False))
+        properties += [("teacherOf", course, False) for course in teaching[member]]
+        if kind == "FullProfessor" and i == 0:
+            properties.append(("headOf", department, False))
+        yield member, kind, properties
+
+    for course in courses:
+        yield course, "Course", [("name", course.rsplit("/", 1)[1], True)]
+    for course in graduate_courses:
+        yield course, "GraduateCourse", [("name", course.rsplit("/", 1)[1], True)]
+
+    for i in range(rng.randint(*RESEARCH_GROUPS)):
+        yield f"{department}/ResearchGroup{i}", "ResearchGroup", [("subOrganizationOf", department, False)]
+
+    # các môn học và giảng viên hướng dẫn được chọn theo phân phối lệch; thứ hạng
+    # được xáo trộn để môn học phổ biến nhất không phải luôn là môn đầu tiên
+    rng.shuffle(courses)
+    rng.shuffle(graduate_courses)
+    rng.shuffle(professors)
+    course_weights = zipf_weights(len(courses), skew)
+    graduate_course_weights = zipf_weights(len(graduate_courses), skew)
+    advisor_weights = zipf_weights(len(professors), skew)
+
+    graduates = []
+    n_faculty = len(faculty)
+    for i in range(n_faculty * rng.randint(*UNDERGRADUATES_PER_FACULTY)):
+        name = f"UndergraduateStudent{i}"
+        properties = [
+            ("name", name, True),
+            ("emailAddress", f"{name}@Department{d}.University{u}.edu", True),
+            ("telephone", f"xxx-xxx-{rng.randrange(10000):04d}", True),
+            ("memberOf", department, False),
+        ]
+        properties += [("takesCourse", course, False)
+                       for course in skewed_sample(rng, courses, course_weights, rng.randint(*UNDERGRADUATE_COURSES))]
+        if rng.random() < 0.2:
+            properties.append(("advisor", skewed_sample(rng, professors, advisor_weights, 1)[0], False))
+        yield f"{department}/{name}", "UndergraduateStudent", properties
+
+    for i in range(n_faculty * rng.randint(*GRADUATES_PER_FACULTY)):
+        name = f"GraduateStudent{i}"
+        graduates.append(f"{department}/{name}")
+        properties = [
+            ("name", name, True),
+            ("emailAddress", f"{name}@Department{d}.University{u}.edu", True),
+            ("telephone", f"xxx-xxx-{rng.randrange(10000):04d}", True),
+            ("memberOf", department, False),
+            ("undergraduateDegreeFrom", other_university(), False),
+            ("advisor", skewed_sample(rng, professors, advisor_weights, 1)[0], False),
+        ]
+        properties += [("takesCourse", course, False)
+                       for course in skewed_sample(rng, graduate_courses, graduate_course_weights, rng.randint(*GRADUATE_COURSES))]
+        if courses and rng.random() < 0.25:
+            properties.append(("teachingAssistantOf", rng.choice(courses), False))
+        yield graduates[-1], "GraduateStudent", properties
+
+    # bài báo của giảng viên, một số có thêm tác giả là nghiên cứu sinh
+    for member, kind, i in faculty:
+        for j in range(rng.randint(*PUBLICATIONS_PER_FACULTY)):
+            properties = [("name", f"Publication{j}", True), ("publicationAuthor", member, False)]
+            if graduates and rng.random() < 0.5:
+                properties.append(("publicationAuthor", rng.choice(graduates), False))
+            yield f"{member}/Publication{j}", "Publication", properties
+
+# Ghi các mô tả ra RDF/XML theo cách của LUBM (phần tử nút có kiểu, literal là nội dung phần tử)
+def write_rdfxml(descriptions, f):
+    f.write('<?xml version="1.0"?>\n')
+    f.write(f'<rdf:RDF xmlns:rdf="{RDF_NS}" xmlns:ub="{UB}">\n')
+    count = 0
+    for subject, kind, properties in descriptions:
+        lines = [f'<ub:{kind} rdf:about={quoteattr(subject)}>']
+        for predicate, obj, is_literal in properties:
+            if is_literal:
+                lines.append(f'  <ub:{predicate}>{escape(obj)}</ub:{predicate}>')
+            else:
+                lines.append(f'  <ub:{predicate} rdf:resource={quoteattr(obj)}/>')
+        lines.append(f'</ub:{kind}>\n')
+        f.write('\n'.join(lines))
+        count += 1 + len(properties)
+    f.write('</rdf:RDF>\n')
+    return count
+
+def _nt_literal(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r') + '"'
+
+# Ghi các mô tả ra N-Triples, mỗi dòng một bộ ba
+def write_ntriples(descriptions, f):
+    count = 0
+    for subject, kind, properties in descriptions:
+        lines = [f'<{subject}> <{RDF_NS}type> <{UB}{kind}> .']
+        for predicate, obj, is_literal in properties:
+            lines.append(f'<{subject}> <{UB}{predicate}> {_nt_literal(obj) if is_literal else f"<{obj}>"} .')
+        f.write('\n'.join(lines) + '\n')
+        count += len(lines)
+    return count
+
+WRITERS = {"rdf": write_rdfxml, "nt": write_ntriples}
+
+# Hàm sinh và ghi tệp của một khoa, trả về số bộ ba đã ghi
+def write_department(directory, u, d, n_universities, seed, skew, file_format):
+    file_path = os.path.join(directory, f"University{u}_{d}.{file_format}")
+    with open(file_path, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        return WRITERS[file_format](generate_department(u, d, n_universities, seed, skew), f)
+
+# Số khoa của mỗi trường, theo khoảng của LUBM hoặc cố định
+def department_counts(n_universities, seed, departments=None):
+    return [departments or random.Random(f"{seed}-{u}").randint(*DEPARTMENTS) for u in range(n_universities)]
+
+def generate_lubm(data, universities=1, seed=42, skew=1.0, file_format="rdf", departments=None, workers=None):
+    directory = "../data/LUBM_Data/" + data
+    os.makedirs(directory, exist_ok=True)
+    jobs = [(directory, u, d, universities, seed, skew, file_format)
+            for u, n_departments in enumerate(department_counts(universities, seed, departments))
+            for d in range(n_departments)]
+    start = time.time()
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            counts = list(executor.map(write_department, *zip(*jobs), chunksize=4))
+    else:
+        counts = [write_department(*job) for job in jobs]
+    print(f"ĐÃ SINH {len(jobs)} TỆP ({universities} trường) VỚI {sum(counts)} bộ ba vào {directory}, "
+          f"{time.time() - start:.2f} giây")
+    return sum(counts)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic LUBM-shaped RDF data for run_mdh")
+    parser.add_argument("--data", type=str, default="synthetic", help="name of the output directory in ../data/LUBM_Data")
+    parser.add_argument("--universities", type=int, default=1, help="number of universities, about 130k triples each")
+    parser.add_argument("--departments", type=int, default=None, help="departments per university, default: 15 to 25 like LUBM")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent of the takesCourse and advisor degree skew")
+    parser.add_argument("--format", type=str, default="rdf", choices=["rdf", "nt"], help="RDF/XML (.rdf) or N-Triples (.nt)")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes writing files in parallel")
+    args = parser.parse_args()
+
+    generate_lubm(args.data, args.universities, args.seed, args.skew, args.format, args.departments, args.workers)
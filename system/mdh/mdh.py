@@ -1,34 +1,36 @@
 import os
 import networkx as nx
 import matplotlib.pyplot as plt
-from rdflib import Graph, URIRef
 import hashlib
-from collections import Counter
+import itertools
 from mpl_toolkits.mplot3d import Axes3D
 import json
 import csv
+import time
+import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+import numpy as np
 
-# Hàm nén URI và trả về danh sách các bộ ba RDF trong 1 file
-def compress_uri_triples(rdf_file_path):
-    g = Graph()
-    g.parse(rdf_file_path, format="application/rdf+xml")
-    triples = []
-    for subj, pred, obj in g:
-        subj = URIRef(subj).split("/")[-1]  # Lấy phần cuối cùng của URI
-        obj = URIRef(obj).split("/")[-1]  # Lấy phần cuối cùng của URI
-        pred = URIRef(pred).split("#")[-1]  # Lấy phần cuối cùng của URI
-        triples.append((subj, pred, obj))
-    return triples
-
-# Hàm in bộ ba RDF
+from mdh.stream import iter_triples, is_rdf_file
+from mdh.termdict import write_term_dictionary, term_dictionary_path
+from mdh.triplestore import write_triple_store
+import instrument.instrument as instrument
+
+# Hàm in bộ ba RDF (danh sách hoặc generator)
 def print_triples(triples):
     print("\nDANH SÁCH CÁC BỘ BA RDF SAU KHI NÉN URI:")
-    if len(triples[0]) == 3:
-        for idx, (subj, pred, obj) in enumerate(triples, start=1):
-            print(f"{idx}. ({subj}, {pred}, {obj})")
-    elif len(triples[0]) == 5:
-        for idx, (x, y, z, alpha, beta) in enumerate(triples, start=1):
-            print(f"{idx}. ({x}, {y}, {z}, α = {alpha}, β = {beta})")
+    for idx, triple in enumerate(triples, start=1):
+        print_triple(idx, triple)
+
+def print_triple(idx, triple):
+    if len(triple) == 3:
+        subj, pred, obj = triple
+        print(f"{idx}. ({subj}, {pred}, {obj})")
+    elif len(triple) == 5:
+        x, y, z, alpha, beta = triple
+        print(f"{idx}. ({x}, {y}, {z}, α = {alpha}, β = {beta})")
 
 def visualize_rdf_graph(triples, file_name):
     nx_graph = nx.DiGraph()
@@ -42,54 +44,87 @@ def visualize_rdf_graph(triples, file_name):
     plt.title(f"Mô hình hóa dữ liệu RDF - {file_name}")
     plt.show()
 
-def save_triples_with_frequency_to_file(triples_with_frequency, file_path):
+# Lưu bộ ba vào kho bộ ba nhị phân (mdh/triplestore.py), tệp CSV chỉ được ghi thêm khi csv_export
+def save_triples_with_frequency_to_file(triples_with_frequency, file_path, csv_export=False):
     # Tạo thư mục nếu nó chưa tồn tại
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    
-    # Lưu bộ ba vào tệp CSV
+
+    store_file_path = write_triple_store(triples_with_frequency, file_path.replace('.json', '.tri'))
+    print(f"Dữ liệu bộ ba đã được lưu vào file: {store_file_path}")
+
+    if csv_export:
+        # Lưu bộ ba vào tệp CSV
+        csv_file_path = file_path.replace('.json', '.csv')
+        with open(csv_file_path, 'w', newline='', encoding='utf-8') as csvfile:
+            write_triples_csv(csvfile, triples_with_frequency)
+        print(f"Dữ liệu bộ ba đã được lưu vào file: {csv_file_path}")
+
+def write_triples_csv(csvfile, triples_with_frequency):
+    if isinstance(triples_with_frequency, np.ndarray):
+        triples_with_frequency = array_to_triples(triples_with_frequency)
+    csv_writer = csv.writer(csvfile)
+    csv_writer.writerow(['', '0', '1', '2', '3', '4', '5'])  # Header của file CSV
+    csv_writer.writerows((idx, x, y, z, alpha, beta) for idx, (x, y, z, alpha, beta) in enumerate(triples_with_frequency))
+
+# Lưu nội dung CSV đã được định dạng sẵn (bởi tiến trình con khi chạy song song)
+def save_triples_csv_text(csv_text, file_path):
     csv_file_path = file_path.replace('.json', '.csv')
     with open(csv_file_path, 'w', newline='', encoding='utf-8') as csvfile:
-        csv_writer = csv.writer(csvfile)
-        csv_writer.writerow(['', '0', '1', '2', '3', '4', '5'])  # Header của file CSV
-        for idx, (x, y, z, alpha, beta) in enumerate(triples_with_frequency):
-            csv_writer.writerow([idx, x, y, z, alpha, beta])
+        csvfile.write(csv_text)
     print(f"Dữ liệu bộ ba đã được lưu vào file: {csv_file_path}")
 
-# Hàm lưu trữ bộ mã hóa vào file (đã chỉnh sửa)
-def save_entity_mapping_to_file(entity_mapping, file_path):
-    # Tạo thư mục nếu nó chưa tồn tại
-    os.makedirs(os.path.dirname(file_path), exist_ok=True)
-    
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(entity_mapping, f, ensure_ascii=False, indent=4)
+# Hàm lưu bộ mã hóa của tất cả các tệp vào từ điển thực thể toàn cục (mdh/termdict.py)
+def save_term_dictionary(entities, data):
+    file_path = term_dictionary_path(data)
+    write_term_dictionary(entities, file_path, normalize_hash)
     print(f"Bộ mã hóa đã được lưu vào file: {file_path}")
 
-def convert_triples_to_coordinates(triples):
-    data_size = len(triples) * 10  # Đảm bảo data_size lớn hơn số lượng triples để giảm khả năng trùng lặp
-    coordinates = []
-    entity_mapping = {}
+# Hàm đánh số các thực thể theo thứ tự xuất hiện đầu tiên (factorize) trong một lượt đọc
+# Trả về (danh sách thực thể, mảng (N, 3) chỉ số thực thể của subject, predicate, object)
+# Tệp chỉ được đọc một lần nên bộ nhớ tăng theo số bộ ba của tệp (24 byte mỗi bộ ba cho
+# mảng chỉ số, thêm mảng (N, 5) của encode_triples), không chỉ theo số thực thể khác nhau
+# như khi đọc tệp hai lần; mỗi tệp (và mỗi tiến trình khi chạy song song) xử lý riêng
+def factorize_triples(triples):
+    term_ids = {}
+    ids = array('q')
+    for triple in triples:
+        for term in triple:
+            term_id = term_ids.get(term)
+            if term_id is None:
+                term_id = term_ids[term] = len(term_ids)
+            ids.append(term_id)
+    return list(term_ids), np.asarray(ids, dtype=np.int64).reshape(-1, 3)
 
-    for subj, pred, obj in triples:
-        # Tạo mã hóa cho mỗi thực thể
-        # entity_mapping[subj] = generate_unique_code(entity_mapping, subj, data_size)
-        # entity_mapping[pred] = generate_unique_code(entity_mapping, pred, data_size)
-        # entity_mapping[obj] = generate_unique_code(entity_mapping, obj, data_size)
-        entity_mapping[subj] = normalize_hash(subj)
-        entity_mapping[pred] = normalize_hash(pred)
-        entity_mapping[obj] = normalize_hash(obj)
-
-        x = entity_mapping[subj]
-        y = entity_mapping[pred]
-        z = entity_mapping[obj]
-        coordinates.append((x, y, z))
-
-    # In ra mã hóa của các thực thể
+# Hàm mã hóa các bộ ba đã đánh số bằng NumPy: mỗi thực thể chỉ được băm một lần,
+# tọa độ được lấy theo chỉ số và tần suất được đếm bằng bincount.
+# Trả về (mảng (N, 5) các bộ (x, y, z, alpha, beta), bộ mã hóa)
+def encode_triples(terms, ids):
+    codes = np.fromiter((normalize_hash(term) for term in terms), dtype=float, count=len(terms))
+    entity_mapping = dict(zip(terms, codes.tolist()))
+    # tần suất được đếm theo giá trị mã hóa: các thực thể trùng mã hóa được đếm chung
+    unique_codes, code_ids = np.unique(codes, return_inverse=True)
+    triple_code_ids = code_ids.reshape(-1)[ids]
+    subject_count = np.bincount(triple_code_ids[:, 0], minlength=len(unique_codes))
+    object_count = np.bincount(triple_code_ids[:, 2], minlength=len(unique_codes))
+
+    triples_with_frequency = np.empty((len(ids), 5))
+    triples_with_frequency[:, :3] = codes[ids]
+    triples_with_frequency[:, 3] = object_count[triple_code_ids[:, 0]]  # Số lần xuất hiện của x làm object
+    triples_with_frequency[:, 4] = subject_count[triple_code_ids[:, 2]]  # Số lần xuất hiện của z làm subject
+    return triples_with_frequency, entity_mapping
+
+# Chuyển mảng (N, 5) về danh sách các bộ (x, y, z, alpha, beta) với tần suất là số nguyên
+def array_to_triples(triples_with_frequency):
+    columns = [triples_with_frequency[:, k].tolist() for k in range(3)]
+    columns += [triples_with_frequency[:, k].astype(np.int64).tolist() for k in (3, 4)]
+    return list(zip(*columns))
+
+# In ra mã hóa của các thực thể
+def print_entity_mapping(entity_mapping):
     print("\nMÃ HÓA CÁC THỰC THỂ:")
     for entity, code in entity_mapping.items():
         print(f"{entity} = {code}")
 
-    return coordinates, entity_mapping
-
 # # Hàm sinh mã không trùng lặp
 # def generate_unique_code(entity_mapping, entity, data_size):
 #     code = int(hashlib.md5(entity.encode()).hexdigest(), 16) % (data_size) + 1
@@ -99,31 +134,14 @@ def convert_triples_to_coordinates(triples):
 #     return code
 
 def normalize_hash(value):
-    # Tính giá trị băm của chuỗi
-    hash_value = abs(hash(value))
+    # Tính giá trị băm của chuỗi: dùng blake2b thay vì hash() vì hash() có muối
+    # ngẫu nhiên cho mỗi tiến trình, mã hóa phải giống nhau giữa các lần chạy
+    hash_value = int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big') >> 1
     # Chia giá trị băm cho giá trị lớn nhất có thể (2^63 - 1 trên hệ thống 64-bit)
     max_hash_value = 2**63 - 1
     normalized_value = hash_value / max_hash_value
     return normalized_value
 
-# Hàm thêm tần suất đếm vào các bộ ba
-def add_frequency_to_triples(coordinates):
-    subject_count = Counter()
-    object_count = Counter()
-
-    # Đếm tần suất xuất hiện của mỗi subject và object
-    for x, y, z in coordinates:
-        subject_count[x] += 1
-        object_count[z] += 1
-
-    triples_with_frequency = []
-    for x, y, z in coordinates:
-        alpha = object_count[x]  # Số lần xuất hiện của x làm object của bộ ba khác
-        beta = subject_count[z]  # Số lần xuất hiện của z làm subject của bộ ba khác
-        triples_with_frequency.append((x, y, z, alpha, beta))
-
-    return triples_with_frequency
-
 # Hàm vẽ biểu đồ phân đoạn ba chiều
 def plot_3d_coordinates(triples, file_name):
     fig = plt.figure(figsize=(12, 12))
@@ -152,38 +170,118 @@ def plot_3d_coordinates(triples, file_name):
     plt.show()
 
 
-def run_mdh(data="data_demo", print_output=False, visualize = False, number_charts = 10):
+# Mỗi tệp RDF được đọc theo luồng đúng một lần: các bộ ba được giữ dưới dạng mảng
+# chỉ số thực thể (24 byte mỗi bộ ba) và các bước mã hóa, đếm tần suất chạy bằng NumPy.
+def run_mdh(data="data_demo", print_output=False, visualize = False, number_charts = 10, workers = None, csv_export = False):
+    if workers and workers > 1:
+        return run_mdh_parallel(data, print_output, visualize, number_charts, workers, csv_export)
     rdf_directory = "../data/LUBM_Data/" + data
+    # các bước trung gian chỉ được in ở mức log "debug"
+    print_steps = print_output == False and instrument.debug_enabled()
+    all_entities = set()
     i = 1
     for file_name in os.listdir(rdf_directory):
-        if file_name.endswith(".rdf"):
-            print("\n\nXÂY DỰNG BIỂU ĐỒ PHÂN ĐOẠN BA CHIỀU CHO DỮ LIỆU TỆP: " + file_name)
-            rdf_file_path = os.path.join(rdf_directory, file_name)
-            triples = compress_uri_triples(rdf_file_path)
-            if print_output == False:
-                print(f"\n1.1. DANH SÁCH CÁC BỘ BA RDF SAU KHI NÉN URI - {file_name}:")
-                print_triples(triples)
-
-            if(len(triples) < 100 & visualize):
-                visualize_rdf_graph(triples, file_name)
-
-            triples, entity_mapping = convert_triples_to_coordinates(triples)
-            if print_output == False:
-                print(f"\n1.2. CHUYỂN HÓA GIÁ TRỊ S, P, O THÀNH TỌA ĐỘ SỐ HỌC - {file_name}:")
-                print_triples(triples)
-            # Lưu bộ mã hóa vào file
-            file_name_no_ext = file_name.replace(".rdf", "")
-            save_entity_mapping_to_file(entity_mapping, f"storage/mdh/{data}/{file_name_no_ext}_entity_mapping.json")
-
-            # Thêm tần suất đếm vào các bộ ba và in ra
-            triples_with_frequency = add_frequency_to_triples(triples)
-            if print_output == False:
-                print(f"\n1.3. THÊM TẦN SUẤT VÀO CÁC BỘ BA - {file_name}")
-                print_triples(triples_with_frequency)
-            # Lưu bộ ba vào file
-            save_triples_with_frequency_to_file(triples_with_frequency, f"storage/mdh/{data}/{file_name_no_ext}_triples_data.json")
+        if is_rdf_file(file_name):
+            with instrument.track_file(file_name):
+                print("\n\nXÂY DỰNG BIỂU ĐỒ PHÂN ĐOẠN BA CHIỀU CHO DỮ LIỆU TỆP: " + file_name)
+                rdf_file_path = os.path.join(rdf_directory, file_name)
+                terms, ids = factorize_triples(iter_triples(rdf_file_path))
+                if print_steps or (visualize and len(ids) < 100):
+                    triples = [(terms[s], terms[p], terms[o]) for s, p, o in ids.tolist()]
+                    if print_steps:
+                        print(f"\n1.1. DANH SÁCH CÁC BỘ BA RDF SAU KHI NÉN URI - {file_name}:")
+                        print_triples(triples)
+                    if visualize and len(triples) < 100:
+                        visualize_rdf_graph(triples, file_name)
+
+                # Mã hóa các thực thể và thêm tần suất đếm vào các bộ ba
+                triples_with_frequency, entity_mapping = encode_triples(terms, ids)
+                if print_steps:
+                    print(f"\n1.2. CHUYỂN HÓA GIÁ TRỊ S, P, O THÀNH TỌA ĐỘ SỐ HỌC - {file_name}:")
+                    print_triples(map(tuple, triples_with_frequency[:, :3].tolist()))
+                    print_entity_mapping(entity_mapping)
+                    print(f"\n1.3. THÊM TẦN SUẤT VÀO CÁC BỘ BA - {file_name}")
+                    print_triples(array_to_triples(triples_with_frequency))
+                all_entities.update(entity_mapping)
+                file_name_no_ext = os.path.splitext(file_name)[0]
+                # Lưu bộ ba vào file
+                save_triples_with_frequency_to_file(triples_with_frequency, f"storage/mdh/{data}/{file_name_no_ext}_triples_data.json", csv_export)
+                instrument.add_counters({"triples": len(ids), "entities": len(terms)})
 
             if(i <= number_charts):
                 # Vẽ biểu đồ phân đoạn ba chiều
-                plot_3d_coordinates(triples_with_frequency, file_name)
-            i+=1
\ No newline at end of file
+                plot_3d_coordinates(array_to_triples(triples_with_frequency), file_name)
+            i+=1
+
+    # Lưu bộ mã hóa của tất cả các tệp vào file
+    save_term_dictionary(all_entities, data)
+
+
+# Hàm chạy trong tiến trình con: đọc, mã hóa và tính tần suất cho một tệp RDF,
+# định dạng sẵn nội dung CSV nếu csv_export. Trả về (bộ mã hóa, các điểm, nội dung
+# CSV, các bộ ba nếu keep_triples để tiến trình cha in hoặc vẽ đồ thị, thời gian xử lý).
+def build_file_mdh(rdf_file_path, keep_triples=False, csv_export=False):
+    start = time.perf_counter()
+    terms, ids = factorize_triples(iter_triples(rdf_file_path))
+    triples_with_frequency, entity_mapping = encode_triples(terms, ids)
+    csv_text = None
+    if csv_export:
+        csv_buffer = io.StringIO(newline='')
+        write_triples_csv(csv_buffer, triples_with_frequency)
+        csv_text = csv_buffer.getvalue()
+    triples = None
+    if keep_triples:
+        triples = [(terms[s], terms[p], terms[o]) for s, p, o in ids.tolist()]
+    return entity_mapping, triples_with_frequency, csv_text, triples, time.perf_counter() - start
+
+# Chạy MDH song song trên `workers` tiến trình: các tiến trình con xử lý từng tệp,
+# tiến trình cha in và ghi kết quả theo đúng thứ tự của lượt chạy tuần tự, nên
+# các file đầu ra giống hệt nhau.
+def run_mdh_parallel(data="data_demo", print_output=False, visualize = False, number_charts = 10, workers = 2, csv_export = False):
+    rdf_directory = "../data/LUBM_Data/" + data
+    file_names = [file_name for file_name in os.listdir(rdf_directory) if is_rdf_file(file_name)]
+    print_steps = print_output == False and instrument.debug_enabled()
+    start = time.time()
+    total_triples = 0
+    all_entities = set()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit(i, file_name):
+            keep_triples = print_steps or visualize
+            return i, file_name, executor.submit(build_file_mdh, os.path.join(rdf_directory, file_name), keep_triples, csv_export)
+
+        # chỉ giữ tối đa 2 * workers tệp đang xử lý để bộ nhớ của tiến trình cha có giới hạn
+        names = enumerate(file_names, start=1)
+        pending = deque(submit(i, file_name) for i, file_name in itertools.islice(names, 2 * workers))
+        while pending:
+            i, file_name, future = pending.popleft()
+            pending.extend(submit(j, next_name) for j, next_name in itertools.islice(names, 1))
+            with instrument.track_file(file_name):
+                entity_mapping, triples_with_frequency, csv_text, triples, worker_seconds = future.result()
+
+                print("\n\nXÂY DỰNG BIỂU ĐỒ PHÂN ĐOẠN BA CHIỀU CHO DỮ LIỆU TỆP: " + file_name)
+                if print_steps:
+                    print(f"\n1.1. DANH SÁCH CÁC BỘ BA RDF SAU KHI NÉN URI - {file_name}:")
+                    print_triples(triples)
+                if visualize and len(triples) < 100:
+                    visualize_rdf_graph(triples, file_name)
+                if print_steps:
+                    print(f"\n1.2. CHUYỂN HÓA GIÁ TRỊ S, P, O THÀNH TỌA ĐỘ SỐ HỌC - {file_name}:")
+                    print_triples(map(tuple, triples_with_frequency[:, :3].tolist()))
+                    print_entity_mapping(entity_mapping)
+                    print(f"\n1.3. THÊM TẦN SUẤT VÀO CÁC BỘ BA - {file_name}")
+                    print_triples(array_to_triples(triples_with_frequency))
+                file_name_no_ext = os.path.splitext(file_name)[0]
+                save_triples_with_frequency_to_file(triples_with_frequency, f"storage/mdh/{data}/{file_name_no_ext}_triples_data.json")
+                if csv_text is not None:
+                    save_triples_csv_text(csv_text, f"storage/mdh/{data}/{file_name_no_ext}_triples_data.json")
+                # thời gian trong tiến trình con, tệp được xử lý song song với các tệp khác
+                instrument.add_counters({"triples": len(triples_with_frequency), "entities": len(entity_mapping),
+                                         "worker_seconds": worker_seconds})
+            if(i <= number_charts):
+                plot_3d_coordinates(array_to_triples(triples_with_frequency), file_name)
+            total_triples += len(triples_with_frequency)
+            all_entities.update(entity_mapping)
+
+    save_term_dictionary(all_entities, data)
+    print(f"\nĐÃ XỬ LÝ {len(file_names)} TỆP VỚI {workers} TIẾN TRÌNH: {total_triples} bộ ba, "
+          f"{len(all_entities)} thực thể khác nhau, {time.time() - start:.2f} giây")
@@ -0,0 +1,257 @@
+import os
+import pathlib
+import itertools
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin
+
+# Đọc bộ ba RDF theo kiểu luồng (streaming): mỗi bộ ba đã nén URI được trả về
+# ngay khi đọc được, không dựng toàn bộ rdflib.Graph trong bộ nhớ.
+# - RDF/XML: phân tích XML tăng dần (ElementTree.iterparse), các phần tử đã xử
+#   xong được giải phóng sau mỗi mô tả cấp cao nhất
+# - N-Triples: đọc từng dòng
+# Khác với rdflib.Graph, các bộ ba trùng lặp không bị loại bỏ và được trả về
+# theo thứ tự xuất hiện trong tệp.
+
+RDF_NS = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+
+RDF_RDF = "{%s}RDF" % RDF_NS
+RDF_DESCRIPTION = "{%s}Description" % RDF_NS
+RDF_ABOUT = "{%s}about" % RDF_NS
+RDF_ID = "{%s}ID" % RDF_NS
+RDF_NODEID = "{%s}nodeID" % RDF_NS
+RDF_RESOURCE = "{%s}resource" % RDF_NS
+RDF_PARSETYPE = "{%s}parseType" % RDF_NS
+RDF_DATATYPE = "{%s}datatype" % RDF_NS
+RDF_TYPE_ATTR = "{%s}type" % RDF_NS
+RDF_LI = "{%s}li" % RDF_NS
+XML_BASE = "{%s}base" % XML_NS
+
+RDF_TYPE = RDF_NS + "type"
+RDF_FIRST = RDF_NS + "first"
+RDF_REST = RDF_NS + "rest"
+RDF_NIL = RDF_NS + "nil"
+RDF_STATEMENT = RDF_NS + "Statement"
+
+# Các thuộc tính cú pháp, không sinh bộ ba
+SYNTAX_ATTRIBUTES = {RDF_ABOUT, RDF_ID, RDF_NODEID, RDF_RESOURCE, RDF_PARSETYPE, RDF_DATATYPE}
+
+# Hàm nén URI của một bộ ba: lấy phần cuối cùng của URI
+def compress_triple(subj, pred, obj):
+    return subj.split("/")[-1], pred.split("#")[-1], obj.split("/")[-1]
+
+def _tag_uri(tag):
+    # "{namespace}local" -> namespace + local
+    if tag[0] == "{":
+        ns, local = tag[1:].split("}", 1)
+        return ns + local
+    return tag
+
+# Khung của một phần tử đang mở trong tài liệu RDF/XML
+class _Frame:
+    __slots__ = ("kind", "subject", "predicate", "base", "obj", "parse_type", "members", "li", "reify")
+
+    def __init__(self, kind, base, subject=None, predicate=None):
+        self.kind = kind  # "rdf", "node", "property" hoặc "literal" (bên trong parseType="Literal")
+        self.base = base
+        self.subject = subject
+        self.predicate = predicate
+        self.obj = None
+        self.parse_type = None
+        self.members = None
+        self.li = 0
+        self.reify = None
+
+# Hàm đọc bộ ba (chưa nén) từ tệp RDF/XML theo kiểu luồng
+def iter_rdfxml_raw(rdf_file_path):
+    base = pathlib.Path(os.path.abspath(rdf_file_path)).as_uri()
+    bnodes = itertools.count()
+    stack = []
+    root = None
+
+    def new_bnode():
+        return "_:b%d" % next(bnodes)
+
+    for event, elem in ET.iterparse(rdf_file_path, events=("start", "end")):
+        if event == "start":
+            parent = stack[-1] if stack else None
+            elem_base = parent.base if parent else base
+            if elem.get(XML_BASE) is not None:
+                elem_base = urljoin(elem_base, elem.get(XML_BASE))
+            if root is None:
+                root = elem
+
+            if parent is not None and (parent.kind == "literal" or parent.parse_type == "Literal"):
+                # nội dung của rdf:parseType="Literal" được giữ nguyên đến khi phần tử thuộc tính đóng
+                stack.append(_Frame("literal", elem_base))
+                continue
+
+            if parent is None and elem.tag == RDF_RDF:
+                stack.append(_Frame("rdf", elem_base))
+                continue
+
+            if parent is None or parent.kind == "rdf" or (parent.kind == "property" and parent.parse_type in (None, "Collection")):
+                # phần tử nút: xác định chủ ngữ
+                if elem.get(RDF_ABOUT) is not None:
+                    subject = urljoin(elem_base, elem.get(RDF_ABOUT))
+                elif elem.get(RDF_ID) is not None:
+                    subject = urljoin(elem_base, "#" + elem.get(RDF_ID))
+                elif elem.get(RDF_NODEID) is not None:
+                    subject = "_:" + elem.get(RDF_NODEID)
+                else:
+                    subject = new_bnode()
+                frame = _Frame("node", elem_base, subject=subject)
+                stack.append(frame)
+                if parent is not None and parent.kind == "property":
+                    if parent.parse_type == "Collection":
+                        parent.members.append(subject)
+                    else:
+                        parent.obj = subject
+                if elem.tag != RDF_DESCRIPTION:
+                    yield subject, RDF_TYPE, _tag_uri(elem.tag)
+                for name, value in elem.attrib.items():
+                    if name == RDF_TYPE_ATTR:
+                        yield subject, RDF_TYPE, urljoin(elem_base, value)
+                    elif name not in SYNTAX_ATTRIBUTES and not name.startswith("{%s}" % XML_NS):
+                        yield subject, _tag_uri(name), value
+                continue
+
+            # phần tử thuộc tính (con của một phần tử nút hoặc của parseType="Resource")
+            subject = parent.subject if parent.kind == "node" else parent.obj
+            if elem.tag == RDF_LI:
+                parent.li += 1
+                predicate = RDF_NS + "_%d" % parent.li
+            else:
+                predicate = _tag_uri(elem.tag)
+            frame = _Frame("property", elem_base, subject=subject, predicate=predicate)
+            frame.parse_type = elem.get(RDF_PARSETYPE)
+            if frame.parse_type == "Resource":
+                frame.obj = new_bnode()
+            elif frame.parse_type == "Collection":
+                frame.members = []
+            if elem.get(RDF_ID) is not None:
+                frame.reify = urljoin(elem_base, "#" + elem.get(RDF_ID))
+            if elem.get(RDF_RESOURCE) is not None:
+                frame.obj = urljoin(elem_base, elem.get(RDF_RESOURCE))
+            elif elem.get(RDF_NODEID) is not None:
+                frame.obj = "_:" + elem.get(RDF_NODEID)
+            property_attributes = [(name, value) for name, value in elem.attrib.items()
+                                   if name not in SYNTAX_ATTRIBUTES and not name.startswith("{%s}" % XML_NS)]
+            if property_attributes:
+                # thuộc tính trên phần tử thuộc tính rỗng: đối tượng là một nút trống mới
+                if frame.obj is None:
+                    frame.obj = new_bnode()
+                for name, value in property_attributes:
+                    if name == RDF_TYPE_ATTR:
+                        yield frame.obj, RDF_TYPE, urljoin(elem_base, value)
+                    else:
+                        yield frame.obj, _tag_uri(name), value
+            stack.append(frame)
+            continue
+
+        # event == "end"
+        frame = stack.pop()
+        if frame.kind == "literal":
+            continue
+        if frame.kind == "property":
+            if frame.parse_type == "Literal":
+                # giá trị là nội dung XML của phần tử
+                obj = (elem.text or "") + "".join(ET.tostring(child, encoding="unicode") for child in elem)
+            elif frame.parse_type == "Collection":
+                # danh sách RDF: rdf:first / rdf:rest
+                cells = [new_bnode() for _ in frame.members]
+                for k, member in enumerate(frame.members):
+                    yield cells[k], RDF_FIRST, member
+                    yield cells[k], RDF_REST, cells[k + 1] if k + 1 < len(cells) else RDF_NIL
+                obj = cells[0] if cells else RDF_NIL
+            elif frame.obj is not None:
+                obj = frame.obj
+            else:
+                obj = elem.text or ""
+            yield frame.subject, frame.predicate, obj
+            if frame.reify is not None:
+                # rdf:ID trên phần tử thuộc tính: tạo bộ ba mô tả (reification) cho câu vừa đọc
+                yield frame.reify, RDF_TYPE, RDF_STATEMENT
+                yield frame.reify, RDF_NS + "subject", frame.subject
+                yield frame.reify, RDF_NS + "predicate", frame.predicate
+                yield frame.reify, RDF_NS + "object", obj
+        if len(stack) == 1 and stack[0].kind == "rdf" or not stack:
+            # một mô tả cấp cao nhất đã xong: giải phóng cây XML đã đọc
+            if root is not None:
+                root.clear()
+
+# Hàm bỏ dấu thoát trong chuỗi N-Triples (\t \n \r \" \\ \uXXXX \UXXXXXXXX)
+def _unescape(s):
+    if "\\" not in s:
+        return s
+    out = []
+    i = 0
+    n = len(s)
+    while i < n:
+        c = s[i]
+        if c != "\\" or i + 1 >= n:
+            out.append(c)
+            i += 1
+            continue
+        e = s[i + 1]
+        if e == "u":
+            out.append(chr(int(s[i + 2:i + 6], 16)))
+            i += 6
+        elif e == "U":
+            out.append(chr(int(s[i + 2:i + 10], 16)))
+            i += 10
+        else:
+            out.append({"t": "\t", "n": "\n", "r": "\r", "b": "\b", "f": "\f"}.get(e, e))
+            i += 2
+    return "".join(out)
+
+def _nt_term(term):
+    if term[0] == "<":
+        return _unescape(term[1:-1])
+    return term  # nút trống "_:x"
+
+# Hàm đọc bộ ba (chưa nén) từ tệp N-Triples, mỗi dòng một bộ ba
+def iter_ntriples_raw(nt_file_path):
+    with open(nt_file_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line[0] == "#":
+                continue
+            try:
+                subj, pred, rest = line.split(None, 2)
+                rest = rest.rstrip()
+                if not rest.endswith("."):
+                    raise ValueError
+                rest = rest[:-1].rstrip()
+                if rest[0] == '"':
+                    # literal: phần giữa dấu nháy mở và dấu nháy đóng cuối cùng,
+                    # bỏ qua @lang hoặc ^^<datatype> phía sau
+                    obj = _unescape(rest[1:rest.rindex('"')])
+                else:
+                    obj = _nt_term(rest)
+            except ValueError:
+                raise ValueError(f"Dòng N-Triples không hợp lệ ({nt_file_path}:{line_number}): {line}")
+            yield _nt_term(subj), _nt_term(pred), obj
+
+# Hàm chọn bộ đọc theo phần mở rộng của tệp
+READERS = {
+    ".rdf": iter_rdfxml_raw,
+    ".owl": iter_rdfxml_raw,
+    ".xml": iter_rdfxml_raw,
+    ".nt": iter_ntriples_raw,
+}
+
+def is_rdf_file(file_name):
+    return os.path.splitext(file_name)[1].lower() in READERS
+
+# Hàm đọc tệp RDF và trả về lần lượt các bộ ba đã nén URI (subj, pred, obj)
+def iter_triples(rdf_file_path):
+    reader = READERS.get(os.path.splitext(rdf_file_path)[1].lower())
+    if reader is None:
+        raise ValueError(f"Không hỗ trợ định dạng tệp: {rdf_file_path}")
+    for subj, pred, obj in reader(rdf_file_path):
+        if subj.startswith("_:"):
+            subj = subj[2:]
+        if obj.startswith("_:"):
+            obj = obj[2:]
+        yield compress_triple(subj, pred, obj)
@@ -0,0 +1,202 @@
+import os
+import mmap
+import struct
+import numpy as np
+
+# Từ điển thực thể toàn cục của một bộ dữ liệu, lưu ở dạng nhị phân gọn và được
+# đọc bằng mmap: tra cứu chuỗi -> id và id -> chuỗi không cần nạp toàn bộ từ điển.
+# - id của một thực thể là thứ hạng của nó trong danh sách đã sắp xếp (theo byte UTF-8)
+# - các chuỗi được nén tiền tố (front coding) theo khối BLOCK_SIZE chuỗi: chuỗi đầu
+#   khối được ghi đầy đủ, các chuỗi sau chỉ ghi độ dài tiền tố chung và phần còn lại
+# - mỗi id có một mã hóa (tọa độ trong [0, 1], xem normalize_hash trong mdh.py);
+#   mảng mã hóa đã sắp xếp cho phép giải mã tọa độ -> thực thể bằng tìm kiếm nhị phân
+#
+# Bố cục file (little-endian):
+#     header: magic (4 byte) | version u16 | block_size u16 | số thực thể u64 | số khối u64
+#     offsets: u64[số khối]  vị trí của từng khối trong phần chuỗi
+#     codes: f64[n]          mã hóa theo id
+#     code_order: u64[n]     các id theo thứ tự mã hóa tăng dần
+#     sorted_codes: f64[n]   codes[code_order]
+#     chuỗi: các khối front coding, độ dài ghi bằng varint
+
+MAGIC = b'RTDC'
+VERSION = 1
+BLOCK_SIZE = 16
+HEADER = struct.Struct('<4sHHQQ')
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(buf, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def _common_prefix(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+# Hàm ghi từ điển: terms là tập các thực thể, encode(term) trả về mã hóa của thực thể
+def write_term_dictionary(terms, file_path, encode, block_size=BLOCK_SIZE):
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    sorted_terms = sorted(term.encode('utf-8') for term in set(terms))
+    n = len(sorted_terms)
+
+    strings = bytearray()
+    offsets = []
+    previous = b''
+    for i, term in enumerate(sorted_terms):
+        if i % block_size == 0:
+            offsets.append(len(strings))
+            _write_varint(strings, len(term))
+            strings += term
+        else:
+            shared = _common_prefix(previous, term)
+            _write_varint(strings, shared)
+            _write_varint(strings, len(term) - shared)
+            strings += term[shared:]
+        previous = term
+
+    codes = np.array([encode(term.decode('utf-8')) for term in sorted_terms], dtype='<f8')
+    code_order = np.argsort(codes, kind='stable').astype('<u8')
+
+    with open(file_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, block_size, n, len(offsets)))
+        f.write(np.asarray(offsets, dtype='<u8').tobytes())
+        f.write(codes.tobytes())
+        f.write(code_order.tobytes())
+        f.write(codes[code_order].tobytes())
+        f.write(bytes(strings))
+    return file_path
+
+class TermDictionary:
+    def __init__(self, file_path):
+        """
+        Read-only view of a term dictionary written by write_term_dictionary.
+        Behaves like a dict from term to code (`term in d`, `d[term]`,
+        `d.get(term)`), which is what the query modules expect of an
+        entity mapping.
+        """
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.block_size, self.n, n_blocks = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Không phải file từ điển thực thể: {file_path}")
+        offset = HEADER.size
+        self._offsets = np.frombuffer(self._mm, dtype='<u8', count=n_blocks, offset=offset)
+        offset += 8 * n_blocks
+        self.codes = np.frombuffer(self._mm, dtype='<f8', count=self.n, offset=offset)
+        offset += 8 * self.n
+        self._code_order = np.frombuffer(self._mm, dtype='<u8', count=self.n, offset=offset)
+        offset += 8 * self.n
+        self._sorted_codes = np.frombuffer(self._mm, dtype='<f8', count=self.n, offset=offset)
+        offset += 8 * self.n
+        self._strings = offset
+
+    def close(self):
+        # các mảng NumPy trỏ vào vùng mmap phải được bỏ trước khi đóng
+        self._offsets = self.codes = self._code_order = self._sorted_codes = None
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.n
+
+    # Giải mã các chuỗi của một khối, dừng sau `count` chuỗi
+    def _block_terms(self, block, count=None):
+        pos = self._strings + int(self._offsets[block])
+        buf = self._mm
+        length, pos = _read_varint(buf, pos)
+        term = buf[pos:pos + length]
+        pos += length
+        terms = [term]
+        last = min(self.block_size, self.n - block * self.block_size)
+        if count is not None:
+            last = min(last, count)
+        for _ in range(last - 1):
+            shared, pos = _read_varint(buf, pos)
+            length, pos = _read_varint(buf, pos)
+            term = term[:shared] + buf[pos:pos + length]
+            pos += length
+            terms.append(term)
+        return terms
+
+    def _first_term(self, block):
+        pos = self._strings + int(self._offsets[block])
+        length, pos = _read_varint(self._mm, pos)
+        return self._mm[pos:pos + length]
+
+    # id -> chuỗi
+    def term(self, term_id):
+        if not 0 <= term_id < self.n:
+            raise IndexError(term_id)
+        block, k = divmod(term_id, self.block_size)
+        return self._block_terms(block, k + 1)[k].decode('utf-8')
+
+    # chuỗi -> id, None nếu không có trong từ điển
+    def id_of(self, term):
+        key = term.encode('utf-8')
+        # tìm khối cuối cùng có chuỗi đầu <= key
+        lo, hi = 0, len(self._offsets)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._first_term(mid) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        block = lo - 1
+        if block < 0:
+            return None
+        for k, candidate in enumerate(self._block_terms(block)):
+            if candidate == key:
+                return block * self.block_size + k
+            if candidate > key:
+                break
+        return None
+
+    def __contains__(self, term):
+        return self.id_of(term) is not None
+
+    # chuỗi -> mã hóa
+    def __getitem__(self, term):
+        term_id = self.id_of(term)
+        if term_id is None:
+            raise KeyError(term)
+        return float(self.codes[term_id])
+
+    def get(self, term, default=None):
+        term_id = self.id_of(term)
+        return default if term_id is None else float(self.codes[term_id])
+
+    # mã hóa -> các thực thể có mã hóa đó (thường chỉ một)
+    def terms_of_code(self, code):
+        lo = int(np.searchsorted(self._sorted_codes, code, side='left'))
+        hi = int(np.searchsorted(self._sorted_codes, code, side='right'))
+        return [self.term(int(term_id)) for term_id in self._code_order[lo:hi]]
+
+    # Giải mã một bộ ba (x, y, z, ...) thành (subj, pred, obj)
+    def decode_triple(self, triple):
+        return tuple(' | '.join(self.terms_of_code(code)) or str(code) for code in triple[:3])
+
+# Đường dẫn của từ điển thực thể của bộ dữ liệu `data`
+def term_dictionary_path(data):
+    return f"storage/mdh/{data}/terms.dict"
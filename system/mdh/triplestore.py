@@ -0,0 +1,119 @@
+import os
+import struct
+import numpy as np
+
+# Kho bộ ba dạng cột nhị phân giữa bước MDH và bước xây dựng R*-tree: mỗi cột
+# (x, y, z, alpha, beta) là một mảng có kiểu cố định, được đọc lại qua numpy.memmap
+# mà không cần phân tích văn bản (giá trị float64 được giữ nguyên từng bit).
+#
+# Bố cục file (little-endian):
+#     header (64 byte): magic (4 byte) | version u16 | số cột u16 | số bộ ba u64 | phần đệm
+#     các cột nối tiếp nhau, mỗi cột n phần tử theo COLUMNS
+
+MAGIC = b'RTTS'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQ')
+HEADER_SIZE = 64
+COLUMNS = (('x', '<f8'), ('y', '<f8'), ('z', '<f8'), ('alpha', '<i8'), ('beta', '<i8'))
+
+# Hàm ghi mảng (N, 5) các bộ (x, y, z, alpha, beta) thành file kho bộ ba
+def write_triple_store(triples_with_frequency, file_path):
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    points = np.asarray(triples_with_frequency, dtype=float).reshape(-1, len(COLUMNS))
+    with open(file_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(COLUMNS), len(points)).ljust(HEADER_SIZE, b'\0'))
+        for k, (name, dtype) in enumerate(COLUMNS):
+            f.write(points[:, k].astype(dtype).tobytes())
+    return file_path
+
+class TripleStore:
+    def __init__(self, file_path):
+        """
+        Read-only, memory-mapped view of a file written by write_triple_store.
+        Each column is a NumPy array backed by the file (no copy), available
+        as an attribute (`store.x`, ..., `store.beta`) or via `store.columns`.
+        """
+        self.file_path = file_path
+        self._mm = np.memmap(file_path, dtype=np.uint8, mode='r')
+        magic, version, n_columns, self.n = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or n_columns != len(COLUMNS):
+            raise ValueError(f"Không phải file kho bộ ba: {file_path}")
+        self.columns = {}
+        offset = HEADER_SIZE
+        for name, dtype in COLUMNS:
+            size = self.n * np.dtype(dtype).itemsize
+            self.columns[name] = self._mm[offset:offset + size].view(dtype)
+            offset += size
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get('columns')
+        if columns is not None and name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def __len__(self):
+        return self.n
+
+    # Mảng (N, 5) float64 các bộ (x, y, z, alpha, beta), giống các dòng của file CSV
+    def points(self):
+        return np.column_stack([self.columns[name] for name, _ in COLUMNS]).astype(float, copy=False)
+
+    # Các bộ (chỉ số, [x, y, z, alpha, beta]) của các dòng start..stop, đọc dần từ memmap
+    def rows(self, start=0, stop=None):
+        return TripleRows(self, start, self.n if stop is None else stop)
+
+    def close(self):
+        # bỏ các mảng trỏ vào vùng memmap để file được đóng
+        self.columns = None
+        self._mm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Số dòng được chuyển thành danh sách Python mỗi lần khi duyệt TripleRows
+CHUNK_ROWS = 4096
+
+class TripleRows:
+    def __init__(self, store, start, stop):
+        """
+        Sequence of (row index, [x, y, z, alpha, beta]) over rows start..stop
+        of a TripleStore, as the R*-tree loaders expect (like enumerate over
+        the CSV rows). Rows are read from the memory-mapped columns when
+        accessed, CHUNK_ROWS at a time while iterating, and slices are views,
+        so the whole file is never held as a list. The store must stay open
+        while the rows are used.
+        """
+        self.store = store
+        self.start = start
+        self.stop = max(start, stop)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def _chunk(self, start, stop):
+        columns = self.store.columns
+        return np.column_stack([columns[name][start:stop] for name, _ in COLUMNS]).astype(float).tolist()
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            return TripleRows(self.store, self.start + start, self.start + stop)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.start + i, self._chunk(self.start + i, self.start + i + 1)[0]
+
+    def __iter__(self):
+        for start in range(self.start, self.stop, CHUNK_ROWS):
+            stop = min(start + CHUNK_ROWS, self.stop)
+            yield from zip(range(start, stop), self._chunk(start, stop))
+
+# Đường dẫn kho bộ ba của tệp RDF `file_name_no_ext` trong bộ dữ liệu `data`
+def triple_store_path(data, file_name_no_ext):
+    return f"storage/mdh/{data}/{file_name_no_ext}_triples_data.tri"
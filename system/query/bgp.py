@@ -0,0 +1,357 @@
+import re
+from collections import defaultdict, Counter
+
+from mdh.stream import compress_triple, RDF_TYPE
+from mdh.termdict import TermDictionary
+from query.query import load_indexes, filter_phase, count_phase
+from kdtree.search import load_all_kdtrees, refine_phase, partial_match_box
+import instrument.instrument as instrument
+
+# Truy vấn SPARQL dạng basic graph pattern (BGP): nhiều mẫu bộ ba có biến chung, ví dụ
+#     SELECT ?x ?c WHERE { ?x ub:takesCourse ?c . <http://www.Department0.University0.edu/FullProfessor0> ub:teacherOf ?c }
+# - isSPARQL (is_sparql) và parse_sparql tách truy vấn thành các mẫu đơn
+# - mỗi mẫu đơn được trả lời qua chỉ mục: FilterPhase trên cây R*-tree, RefinePhase trên cây k-d
+# - JOIN: các tập kết quả được kết nối theo biến chung bằng hash join
+# - thứ tự kết nối được chọn dần, mẫu có ít kết quả nhất trước: số bộ ba khớp với một mẫu được
+#   đếm từ số điểm lưu ở các nút của cây R*-tree (count_phase), số dòng sau kết nối được ước
+#   lượng cũng bằng count_phase với biến kết nối nhận từng giá trị (tối đa ESTIMATE_SAMPLE giá trị)
+# - khi biến kết nối chỉ có ít giá trị, mẫu tiếp theo được tìm theo từng giá trị (bind join:
+#   mỗi giá trị là một hộp truy vấn hẹp) thay vì đọc toàn bộ các bộ ba khớp với mẫu
+
+# Tiền tố mặc định của các truy vấn LUBM
+DEFAULT_PREFIXES = {
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "ub": "http://swat.cse.lehigh.edu/onto/univ-bench.owl#",
+}
+
+# Chi phí ước lượng của một lần tìm theo một giá trị trên một cây R*-tree, tính bằng số
+# bộ ba tương đương khi đọc toàn bộ kết quả của mẫu
+PROBE_COST = 16
+
+# Số giá trị tối đa của biến kết nối được đếm khi ước lượng số dòng sau kết nối, các giá
+# trị còn lại được ngoại suy từ mẫu này
+ESTIMATE_SAMPLE = 64
+
+# Các token: IRI, literal, dấu câu, dấu chấm kết thúc mẫu, và các từ còn lại (tên có tiền tố,
+# biến, từ khóa, tên đã nén như www.Department0.University0.edu)
+TOKEN = re.compile(r'<[^>]*>|"(?:[^"\\]|\\.)*"(?:@[\w-]+|\^\^\S+?(?=[\s{};,]|\.(?:\s|\}|$)|$))?|[{};,]'
+                   r'|\.(?=\s|\}|$)|[^\s{};,]+?(?=\.(?:\s|\}|$)|[\s{};,]|$)')
+
+# isSPARQL: truy vấn SPARQL (có khối { ... }) hay một mẫu đơn "s p o"
+def is_sparql(query):
+    return '{' in query
+
+# Hàm chuyển một token ở vị trí `position` (0: subject, 1: predicate, 2: object) thành
+# thực thể đã nén như trong mdh/stream.py, biến được giữ nguyên dạng '?tên'
+def resolve_term(token, position, prefixes):
+    if token[0] in '?$':
+        return '?' + token[1:]
+    if position == 1 and token == 'a':
+        iri = RDF_TYPE
+    elif token.startswith('<'):
+        iri = token[1:-1]
+    elif token.startswith('"'):
+        iri = re.match(r'"((?:[^"\\]|\\.)*)"', token).group(1)
+    elif ':' in token:
+        prefix, local = token.split(':', 1)
+        if prefix not in prefixes:
+            raise ValueError(f"Tiền tố chưa được khai báo: {prefix}")
+        iri = prefixes[prefix] + local
+    else:
+        iri = token
+    return compress_triple(iri, iri, iri)[position]
+
+# Hàm tách truy vấn SPARQL thành các mẫu đơn
+# Hỗ trợ PREFIX, SELECT [DISTINCT] (biến | *), WHERE { mẫu . mẫu ; ... , ... } và LIMIT
+# Trả về (danh sách biến được chọn hoặc None với *, danh sách mẫu (s, p, o), distinct, limit)
+def parse_sparql(query):
+    tokens = TOKEN.findall(query)
+    prefixes = dict(DEFAULT_PREFIXES)
+    i = 0
+
+    def expect(value):
+        nonlocal i
+        if i >= len(tokens) or tokens[i] != value:
+            raise ValueError(f"Truy vấn SPARQL không hợp lệ: cần '{value}' tại {' '.join(tokens[i:i+3]) or 'cuối truy vấn'}")
+        i += 1
+
+    while i < len(tokens) and tokens[i].upper() in ("PREFIX", "BASE"):
+        if tokens[i].upper() == "PREFIX":
+            prefixes[tokens[i+1].rstrip(':')] = tokens[i+2][1:-1]
+            i += 3
+        else:
+            i += 2
+
+    select, distinct, limit = None, False, None
+    if i < len(tokens) and tokens[i].upper() == "SELECT":
+        i += 1
+        if i < len(tokens) and tokens[i].upper() in ("DISTINCT", "REDUCED"):
+            distinct = tokens[i].upper() == "DISTINCT"
+            i += 1
+        select = []
+        while i < len(tokens) and tokens[i] not in ('{',) and tokens[i].upper() != "WHERE":
+            if tokens[i] != '*':
+                select.append('?' + tokens[i][1:])
+            i += 1
+        select = select or None
+    if i < len(tokens) and tokens[i].upper() == "WHERE":
+        i += 1
+    expect('{')
+
+    patterns = []
+    while i < len(tokens) and tokens[i] != '}':
+        subj = resolve_term(tokens[i], 0, prefixes)
+        i += 1
+        # danh sách vị từ - đối tượng: p o , o ; p o ...
+        while True:
+            pred = resolve_term(tokens[i], 1, prefixes)
+            i += 1
+            while True:
+                if i >= len(tokens) or tokens[i] in ('}', '.', ';', ','):
+                    raise ValueError(f"Truy vấn SPARQL không hợp lệ: thiếu đối tượng sau {pred}")
+                patterns.append((subj, pred, resolve_term(tokens[i], 2, prefixes)))
+                i += 1
+                if i < len(tokens) and tokens[i] == ',':
+                    i += 1
+                    continue
+                break
+            if i < len(tokens) and tokens[i] == ';':
+                i += 1
+                if i < len(tokens) and tokens[i] not in ('.', '}'):
+                    continue
+            break
+        if i < len(tokens) and tokens[i] == '.':
+            i += 1
+    expect('}')
+    if i + 1 < len(tokens) and tokens[i].upper() == "LIMIT":
+        limit = int(tokens[i+1])
+    if not patterns:
+        raise ValueError("Truy vấn SPARQL không có mẫu nào")
+    return select, patterns, distinct, limit
+
+# Biến của mẫu đã tách: '?tên' (các vị trí ràng buộc là thực thể hoặc mã hóa của nó)
+def is_variable(term):
+    return isinstance(term, str) and term.startswith('?')
+
+# Các biến của một mẫu theo thứ tự xuất hiện đầu tiên
+def pattern_variables(pattern):
+    return list(dict.fromkeys(term for term in pattern if is_variable(term)))
+
+# Chuyển các bộ ba khớp thành các dòng giá trị của biến, không trùng lặp (cùng một bộ ba
+# có thể xuất hiện ở nhiều tệp với alpha, beta khác nhau). Bỏ các bộ ba mà một biến lặp
+# lại trong mẫu, ví dụ ?x p ?x, có hai giá trị khác nhau
+def triples_to_rows(pattern, triples):
+    variables = pattern_variables(pattern)
+    positions = [[k for k in range(3) if pattern[k] == v] for v in variables]
+    rows = {}
+    for t in triples:
+        if all(t[ks[0]] == t[k] for ks in positions for k in ks[1:]):
+            rows[tuple(t[ks[0]] for ks in positions)] = None
+    return variables, list(rows)
+
+# JOIN: hash join hai tập kết quả theo các biến chung (tích Descartes nếu không có biến chung)
+# Bảng băm được xây trên tập nhỏ hơn. Trả về (danh sách biến, các dòng)
+def hash_join(left_vars, left_rows, right_vars, right_rows):
+    shared = [v for v in left_vars if v in right_vars]
+    out_vars = left_vars + [v for v in right_vars if v not in left_vars]
+    left_key = [left_vars.index(v) for v in shared]
+    right_key = [right_vars.index(v) for v in shared]
+    right_rest = [k for k, v in enumerate(right_vars) if v not in left_vars]
+
+    build_left = len(left_rows) <= len(right_rows)
+    table = defaultdict(list)
+    if build_left:
+        for row in left_rows:
+            table[tuple(row[k] for k in left_key)].append(row)
+        rows = [l + tuple(r[k] for k in right_rest)
+                for r in right_rows for l in table.get(tuple(r[k] for k in right_key), ())]
+    else:
+        for row in right_rows:
+            table[tuple(row[k] for k in right_key)].append(tuple(row[k] for k in right_rest))
+        rows = [l + r for l in left_rows for r in table.get(tuple(l[k] for k in left_key), ())]
+    return out_vars, rows
+
+class BGPEngine:
+    def __init__(self, indexes, kdtrees):
+        """
+        Evaluates basic graph patterns over the indexes returned by
+        load_indexes and load_all_kdtrees.
+        """
+        self.indexes = indexes
+        self.kdtrees = kdtrees
+        self.entity_mappings = [mapping for _, mapping in indexes.values()]
+        self._reverse = None
+        self.probes = 0
+        self._counts = {}
+
+    # Mã hóa của một thực thể, None nếu thực thể không có trong bộ mã hóa
+    def encode(self, term):
+        return next((mapping[term] for mapping in self.entity_mappings if term in mapping), None)
+
+    # Giải mã một giá trị về (các) thực thể có mã hóa đó
+    def decode(self, code):
+        mapping = self.entity_mappings[0] if self.entity_mappings else {}
+        if isinstance(mapping, TermDictionary):
+            terms = mapping.terms_of_code(code)
+        else:
+            if self._reverse is None:
+                self._reverse = defaultdict(list)
+                for m in self.entity_mappings:
+                    for term, c in m.items():
+                        if term not in self._reverse[c]:
+                            self._reverse[c].append(term)
+            terms = self._reverse.get(code, [])
+        return ' | '.join(terms) or str(code)
+
+    # Số bộ ba khớp với mẫu đã mã hóa (None ở vị trí tự do), đếm từ số điểm lưu ở các nút
+    # của cây R*-tree (count_phase) thay vì ước lượng
+    def count(self, codes):
+        key = tuple(codes)
+        if key not in self._counts:
+            box = partial_match_box(codes)
+            self._counts[key] = sum(count_phase(rtree_data, box)[0] for rtree_data, _ in self.indexes.values())
+        return self._counts[key]
+
+    # FilterPhase và RefinePhase của một mẫu đã mã hóa (None ở vị trí tự do) trên mọi tệp
+    def match(self, codes):
+        self.probes += 1
+        box = partial_match_box(codes)
+        tupleset = set()
+        for name, (rtree_data, _) in self.indexes.items():
+            kdtree_ids, _ = filter_phase(rtree_data, box)
+            if kdtree_ids:
+                tupleset.update(refine_phase(self.kdtrees[name], kdtree_ids, box))
+        return tupleset
+
+    # Ước lượng số dòng khi kết nối các dòng hiện có với mẫu qua biến `variable`:
+    # tổng, trên các giá trị của biến, của số bộ ba khớp với mẫu khi biến nhận giá trị đó
+    # (count). Khi biến có nhiều hơn ESTIMATE_SAMPLE giá trị, chỉ một mẫu cách đều các
+    # giá trị đã sắp xếp được đếm và tổng được nhân theo tỉ lệ số dòng
+    def join_estimate(self, codes, variable, values):
+        items = sorted(values.items())
+        if len(items) > ESTIMATE_SAMPLE:
+            step = len(items) / ESTIMATE_SAMPLE
+            sample = [items[int(k * step)] for k in range(ESTIMATE_SAMPLE)]
+            scale = sum(values.values()) / sum(count for _, count in sample)
+        else:
+            sample, scale = items, 1.0
+        estimate = 0.0
+        for value, count in sample:
+            bound = [value if term == variable else (None if is_variable(term) else term) for term in codes]
+            estimate += count * self.count(bound)
+        return scale * estimate
+
+    def evaluate(self, patterns):
+        """
+        Evaluate a basic graph pattern
+        ------------------------------
+        Parameters:
+        -----------
+        patterns: list of (s, p, o), variables start with '?'
+
+        Returns:
+        --------
+        variables, rows: the solutions, one tuple of codes per row
+        plan: one record per joined pattern (order, method, estimated and
+        actual number of rows)
+        """
+        encoded = []
+        for pattern in patterns:
+            codes = tuple(term if is_variable(term) else self.encode(term) for term in pattern)
+            if None in codes:
+                # một thực thể ràng buộc không có trong bộ mã hóa: không có kết quả
+                return pattern_variables([t for p in patterns for t in p]), [], []
+            encoded.append(codes)
+        constants = lambda codes: [None if is_variable(term) else term for term in codes]
+
+        variables, rows = [], None
+        remaining = list(range(len(encoded)))
+        plan = []
+        while remaining:
+            if rows is None:
+                # mẫu đầu tiên: ước lượng số kết quả nhỏ nhất
+                choice = min(remaining, key=lambda j: self.count(constants(encoded[j])))
+                estimate = self.count(constants(encoded[choice]))
+                join_variable = None
+            else:
+                # mẫu tiếp theo: ưu tiên các mẫu có biến chung, theo ước lượng số dòng sau kết nối
+                best = None
+                for j in remaining:
+                    shared = [v for v in pattern_variables(encoded[j]) if v in variables]
+                    if shared:
+                        candidates = []
+                        for v in shared:
+                            values = Counter(row[variables.index(v)] for row in rows)
+                            candidates.append((self.join_estimate(encoded[j], v, values), v, len(values)))
+                        estimate, v, distinct = min(candidates)
+                        key = (0, estimate)
+                    else:
+                        estimate, v, distinct = len(rows) * self.count(constants(encoded[j])), None, 0
+                        key = (1, estimate)
+                    if best is None or key < best[0]:
+                        best = (key, j, estimate, v, distinct)
+                _, choice, estimate, join_variable, distinct = best
+            codes = encoded[choice]
+            remaining.remove(choice)
+
+            scan_cost = self.count(constants(codes))
+            if join_variable is not None and distinct * PROBE_COST * len(self.indexes) < scan_cost:
+                # bind join: một hộp truy vấn hẹp cho mỗi giá trị của biến kết nối
+                method = "bind"
+                triples = set()
+                for value in set(row[variables.index(join_variable)] for row in rows):
+                    triples.update(self.match([value if term == join_variable else c for term, c in zip(codes, constants(codes))]))
+            else:
+                method = "scan"
+                triples = self.match(constants(codes))
+            pattern_vars, pattern_rows = triples_to_rows(codes, triples)
+            if rows is None:
+                variables, rows = pattern_vars, pattern_rows
+            else:
+                variables, rows = hash_join(variables, rows, pattern_vars, pattern_rows)
+            plan.append({"pattern": patterns[choice], "method": method, "join_variable": join_variable,
+                         "estimated_rows": estimate, "pattern_rows": len(pattern_rows), "rows": len(rows)})
+            if not rows:
+                break
+        return variables, rows, plan
+
+# Chiếu các dòng lên các biến được chọn, bỏ trùng lặp khi distinct và cắt theo limit
+def project(variables, rows, select=None, distinct=False, limit=None):
+    select = select or variables
+    missing = [v for v in select if v not in variables]
+    if missing:
+        raise ValueError(f"Biến không có trong truy vấn: {' '.join(missing)}")
+    keys = [variables.index(v) for v in select]
+    rows = [tuple(row[k] for k in keys) for row in rows]
+    if distinct:
+        rows = list(dict.fromkeys(rows))
+    if limit is not None:
+        rows = rows[:limit]
+    return select, rows
+
+# Hàm thực thi truy vấn SPARQL trên các chỉ mục đã lưu của bộ dữ liệu
+def run_sparql(data, query, print_output=False):
+    indexes = load_indexes(data)
+    kdtrees = load_all_kdtrees(data, as_nodes=True)
+    engine = BGPEngine(indexes, kdtrees)
+    select, patterns, distinct, limit = parse_sparql(query)
+    variables, rows, plan = engine.evaluate(patterns)
+    select, rows = project(variables, rows, select, distinct, limit)
+
+    print(f"\n\nTRUY VẤN SPARQL: {' . '.join(' '.join(p) for p in patterns)}")
+    for step, record in enumerate(plan, start=1):
+        print(f"{step}. {' '.join(record['pattern'])}: {record['method']}"
+              f"{' theo ' + record['join_variable'] if record['join_variable'] else ''},"
+              f" ước lượng {record['estimated_rows']:.1f} dòng, mẫu có {record['pattern_rows']} dòng, sau kết nối {record['rows']} dòng")
+    print(f"{len(rows)} kết quả")
+    if print_output:
+        print(' '.join(select))
+        for row in rows:
+            print(' '.join(engine.decode(code) for code in row))
+    instrument.add_counters({
+        "patterns": len(patterns),
+        "index_probes": engine.probes,
+        "intermediate_rows": sum(record["pattern_rows"] + record["rows"] for record in plan),
+        "results": len(rows),
+    })
+    return select, rows
@@ -0,0 +1,114 @@
+import heapq
+import math
+import itertools
+
+import rstar_tree.rectangle as rct
+from query.query import load_indexes, is_variable, parse_triple_pattern, format_result
+from kdtree.kdtree import ArrayKDTree
+from kdtree.search import load_all_kdtrees
+
+# Các loại phần tử trong hàng đợi ưu tiên
+RTREE_NODE = 0  # nút của cây R*-tree (dạng từ điển đã lưu)
+KDTREE_NODE = 1  # nút của cây k-d cùng với ô (Rectangle) mà nhánh đó bao phủ
+POINT = 2  # một bộ ba (x, y, z, alpha, beta)
+
+# Nút của cây k-d dạng mảng được biểu diễn bởi (cây, lo, hi)
+def _kd_root(tree):
+    if isinstance(tree, ArrayKDTree):
+        return (tree, 0, len(tree))
+    return tree
+
+def _kd_fields(node):
+    if isinstance(node, dict):
+        return node['point'], node['axis'], node['left'], node['right']
+    if isinstance(node, tuple):
+        tree, lo, hi = node
+        mid = lo + (hi - lo) // 2
+        left = (tree, lo, mid) if mid > lo else None
+        right = (tree, mid + 1, hi) if hi > mid + 1 else None
+        return tree.points[mid].tolist(), int(tree.axes[mid]), left, right
+    return node.point, node.axis, node.left, node.right
+
+def _key_rectangle(key):
+    return rct.Rectangle(key['minima'], key['maxima'])
+
+# Tìm k láng giềng gần nhất theo thứ tự tốt nhất trước (best-first)
+# - rtrees: danh sách (cây R*-tree dạng từ điển, {id cây k-d: cây k-d})
+# - point: tọa độ (x, y, z), vị trí None bị bỏ qua khi tính khoảng cách
+# Hàng đợi được sắp theo MINDIST nên mỗi điểm lấy ra đã là điểm gần nhất còn lại:
+# kết quả được trả về dần dần (generator), bên gọi có thể dừng bất kỳ lúc nào và
+# hàng đợi không được mở rộng thêm.
+def iter_nearest(rtrees, point):
+    counter = itertools.count()  # phá thế hòa để heapq không so sánh các nút
+    queue = []
+    for rtree_data, kdtrees in rtrees:
+        if rtree_data['is_null'] or rtree_data['key'] is None:
+            continue
+        dist = rct.point_to_rectangle_distance_squared(point, _key_rectangle(rtree_data['key']))
+        heapq.heappush(queue, (dist, next(counter), RTREE_NODE, (rtree_data, kdtrees)))
+
+    while queue:
+        dist, _, kind, item = heapq.heappop(queue)
+        if kind == POINT:
+            yield math.sqrt(dist), item
+        elif kind == RTREE_NODE:
+            node, kdtrees = item
+            if node['is_leaf']:
+                cell = _key_rectangle(node['key'])
+                if node.get('kdtree') is not None:
+                    heapq.heappush(queue, (dist, next(counter), KDTREE_NODE, (_kd_root(kdtrees[node['kdtree']]), cell)))
+                else:
+                    # lá chưa có cây k-d: duyệt trực tiếp các điểm
+                    for coords, extend in node['points'].values():
+                        pt = tuple(coords) + tuple(extend)
+                        heapq.heappush(queue, (rct.point_distance_squared(point, pt), next(counter), POINT, pt))
+            else:
+                for child in node['children']:
+                    if child['is_null'] or child['key'] is None:
+                        continue
+                    child_dist = rct.point_to_rectangle_distance_squared(point, _key_rectangle(child['key']))
+                    heapq.heappush(queue, (child_dist, next(counter), RTREE_NODE, (child, kdtrees)))
+        else:
+            node, cell = item
+            pt, axis, left, right = _kd_fields(node)
+            heapq.heappush(queue, (rct.point_distance_squared(point, pt), next(counter), POINT, tuple(pt)))
+            # chia ô theo trục phân chia của nút
+            if left is not None:
+                maxima = list(cell.maxima)
+                maxima[axis] = pt[axis]
+                left_cell = rct.Rectangle(list(cell.minima), maxima)
+                heapq.heappush(queue, (rct.point_to_rectangle_distance_squared(point, left_cell), next(counter), KDTREE_NODE, (left, left_cell)))
+            if right is not None:
+                minima = list(cell.minima)
+                minima[axis] = pt[axis]
+                right_cell = rct.Rectangle(minima, list(cell.maxima))
+                heapq.heappush(queue, (rct.point_to_rectangle_distance_squared(point, right_cell), next(counter), KDTREE_NODE, (right, right_cell)))
+
+# Trả về danh sách k cặp (khoảng cách, bộ ba) gần nhất
+def k_nearest(rtrees, point, k):
+    return list(itertools.islice(iter_nearest(rtrees, point), k))
+
+# Mã hóa mẫu truy vấn thành điểm truy vấn: thực thể ràng buộc -> mã hóa, biến -> None
+def pattern_to_point(pattern, entity_mappings):
+    point = []
+    for term in parse_triple_pattern(pattern):
+        if is_variable(term):
+            point.append(None)
+            continue
+        code = next((mapping[term] for mapping in entity_mappings if term in mapping), None)
+        if code is None:
+            raise ValueError(f"Thực thể không có trong bộ mã hóa: {term}")
+        point.append(code)
+    return point
+
+def run_knn(data, pattern, k, print_output=False):
+    indexes = load_indexes(data)
+    kdtrees = load_all_kdtrees(data, as_nodes=True)
+    entity_mappings = [mapping for _, mapping in indexes.values()]
+    point = pattern_to_point(pattern, entity_mappings)
+    rtrees = [(rtree_data, kdtrees.get(name, {})) for name, (rtree_data, _) in indexes.items()]
+    results = k_nearest(rtrees, point, k)
+    print(f"\n\n{k} BỘ BA GẦN NHẤT VỚI: {pattern}")
+    for dist, triple in results:
+        print(f"{dist:.6f} {format_result(triple, entity_mappings[0]) if entity_mappings else triple}")
+    return results
@@ -0,0 +1,265 @@
+import os
+import json
+
+from kdtree.search import load_all_kdtrees, refine_phase, range_search_array
+from rstar_tree.pagefile import PagedRStarTree
+from rstar_tree.diskrtree import open_disk_tree
+import rstar_tree.rectangle as rct
+from mdh.termdict import TermDictionary, term_dictionary_path
+
+# Biến trong mẫu truy vấn bắt đầu bằng '?' (hoặc '*' / None cho vị trí không ràng buộc)
+def is_variable(term):
+    return term is None or term == '*' or term.startswith('?')
+
+# Hàm tách một mẫu truy vấn đơn dạng "s p o" thành bộ ba (subj, pred, obj)
+def parse_triple_pattern(pattern):
+    if isinstance(pattern, str):
+        terms = pattern.split()
+    else:
+        terms = list(pattern)
+    if len(terms) != 3:
+        raise ValueError(f"Mẫu truy vấn phải có đúng 3 thành phần: {pattern}")
+    return tuple(terms)
+
+# Hàm chuyển mẫu truy vấn thành hộp truy vấn 3 chiều
+# - vị trí đã ràng buộc: khoảng suy biến [c, c] với c là mã hóa của thực thể
+# - vị trí chưa ràng buộc: khoảng [0, 1]
+# Trả về None nếu một thực thể ràng buộc không có trong bộ mã hóa (không có kết quả)
+def pattern_to_box(pattern, entity_mapping):
+    minima = []
+    maxima = []
+    for term in pattern:
+        if is_variable(term):
+            minima.append(0.0)
+            maxima.append(1.0)
+        elif term in entity_mapping:
+            minima.append(entity_mapping[term])
+            maxima.append(entity_mapping[term])
+        else:
+            return None
+    return minima, maxima
+
+# Kiểm tra hình chữ nhật `key` của một nút có giao với hộp truy vấn hay không
+def key_intersects(key, minima, maxima):
+    return all(key['minima'][i] <= maxima[i] and minima[i] <= key['maxima'][i] for i in range(len(minima)))
+
+# FilterPhase: duyệt cây R*-tree đã lưu, cắt tỉa theo `key` của các nút
+# Trả về danh sách id của các cây k-d ở những lá giao với hộp truy vấn và số nút đã duyệt
+def filter_phase(rtree_data, box):
+    kdtree_ids = []
+    visited = 0
+    if box is None:
+        return kdtree_ids, visited
+
+    minima, maxima = box
+    stack = [rtree_data]
+    while stack:
+        node = stack.pop()
+        visited += 1
+        if node['is_null'] or node['key'] is None or not key_intersects(node['key'], minima, maxima):
+            continue
+        if node['is_leaf']:
+            if node.get('kdtree') is not None:
+                kdtree_ids.append(node['kdtree'])
+        else:
+            stack.extend(reversed(node['children']))
+    return kdtree_ids, visited
+
+# Kiểm tra hình chữ nhật `key` nằm trọn trong hộp truy vấn
+def key_within(key, minima, maxima):
+    return all(minima[i] <= key['minima'][i] and key['maxima'][i] <= maxima[i] for i in range(len(minima)))
+
+# COUNT: số bộ ba trong hộp truy vấn, không cần RefinePhase
+# - nút nằm trọn trong hộp cộng số điểm `count` đã lưu của cây con mà không duyệt xuống
+# - lá giao một phần với hộp: đếm các điểm của lá nằm trong hộp
+# Các bộ ba bị lặp lại trong dữ liệu được đếm theo số lần được chỉ mục (RefinePhase trả về
+# tập nên chỉ giữ một). Cây lưu bởi phiên bản cũ (không có `count`) được duyệt đến tận lá.
+# Trả về (số bộ ba, số nút đã duyệt)
+def count_phase(rtree_data, box):
+    count = 0
+    visited = 0
+    if box is None:
+        return count, visited
+
+    minima, maxima = box
+    stack = [rtree_data]
+    while stack:
+        node = stack.pop()
+        visited += 1
+        if node['is_null'] or node['key'] is None or not key_intersects(node['key'], minima, maxima):
+            continue
+        if node.get('count') is not None and key_within(node['key'], minima, maxima):
+            count += node['count']
+        elif node['is_leaf']:
+            count += sum(1 for coords, _ in node['points'].values()
+                         if all(minima[i] <= coords[i] <= maxima[i] for i in range(len(minima))))
+        else:
+            stack.extend(reversed(node['children']))
+    return count, visited
+
+# Hàm đọc bộ mã hóa của bộ dữ liệu: từ điển thực thể toàn cục (mdh/termdict.py),
+# dùng chung cho mọi tệp. Dữ liệu tạo bởi phiên bản cũ chỉ có file JSON riêng cho
+# từng tệp ({tên tệp}_entity_mapping.json) nên vẫn được đọc nếu không có từ điển.
+# Trả về hàm nhận tên tệp (không có phần mở rộng) và trả về bộ mã hóa của tệp đó
+def load_entity_mappings(data):
+    dictionary_path = term_dictionary_path(data)
+    if os.path.exists(dictionary_path):
+        term_dictionary = TermDictionary(dictionary_path)
+        return lambda file_name_no_ext: term_dictionary
+
+    def load_json(file_name_no_ext):
+        with open(f"storage/mdh/{data}/{file_name_no_ext}_entity_mapping.json", 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return load_json
+
+# Hàm đọc các cây R*-tree và bộ mã hóa tương ứng của một bộ dữ liệu
+# Trả về từ điển {tên file: (cây R*-tree, bộ mã hóa)}
+def load_indexes(data):
+    rstar_directory = f"storage/rstar_tree/{data}"
+    entity_mapping_of = load_entity_mappings(data)
+    indexes = {}
+    for file_name in sorted(os.listdir(rstar_directory)):
+        if file_name.endswith("_triples_data.json"):
+            with open(os.path.join(rstar_directory, file_name), 'r', encoding='utf-8') as f:
+                rtree_data = json.load(f)
+            entity_mapping = entity_mapping_of(file_name.replace("_triples_data.json", ""))
+            indexes[file_name.replace(".json", "")] = (rtree_data, entity_mapping)
+    return indexes
+
+# Thực hiện FilterPhase cho một mẫu truy vấn đơn trên tất cả các cây R*-tree
+# Trả về từ điển {tên file: (danh sách id cây k-d, số nút đã duyệt)}
+def run_filter(indexes, pattern):
+    pattern = parse_triple_pattern(pattern)
+    results = {}
+    for name, (rtree_data, entity_mapping) in indexes.items():
+        box = pattern_to_box(pattern, entity_mapping)
+        results[name] = filter_phase(rtree_data, box)
+    return results
+
+# Thực hiện FilterPhase rồi RefinePhase cho một mẫu truy vấn đơn
+# Trả về từ điển {tên file: tập các bộ (x, y, z, alpha, beta) khớp với mẫu}
+def run_refine(indexes, kdtrees, pattern):
+    pattern = parse_triple_pattern(pattern)
+    tuplesets = {}
+    for name, (rtree_data, entity_mapping) in indexes.items():
+        box = pattern_to_box(pattern, entity_mapping)
+        kdtree_ids, _ = filter_phase(rtree_data, box)
+        tuplesets[name] = refine_phase(kdtrees[name], kdtree_ids, box) if kdtree_ids else set()
+    return tuplesets
+
+# Đọc các file trang (storage/pages/<data>/) cùng bộ mã hóa tương ứng
+# Trả về từ điển {tên file: (PagedRStarTree, bộ mã hóa)}
+def load_paged_indexes(data):
+    pages_directory = f"storage/pages/{data}"
+    entity_mapping_of = load_entity_mappings(data)
+    indexes = {}
+    for file_name in sorted(os.listdir(pages_directory)):
+        if file_name.endswith("_triples_data.rtp"):
+            entity_mapping = entity_mapping_of(file_name.replace("_triples_data.rtp", ""))
+            indexes[file_name.replace(".rtp", "")] = (PagedRStarTree(os.path.join(pages_directory, file_name)), entity_mapping)
+    return indexes
+
+# FilterPhase và RefinePhase trên file trang: các trang lá đã là cây k-d nên được
+# tìm kiếm trực tiếp. Trả về (tập bộ ba khớp, số nút đã duyệt)
+def run_paged(paged_tree, box):
+    if box is None:
+        return set(), 0
+    minima, maxima = box
+    leaves, visited = paged_tree.filter(minima, maxima)
+    tupleset = set()
+    for leaf in leaves:
+        tupleset.update(range_search_array(leaf.kd_tree(), minima, maxima))
+    return tupleset, visited
+
+# Giải mã bộ ba kết quả thành (subj, pred, obj) khi bộ mã hóa là từ điển thực thể
+def format_result(triple, entity_mapping):
+    if isinstance(entity_mapping, TermDictionary):
+        return f"{triple} -> {entity_mapping.decode_triple(triple)}"
+    return str(triple)
+
+def run_query(data, pattern, print_output=False, paged=False, pool_size=None):
+    if paged:
+        return run_paged_query(data, pattern, print_output)
+    if pool_size:
+        return run_disk_query(data, pattern, print_output, pool_size)
+    indexes = load_indexes(data)
+    kdtrees = load_all_kdtrees(data, as_nodes=True)
+    results = run_filter(indexes, pattern)
+    tuplesets = {}
+    print(f"\n\nTRUY VẤN: {pattern}")
+    for name, (kdtree_ids, visited) in results.items():
+        box = pattern_to_box(parse_triple_pattern(pattern), indexes[name][1])
+        tuplesets[name] = refine_phase(kdtrees[name], kdtree_ids, box) if kdtree_ids else set()
+        print(f"{name}: {len(kdtree_ids)} cây k-d, đã duyệt {visited} nút, {len(tuplesets[name])} bộ ba khớp")
+        if print_output:
+            print(kdtree_ids)
+            for t in sorted(tuplesets[name]):
+                print(format_result(t, indexes[name][1]))
+    return tuplesets
+
+def run_count(data, pattern):
+    indexes = load_indexes(data)
+    pattern = parse_triple_pattern(pattern)
+    counts = {}
+    print(f"\n\nCOUNT: {' '.join(pattern)}")
+    for name, (rtree_data, entity_mapping) in indexes.items():
+        counts[name], visited = count_phase(rtree_data, pattern_to_box(pattern, entity_mapping))
+        print(f"{name}: đã duyệt {visited} nút, {counts[name]} bộ ba khớp")
+    print(f"Tổng: {sum(counts.values())} bộ ba khớp")
+    return counts
+
+def run_paged_query(data, pattern, print_output=False):
+    indexes = load_paged_indexes(data)
+    pattern = parse_triple_pattern(pattern)
+    tuplesets = {}
+    print(f"\n\nTRUY VẤN: {' '.join(pattern)}")
+    for name, (paged_tree, entity_mapping) in indexes.items():
+        tuplesets[name], visited = run_paged(paged_tree, pattern_to_box(pattern, entity_mapping))
+        print(f"{name}: đã duyệt {visited} nút, {len(tuplesets[name])} bộ ba khớp")
+        if print_output:
+            for t in sorted(tuplesets[name]):
+                print(format_result(t, entity_mapping))
+        paged_tree.close()
+    return tuplesets
+
+# Đọc các cây R*-tree trên đĩa (storage/rstar_tree_disk/<data>/, tạo bởi --pool_size) cùng
+# bộ mã hóa tương ứng, mỗi cây giữ tối đa pool_size nút trong bộ nhớ
+# Trả về từ điển {tên file: (PagedRTCursor, bộ mã hóa)}
+def load_disk_indexes(data, pool_size=1024):
+    disk_directory = f"storage/rstar_tree_disk/{data}"
+    entity_mapping_of = load_entity_mappings(data)
+    indexes = {}
+    for file_name in sorted(os.listdir(disk_directory)):
+        if file_name.endswith("_triples_data.rtd"):
+            entity_mapping = entity_mapping_of(file_name.replace("_triples_data.rtd", ""))
+            indexes[file_name.replace(".rtd", "")] = (open_disk_tree(os.path.join(disk_directory, file_name), pool_size), entity_mapping)
+    return indexes
+
+# FilterPhase trên cây trên đĩa, các điểm của những lá giao với hộp được lọc trực tiếp
+# (cây trên đĩa không có cây k-d ở lá). Trả về (tập bộ ba khớp, số nút đã duyệt)
+def run_disk(cursor, box):
+    if box is None:
+        return set(), 0
+    minima, maxima = box
+    window = rct.Rectangle(list(minima), list(maxima))
+    leaves, visited = cursor.window_query(window)
+    tupleset = set()
+    for leaf in leaves:
+        for coords, extend in leaf.points.values():
+            if window.is_element(coords):
+                tupleset.add(tuple(coords) + tuple(extend))
+    return tupleset, visited
+
+def run_disk_query(data, pattern, print_output=False, pool_size=1024):
+    indexes = load_disk_indexes(data, pool_size)
+    pattern = parse_triple_pattern(pattern)
+    tuplesets = {}
+    print(f"\n\nTRUY VẤN: {' '.join(pattern)}")
+    for name, (cursor, entity_mapping) in indexes.items():
+        tuplesets[name], visited = run_disk(cursor, pattern_to_box(pattern, entity_mapping))
+        print(f"{name}: đã duyệt {visited} nút, {len(tuplesets[name])} bộ ba khớp")
+        if print_output:
+            for t in sorted(tuplesets[name]):
+                print(format_result(t, entity_mapping))
+        cursor.close()
+    return tuplesets
@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from query.query import load_indexes, run_refine, parse_triple_pattern, format_result
+from query.knn import k_nearest, pattern_to_point
+from query.bgp import BGPEngine, parse_sparql, project
+from kdtree.search import load_all_kdtrees
+
+# Máy chủ truy vấn chạy lâu dài: các cây R*-tree, cây k-d và bộ mã hóa được đọc một
+# lần khi khởi động, sau đó các mẫu truy vấn được trả lời qua HTTP (TCP hoặc Unix socket)
+# - GET /query?pattern=?s takesCourse GraduateCourse3[&decode=1]
+# - GET /knn?pattern=...&k=10
+# - GET /sparql?query=SELECT ... WHERE { ... }[&decode=1]
+# - GET /stats
+# Các truy vấn giống hệt nhau đang được xử lý được gộp lại (một lần tìm kiếm cho tất cả),
+# việc tìm kiếm chạy trong các tiến trình worker (mỗi worker tự đọc chỉ mục một lần)
+# để vòng lặp sự kiện luôn sẵn sàng nhận yêu cầu mới.
+# Chạy từ thư mục system/ bằng `python -m query.server` (query/query.py trùng tên với
+# gói query nên không chạy trực tiếp file này được).
+
+class QueryEngine:
+    def __init__(self, data):
+        """
+        The indexes of one dataset, loaded once and queried many times.
+        """
+        start = time.perf_counter()
+        self.indexes = load_indexes(data)
+        self.kdtrees = load_all_kdtrees(data, as_nodes=True)
+        self.bgp = BGPEngine(self.indexes, self.kdtrees)
+        self.load_seconds = time.perf_counter() - start
+
+    # Các bộ ba khớp với mẫu: {tên file: danh sách bộ (x, y, z, alpha, beta) đã sắp xếp}
+    def query(self, pattern, decode=False):
+        tuplesets = run_refine(self.indexes, self.kdtrees, pattern)
+        results = {}
+        for name, tupleset in tuplesets.items():
+            triples = sorted(tupleset)
+            if decode:
+                triples = [format_result(t, self.indexes[name][1]) for t in triples]
+            results[name] = triples
+        return results
+
+    # k bộ ba gần nhất với mẫu: danh sách (khoảng cách, bộ ba)
+    def knn(self, pattern, k):
+        entity_mappings = [mapping for _, mapping in self.indexes.values()]
+        point = pattern_to_point(pattern, entity_mappings)
+        rtrees = [(rtree_data, self.kdtrees.get(name, {})) for name, (rtree_data, _) in self.indexes.items()]
+        return [(dist, list(triple)) for dist, triple in k_nearest(rtrees, point, k)]
+
+    # Kết quả truy vấn SPARQL: {"variables": [...], "rows": [...], "plan": [...]}
+    def sparql(self, query, decode=False):
+        select, patterns, distinct, limit = parse_sparql(query)
+        variables, rows, plan = self.bgp.evaluate(patterns)
+        select, rows = project(variables, rows, select, distinct, limit)
+        if decode:
+            rows = [[self.bgp.decode(code) for code in row] for row in rows]
+        return {"variables": select, "rows": [list(row) for row in rows], "plan": plan}
+
+# Bộ máy truy vấn của tiến trình worker (hoặc của tiến trình chính khi không dùng worker)
+_engine = None
+
+def _init_engine(data):
+    global _engine
+    _engine = QueryEngine(data)
+
+def _load_seconds():
+    return _engine.load_seconds
+
+# Hàm chạy một truy vấn trong worker, trả về kết quả có thể chuyển thành JSON
+def _execute(kind, pattern, k, decode):
+    if kind == "knn":
+        return _engine.knn(pattern, k)
+    if kind == "sparql":
+        return _engine.sparql(pattern, decode)
+    return _engine.query(pattern, decode)
+
+class QueryServer:
+    def __init__(self, data, workers=0):
+        """
+        Answers queries on the indexes of data. With workers > 0 the searches
+        run in a pool of that many processes, each holding its own copy of
+        the indexes; with workers = 0 they run in one thread of this process.
+        """
+        self.data = data
+        self.workers = workers
+        self.pool = None
+        # truy vấn đang xử lý -> Future dùng chung cho các yêu cầu giống hệt
+        self.in_flight = {}
+        self.stats = {"requests": 0, "searches": 0, "coalesced": 0, "errors": 0, "load_seconds": None}
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        if self.workers:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_init_engine, initargs=(self.data,))
+            # khởi động các worker ngay để yêu cầu đầu tiên không phải chờ đọc chỉ mục
+            seconds = await asyncio.gather(*[loop.run_in_executor(self.pool, _load_seconds) for _ in range(self.workers)])
+        else:
+            self.pool = ThreadPoolExecutor(1)
+            await loop.run_in_executor(self.pool, _init_engine, self.data)
+            seconds = [_load_seconds()]
+        self.stats["load_seconds"] = max(seconds)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    # Chạy truy vấn, gộp với truy vấn giống hệt đang được xử lý nếu có
+    async def run(self, kind, pattern, k=10, decode=False):
+        key = (kind, " ".join(pattern.split()) if kind == "sparql" else parse_triple_pattern(pattern), k if kind == "knn" else None, decode)
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.pool, _execute, kind, key[1] if kind == "sparql" else " ".join(key[1]), k, decode)
+        self.in_flight[key] = future
+        # bỏ khỏi danh sách khi xong, kể cả khi bên gọi đầu tiên đã bị hủy
+        future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        self.stats["searches"] += 1
+        return await asyncio.shield(future)
+
+    async def respond(self, path):
+        url = urlsplit(path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if url.path == "/stats":
+            return 200, dict(self.stats, in_flight=len(self.in_flight))
+        if url.path not in ("/query", "/knn", "/sparql"):
+            return 404, {"error": f"unknown path {url.path}"}
+        kind = url.path[1:]
+        field = "query" if kind == "sparql" else "pattern"
+        if field not in params:
+            return 400, {"error": f"missing {field}"}
+        start = time.perf_counter()
+        try:
+            results = await self.run(kind, params[field], int(params.get("k", 10)), params.get("decode", "0") not in ("0", "false", ""))
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        body = {field: params[field], "results": results, "seconds": time.perf_counter() - start}
+        if kind == "query":
+            body["count"] = sum(len(triples) for triples in results.values())
+        elif kind == "sparql":
+            body["count"] = len(results["rows"])
+        return 200, body
+
+    # Xử lý một kết nối HTTP/1.0: một yêu cầu GET, một phản hồi JSON
+    async def handle(self, reader, writer):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').split()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            self.stats["requests"] += 1
+            if len(request_line) < 2 or request_line[0] != "GET":
+                status, body = 405, {"error": "only GET is supported"}
+            else:
+                status, body = await self.respond(request_line[1])
+        except Exception as e:
+            status, body = 500, {"error": repr(e)}
+        if status != 200:
+            self.stats["errors"] += 1
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}.get(status, "Internal Server Error")
+        writer.write(f"HTTP/1.0 {status} {reason}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode('latin-1') + payload)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+async def serve(data, host="127.0.0.1", port=8080, unix_socket=None, workers=0):
+    server = QueryServer(data, workers)
+    await server.start()
+    if unix_socket:
+        listener = await asyncio.start_unix_server(server.handle, path=unix_socket)
+        where = unix_socket
+    else:
+        listener = await asyncio.start_server(server.handle, host, port)
+        where = f"http://{host}:{port}"
+    print(f"Đã đọc chỉ mục của {data} trong {server.stats['load_seconds']:.3f}s, đang phục vụ tại {where}")
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve triple-pattern queries over the built indexes")
+    parser.add_argument("--data", type=str, default="data_demo", help="Name of the data directory")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="TCP port to listen on")
+    parser.add_argument("--unix_socket", type=str, default=None, help="listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of search processes, 0 runs the searches in a thread of the server process")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.data, args.host, args.port, args.unix_socket, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+import os
+import struct
+from collections import OrderedDict
+import numpy as np
+
+import rstar_tree.rectangle as rct
+import rstar_tree.rstartree as rstartree
+from rstar_tree.pagefile import internal_entry_dtype, leaf_entry_dtype
+
+# Cây R*-tree nằm trên đĩa: mỗi nút là một trang cố định trong file, và chỉ một
+# số giới hạn các nút được giữ trong bộ nhớ bởi vùng đệm LRU (BufferPool).
+# Trang 0 là header:
+#     magic (4 byte) | version u16 | dimension u16 | page_size u32 | root u32 | page_count u32 | M u16 | m u16 | p u16
+# Mỗi trang nút:
+#     is_leaf u8 | leaf_children u8 | count u16 | các phần tử (như rstar_tree/pagefile.py)
+# Danh sách trang trống chỉ được giữ trong bộ nhớ: các trang giải phóng trong
+# một phiên làm việc được dùng lại trong phiên đó.
+
+MAGIC = b'RSTD'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIIHHH')
+NODE_HEADER = struct.Struct('<BBH')
+
+# Kích thước trang nhỏ nhất (lũy thừa của 2) chứa được M + 1 phần tử (nút đang tràn)
+def disk_page_size(M, d=3):
+    need = NODE_HEADER.size + (M + 1) * max(internal_entry_dtype(d).itemsize, leaf_entry_dtype(d).itemsize)
+    page_size = 512
+    while page_size < need:
+        page_size *= 2
+    return page_size
+
+# File gồm các trang có kích thước cố định, đếm số lần đọc/ghi trang
+class PageFile:
+    def __init__(self, file_path, page_size=None, create=False, d=3, M=4, m=2, p=1):
+        self.file_path = file_path
+        self.free_pages = []
+        self.reads = 0
+        self.writes = 0
+        if create:
+            os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+            self._file = open(file_path, 'w+b')
+            self.dimension, self.M, self.m, self.p = d, M, m, p
+            self.page_size = page_size or disk_page_size(M, d)
+            self.root_page = 0
+            self.page_count = 1
+            self.write_header()
+        else:
+            self._file = open(file_path, 'r+b')
+            magic, version, self.dimension, self.page_size, self.root_page, self.page_count, self.M, self.m, self.p = \
+                HEADER.unpack(self._file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Không phải file R*-tree trên đĩa: {file_path}")
+
+    def write_header(self):
+        header = HEADER.pack(MAGIC, VERSION, self.dimension, self.page_size, self.root_page,
+                             self.page_count, self.M, self.m, self.p)
+        self._file.seek(0)
+        self._file.write(header.ljust(self.page_size, b'\0'))
+
+    def allocate(self):
+        if self.free_pages:
+            return self.free_pages.pop()
+        page = self.page_count
+        self.page_count += 1
+        return page
+
+    def free(self, page):
+        self.free_pages.append(page)
+
+    def read_page(self, page):
+        self.reads += 1
+        self._file.seek(page * self.page_size)
+        return self._file.read(self.page_size)
+
+    def write_page(self, page, data):
+        if len(data) > self.page_size:
+            raise ValueError(f"Nút dài {len(data)} byte không vừa trang {self.page_size} byte")
+        self.writes += 1
+        self._file.seek(page * self.page_size)
+        self._file.write(data.ljust(self.page_size, b'\0'))
+
+    def close(self):
+        self.write_header()
+        self._file.close()
+
+# Dãy con của một PagedNode: chỉ giữ số trang, nút con được đọc qua vùng đệm khi truy cập
+class PagedChildren:
+    def __init__(self, node):
+        self.node = node
+
+    def __len__(self):
+        return len(self.node.child_pages)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.node.pool.get(page) for page in self.node.child_pages[i]]
+        return self.node.pool.get(self.node.child_pages[i])
+
+    def __iter__(self):
+        for page in list(self.node.child_pages):
+            yield self.node.pool.get(page)
+
+class PagedNode(rstartree.RStarTree):
+    def __init__(self, pool, page, is_leaf, point_data=None, child_pages=None, child_bounds=None, leaf_children=False):
+        """
+        A node of a disk-resident R*-tree
+        ---------------------------------
+        Parameters:
+        -----------
+        pool: the BufferPool that owns the node
+        page: page number of the node in the page file
+        point_data: for leaves, dictionary point id -> (coordinates, extend)
+        child_pages, child_bounds: for internal nodes, the children's page
+        numbers and their (children, 2, d) minima/maxima
+        leaf_children: whether the children are leaves
+        """
+        self.pool = pool
+        self.page = page
+        self.is_leaf = is_leaf
+        self.points = point_data if (is_leaf and point_data) else {}
+        self.child_pages = list(child_pages) if child_pages is not None else []
+        d = pool.page_file.dimension
+        self.child_bounds = child_bounds if child_bounds is not None else np.zeros((0, 2, d))
+        self.leaf_children = leaf_children
+        self.is_null = not (self.points or self.child_pages)
+        self.update_bounding_rectangle()
+
+    @property
+    def children(self):
+        return PagedChildren(self)
+
+    def does_point_to_leaves(self):
+        return self.leaf_children
+
+    def get_child_rectangles(self):
+        return [rct.Rectangle(b[0].tolist(), b[1].tolist()) for b in self.child_bounds]
+
+    def update_bounding_rectangle(self):
+        if self.is_leaf:
+            if self.points:
+                self.key = rct.bounding_box_points(self.get_points())
+            else:
+                self.key = rct.EmptyRectangle(1)
+        elif self.child_pages:
+            # lấy hình chữ nhật mới nhất của các con còn trong vùng đệm,
+            # các con đã bị đẩy ra đĩa không thay đổi kể từ lần cập nhật trước
+            for j, page in enumerate(self.child_pages):
+                child = self.pool.peek(page)
+                if child is not None:
+                    self.child_bounds[j, 0] = child.key.minima
+                    self.child_bounds[j, 1] = child.key.maxima
+            self.key = rct.Rectangle(self.child_bounds[:, 0].min(axis=0).tolist(),
+                                     self.child_bounds[:, 1].max(axis=0).tolist())
+        else:
+            self.key = rct.EmptyRectangle(1)
+        self.pool.mark_dirty(self)
+
+    def add_point_data(self, point_key, point_value, point_extend):
+        self.is_null = False
+        super().add_point_data(point_key, point_value, point_extend)
+
+    def add_points(self, entries):
+        self.is_null = False
+        super().add_points(entries)
+
+    def add_child(self, rt):
+        bounds = np.array([[rt.key.minima, rt.key.maxima]], dtype=float)
+        self.child_pages.append(rt.page)
+        self.child_bounds = np.concatenate([self.child_bounds, bounds])
+        self.leaf_children = rt.is_leaf
+        self.is_null = False
+        self.update_bounding_rectangle()
+
+    def remove_child(self, rt):
+        # so sánh theo số trang thay vì theo hình chữ nhật
+        j = self.child_pages.index(rt.page)
+        del self.child_pages[j]
+        self.child_bounds = np.delete(self.child_bounds, j, axis=0)
+        self.update_bounding_rectangle()
+
+    def encode(self):
+        d = self.pool.page_file.dimension
+        if self.is_leaf:
+            entries = np.zeros(len(self.points), dtype=leaf_entry_dtype(d))
+            for j, (point_id, (coords, extend)) in enumerate(self.points.items()):
+                entries[j]['id'] = point_id
+                entries[j]['coords'] = coords
+                entries[j]['extend'] = extend
+        else:
+            entries = np.zeros(len(self.child_pages), dtype=internal_entry_dtype(d))
+            entries['minima'] = self.child_bounds[:, 0]
+            entries['maxima'] = self.child_bounds[:, 1]
+            entries['page'] = self.child_pages
+        return NODE_HEADER.pack(int(self.is_leaf), int(self.leaf_children), len(entries)) + entries.tobytes()
+
+# Vùng đệm LRU có giới hạn `capacity` nút
+# - các nút được đọc/tạo trong một thao tác bị ghim (pinned) cho đến khi gọi release()
+# - khi vượt quá sức chứa, nút không bị ghim ít được dùng nhất bị đẩy ra,
+#   và được ghi lại vào file nếu đã bị sửa (dirty)
+class BufferPool:
+    def __init__(self, page_file, capacity=1024):
+        self.page_file = page_file
+        self.capacity = capacity
+        self.frames = OrderedDict()  # số trang -> PagedNode, theo thứ tự LRU
+        self.dirty = set()
+        self.pinned = set()
+        self.hits = 0
+        self.misses = 0
+        self._loading = False
+
+    def get(self, page):
+        self.pinned.add(page)
+        node = self.frames.get(page)
+        if node is not None:
+            self.hits += 1
+            self.frames.move_to_end(page)
+        else:
+            self.misses += 1
+            node = self._decode(page, self.page_file.read_page(page))
+            self.frames[page] = node
+            self.evict()
+        return node
+
+    def peek(self, page):
+        """Nút nếu đang nằm trong vùng đệm, không tính là một lần truy cập"""
+        return self.frames.get(page)
+
+    def new_node(self, children=[], point_data={}, is_leaf=None):
+        page = self.page_file.allocate()
+        self.pinned.add(page)
+        if is_leaf or (is_leaf is None and point_data):
+            node = PagedNode(self, page, True, point_data=dict(point_data))
+        else:
+            child_bounds = np.array([[ch.key.minima, ch.key.maxima] for ch in children], dtype=float) if children else None
+            node = PagedNode(self, page, False, child_pages=[ch.page for ch in children], child_bounds=child_bounds,
+                             leaf_children=bool(children) and children[0].is_leaf)
+        self.frames[page] = node
+        self.dirty.add(page)
+        self.evict()
+        return node
+
+    def mark_dirty(self, node):
+        if not self._loading:
+            self.dirty.add(node.page)
+
+    def free(self, page):
+        self.frames.pop(page, None)
+        self.dirty.discard(page)
+        self.pinned.discard(page)
+        self.page_file.free(page)
+
+    def release(self):
+        """Bỏ ghim tất cả các nút của thao tác vừa xong rồi đưa vùng đệm về sức chứa"""
+        self.pinned.clear()
+        self.evict()
+
+    def evict(self):
+        while len(self.frames) > self.capacity:
+            victim = next((page for page in self.frames if page not in self.pinned), None)
+            if victim is None:
+                return
+            node = self.frames.pop(victim)
+            if victim in self.dirty:
+                self.page_file.write_page(victim, node.encode())
+                self.dirty.discard(victim)
+
+    def flush(self):
+        for page in sorted(self.dirty):
+            self.page_file.write_page(page, self.frames[page].encode())
+        self.dirty.clear()
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "resident": len(self.frames),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reads": self.page_file.reads,
+            "writes": self.page_file.writes,
+        }
+
+    def _decode(self, page, data):
+        d = self.page_file.dimension
+        is_leaf, leaf_children, count = NODE_HEADER.unpack_from(data, 0)
+        self._loading = True
+        try:
+            if is_leaf:
+                entries = np.frombuffer(data, dtype=leaf_entry_dtype(d), count=count, offset=NODE_HEADER.size)
+                point_data = {int(e['id']): (e['coords'].tolist(), e['extend'].tolist()) for e in entries}
+                return PagedNode(self, page, True, point_data=point_data)
+            entries = np.frombuffer(data, dtype=internal_entry_dtype(d), count=count, offset=NODE_HEADER.size)
+            child_bounds = np.stack([entries['minima'], entries['maxima']], axis=1).astype(float)
+            return PagedNode(self, page, False, child_pages=entries['page'].tolist(), child_bounds=child_bounds,
+                             leaf_children=bool(leaf_children))
+        finally:
+            self._loading = False
+
+class PagedRTCursor(rstartree.RTCursor):
+    def __init__(self, pool):
+        """
+        RTCursor over a disk-resident tree. Every insert pins the nodes it
+        touches and releases them when done, so at most `pool.capacity`
+        nodes (plus one insertion path) stay in memory.
+        """
+        self.pool = pool
+        page_file = pool.page_file
+        super().__init__(pool.get(page_file.root_page), M=page_file.M, m=page_file.m, p=page_file.p)
+        pool.release()
+
+    @property
+    def root(self):
+        return self.pool.get(self.pool.page_file.root_page)
+
+    @root.setter
+    def root(self, rt):
+        self.pool.page_file.root_page = rt.page
+
+    def make_node(self, children=[], point_data={}, is_leaf=None):
+        return self.pool.new_node(children=children, point_data=point_data, is_leaf=is_leaf)
+
+    def discard_node(self, rt):
+        self.pool.free(rt.page)
+
+    def insert(self, point_data, point_extend):
+        super().insert(point_data, point_extend)
+        self.pool.release()
+
+    def _insert_group(self, batch, coords, i):
+        # every group is one operation for the buffer pool, like insert
+        j = super()._insert_group(batch, coords, i)
+        self.pool.release()
+        return j
+
+    def delete(self, point_id, coords):
+        deleted = super().delete(point_id, coords)
+        self.pool.release()
+        return deleted
+
+    def window_query(self, window):
+        leaves, visited = rstartree.window_query(self.root, window)
+        self.pool.release()
+        return leaves, visited
+
+    def flush(self):
+        self.pool.flush()
+        self.pool.page_file.write_header()
+
+    def close(self):
+        self.pool.flush()
+        self.pool.page_file.close()
+
+# Tạo cây R*-tree trên đĩa từ các điểm, giống create_tree_from_pts
+def create_disk_tree_from_pts(pts_tuples, file_path, M=4, m=2, p=1, pool_size=1024, d=3):
+    page_file = PageFile(file_path, create=True, d=d, M=M, m=m, p=p)
+    pool = BufferPool(page_file, pool_size)
+    pt_dict = {k: (v[0:3], v[3:5]) for k, v in pts_tuples[0:M-1]}
+    page_file.root_page = pool.new_node(point_data=pt_dict, is_leaf=True).page
+    cursor = PagedRTCursor(pool)
+    for k, v in pts_tuples[M-1:]:
+        cursor.insert((k, v[0:3]), v[3:5])
+    cursor.flush()
+    return cursor
+
+# Mở một cây R*-tree đã lưu trên đĩa
+def open_disk_tree(file_path, pool_size=1024):
+    return PagedRTCursor(BufferPool(PageFile(file_path), pool_size))
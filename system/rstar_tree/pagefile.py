@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import mmap
+import struct
+import argparse
+import numpy as np
+
+# Thêm đường dẫn để nhập các module cần thiết
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from kdtree.kdtree import ArrayKDTree, build_array_kd_tree
+
+# Định dạng trang nhị phân cố định cho cây R*-tree và các cây k-d ở lá
+# Trang 0 là header:
+#     magic (4 byte) | version u16 | dimension u16 | page_size u32 | root u32 | page_count u32
+# Mỗi trang nút (little-endian):
+#     is_leaf u8 | count u16 | minima d*f64 | maxima d*f64 | các phần tử
+# - nút trong: mỗi phần tử là (minima d*f64, maxima d*f64, trang con u32)
+# - nút lá: mỗi phần tử là (id i64, tọa độ d*f64, (alpha, beta) 2*f64, trục u8);
+#   các phần tử được sắp theo thứ tự của cây k-d ngầm định (ArrayKDTree), nên
+#   trang lá chính là cây k-d của lá đó và không cần file k-d tree riêng.
+
+MAGIC = b'RSTP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIII')
+NODE_HEADER = struct.Struct('<BH')
+
+def internal_entry_dtype(d):
+    return np.dtype([('minima', '<f8', (d,)), ('maxima', '<f8', (d,)), ('page', '<u4')])
+
+def leaf_entry_dtype(d):
+    return np.dtype([('id', '<i8'), ('coords', '<f8', (d,)), ('extend', '<f8', (2,)), ('axis', 'u1')])
+
+# Kích thước trang nhỏ nhất (lũy thừa của 2) chứa được M phần tử
+def default_page_size(M, d=3):
+    need = NODE_HEADER.size + 16 * d + M * max(internal_entry_dtype(d).itemsize, leaf_entry_dtype(d).itemsize)
+    page_size = 512
+    while page_size < need:
+        page_size *= 2
+    return page_size
+
+# Các trường của một nút cần cho trang: (is_leaf, (minima, maxima) hoặc None, các điểm, các con)
+# Nút là RStarTree trong bộ nhớ hoặc dạng từ điển đọc từ file JSON
+def _node_fields(node):
+    if isinstance(node, dict):
+        key = node['key']
+        bounds = None if node['is_null'] or key is None else (key['minima'], key['maxima'])
+        return node['is_leaf'], bounds, node['points'], node['children']
+    bounds = None if node.is_null or node.key is None else (node.key.minima, node.key.maxima)
+    return node.is_leaf, bounds, node.points, node.children
+
+def _node_count(node):
+    is_leaf, _, points, children = _node_fields(node)
+    return len(points) if is_leaf else len(children)
+
+# Hàm ghi cây R*-tree thành file trang: cây RStarTree vừa xây trong bộ nhớ (run_rstar_tree)
+# hoặc dạng từ điển như rstartree_to_dict / file JSON (convert_json_to_pages)
+def write_page_file(tree, file_path, page_size=None, d=3):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    # Đánh số trang theo thứ tự duyệt theo chiều rộng, trang 0 dành cho header
+    nodes = [tree]
+    i = 0
+    while i < len(nodes):
+        nodes.extend(_node_fields(nodes[i])[3])
+        i += 1
+    page_of = {id(node): page for page, node in enumerate(nodes, start=1)}
+
+    if page_size is None:
+        page_size = default_page_size(max(_node_count(node) for node in nodes), d)
+
+    with open(file_path, 'wb') as f:
+        header = HEADER.pack(MAGIC, VERSION, d, page_size, 1, len(nodes) + 1)
+        f.write(header.ljust(page_size, b'\0'))
+        for node in nodes:
+            f.write(_encode_node(node, page_of, page_size, d))
+    return file_path
+
+def _encode_node(node, page_of, page_size, d):
+    is_leaf, bounds, points, children = _node_fields(node)
+    count = len(points) if is_leaf else len(children)
+    if bounds is None or count == 0:
+        minima, maxima = [0.0] * d, [0.0] * d
+    else:
+        minima, maxima = bounds
+
+    if is_leaf and count:
+        # sắp các điểm của lá theo cây k-d ngầm định; cột cuối giữ id của điểm
+        rows = [list(coords) + list(extend) + [int(point_id)] for point_id, (coords, extend) in points.items()]
+        kd_tree = build_array_kd_tree(rows, use_variance=True, k=d)
+        entries = np.zeros(count, dtype=leaf_entry_dtype(d))
+        entries['id'] = kd_tree.points[:, d + 2].astype(np.int64)
+        entries['coords'] = kd_tree.points[:, :d]
+        entries['extend'] = kd_tree.points[:, d:d + 2]
+        entries['axis'] = kd_tree.axes
+    elif is_leaf:
+        entries = np.zeros(0, dtype=leaf_entry_dtype(d))
+    else:
+        entries = np.zeros(count, dtype=internal_entry_dtype(d))
+        for j, child in enumerate(children):
+            entries[j]['minima'], entries[j]['maxima'] = _node_fields(child)[1]
+            entries[j]['page'] = page_of[id(child)]
+
+    page = NODE_HEADER.pack(1 if is_leaf else 0, count)
+    page += struct.pack(f'<{2 * d}d', *minima, *maxima) + entries.tobytes()
+    if len(page) > page_size:
+        raise ValueError(f"Nút có {count} phần tử không vừa trang {page_size} byte")
+    return page.ljust(page_size, b'\0')
+
+# Một nút đã được giải mã từ một trang
+class PageNode:
+    def __init__(self, page, is_leaf, minima, maxima, entries):
+        self.page = page
+        self.is_leaf = is_leaf
+        self.minima = minima
+        self.maxima = maxima
+        self.entries = entries
+
+    def kd_tree(self):
+        """Cây k-d của lá, các điểm là (x, y, z, alpha, beta)"""
+        points = np.concatenate([self.entries['coords'], self.entries['extend']], axis=1)
+        return ArrayKDTree(points, self.entries['axis'])
+
+# Đọc file trang bằng mmap, chỉ giải mã các nút mà truy vấn chạm tới
+class PagedRStarTree:
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.dimension, self.page_size, self.root_page, self.page_count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Không phải file trang R*-tree: {file_path}")
+        self._internal_dtype = internal_entry_dtype(self.dimension)
+        self._leaf_dtype = leaf_entry_dtype(self.dimension)
+        self.pages_read = 0
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def node(self, page):
+        d = self.dimension
+        # chỉ sao chép đúng một trang ra khỏi vùng mmap rồi giải mã
+        buf = self._mm[page * self.page_size:(page + 1) * self.page_size]
+        is_leaf, count = NODE_HEADER.unpack_from(buf, 0)
+        offset = NODE_HEADER.size
+        bounds = np.frombuffer(buf, dtype='<f8', count=2 * d, offset=offset)
+        offset += 16 * d
+        dtype = self._leaf_dtype if is_leaf else self._internal_dtype
+        entries = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+        self.pages_read += 1
+        return PageNode(page, bool(is_leaf), bounds[:d], bounds[d:], entries)
+
+    def root(self):
+        return self.node(self.root_page)
+
+    # FilterPhase trên file trang: trả về các nút lá (PageNode) giao với hộp truy vấn và số nút đã duyệt
+    def filter(self, minima, maxima):
+        lower = np.asarray(minima, dtype=float)
+        upper = np.asarray(maxima, dtype=float)
+        leaves = []
+        visited = 0
+        root = self.root()
+        if len(root.entries) == 0 or np.any(root.minima > upper) or np.any(lower > root.maxima):
+            return leaves, 1
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            visited += 1
+            if node.is_leaf:
+                leaves.append(node)
+                continue
+            # kiểm tra tất cả các con cùng lúc trên mảng MBR của trang
+            hit = np.all((node.entries['minima'] <= upper) & (lower <= node.entries['maxima']), axis=1)
+            stack.extend(self.node(int(page)) for page in node.entries['page'][hit][::-1])
+        return leaves, visited
+
+# Chuyển một file R*-tree JSON đã lưu (xây bởi các phiên bản trước) sang file trang;
+# run_rstar_tree(rstar_format="pages") ghi file trang trực tiếp từ cây trong bộ nhớ
+def convert_json_to_pages(rtree_json_path, page_file_path, page_size=None):
+    with open(rtree_json_path, 'r', encoding='utf-8') as f:
+        tree_dict = json.load(f)
+    write_page_file(tree_dict, page_file_path, page_size)
+    print(f"Cấu trúc r*-tree dạng trang đã được lưu vào file: {page_file_path}")
+    return page_file_path
+
+# Chuyển tất cả các file R*-tree JSON của bộ dữ liệu `data` sang storage/pages/<data>/
+def convert_all_json_to_pages(data, page_size=None):
+    rstar_directory = f"storage/rstar_tree/{data}"
+    for file_name in sorted(os.listdir(rstar_directory)):
+        if file_name.endswith('.json'):
+            convert_json_to_pages(os.path.join(rstar_directory, file_name),
+                                  f"storage/pages/{data}/{file_name.replace('.json', '.rtp')}", page_size)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert saved R*-tree JSON files to the binary page format")
+    parser.add_argument("--data", type=str, default="data_demo", help="Name of the data directory")
+    parser.add_argument("--page_size", type=int, default=None, help="page size in bytes, default: smallest power of two that fits M entries")
+    args = parser.parse_args()
+    convert_all_json_to_pages(args.data, args.page_size)
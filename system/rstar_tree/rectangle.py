@@ -1,3 +1,5 @@
+import numpy as np
+
 class Rectangle:
     def __init__(self, minarray, maxarray):
         self.dimension = len(minarray)
@@ -64,6 +66,14 @@ class Rectangle:
         for i in range(0,self.dimension))
 
 
+    def intersects(self, other):
+        """
+        Returns whether self and other share at least one point
+        """
+        return all((self.minima[i] <= other.maxima[i] and other.minima[i] <= self.maxima[i])
+        for i in range(0,self.dimension))
+
+
     def is_proper_superset(self, other):
         """
         Returns whether other is a proper subset of self
@@ -123,6 +133,34 @@ def point_to_center_distance_squared(p, rect):
     return s
 
 
+def point_to_rectangle_distance_squared(p, rect):
+    """
+    Squared minimum distance (MINDIST) from point p to rect. It is 0 when
+    p lies inside rect. Coordinates of p set to None are ignored.
+    """
+    s = 0.0
+    for i in range(0,len(p)):
+        if p[i] is None:
+            continue
+        if p[i] < rect.minima[i]:
+            s += (rect.minima[i]-p[i])**2
+        elif p[i] > rect.maxima[i]:
+            s += (p[i]-rect.maxima[i])**2
+    return s
+
+
+def point_distance_squared(p, q):
+    """
+    Squared distance between points p and q, ignoring coordinates of p set
+    to None
+    """
+    s = 0.0
+    for i in range(0,len(p)):
+        if p[i] is not None:
+            s += (p[i]-q[i])**2
+    return s
+
+
 def bounding_box(rects):
     u = rects[0]
     for i in range(1, len(rects)):
@@ -158,3 +196,40 @@ def rectangle_perimeter(rect):
     U = rect.maxima
     ext = [U[i]-L[i] for i in range(0,d)]
     return (2**(d-1))*sum(ext)
+
+
+def volumes(lower, upper):
+    """
+    Volumes of many rectangles at once, given as (n, d) arrays of minima
+    and maxima
+    """
+    return np.prod(upper - lower, axis=-1)
+
+
+def intersection_volumes(lower_1, upper_1, lower_2, upper_2):
+    """
+    Pairwise intersection volumes between two sets of rectangles given as
+    (n, d) and (k, d) arrays. Returns an (n, k) array.
+    """
+    lower = np.maximum(lower_1[:, None, :], lower_2[None, :, :])
+    upper = np.minimum(upper_1[:, None, :], upper_2[None, :, :])
+    return np.prod(np.clip(upper - lower, 0.0, None), axis=-1)
+
+
+def paired_intersection_volumes(lower_1, upper_1, lower_2, upper_2):
+    """
+    Intersection volume of the i-th rectangle of the first set with the
+    i-th rectangle of the second, for two sets given as (n, d) arrays.
+    Returns an (n,) array.
+    """
+    lower = np.maximum(lower_1, lower_2)
+    upper = np.minimum(upper_1, upper_2)
+    return np.prod(np.clip(upper - lower, 0.0, None), axis=-1)
+
+
+def perimeters(lower, upper):
+    """
+    Vectorized rectangle_perimeter for (n, d) arrays of minima and maxima
+    """
+    d = lower.shape[-1]
+    return (2**(d-1)) * np.sum(upper - lower, axis=-1)
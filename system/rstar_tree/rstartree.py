@@ -1,4 +1,7 @@
+import math
+import numpy as np
 import rstar_tree.rectangle as rct
+from instrument.instrument import debug_enabled
 
 class RStarTree:
     def __init__(self, children=[], point_data={}, is_leaf=None):
@@ -36,6 +39,8 @@ class RStarTree:
 
         self.children = children
         self.points = point_data
+        # id of the k-d tree built over this leaf's points, see kdtree/kdtree.py
+        self.kdtree = None
 
         self.update_bounding_rectangle()
 
@@ -57,6 +62,18 @@ class RStarTree:
         return [child.key for child in self.children]
 
 
+    def get_child_aggregates(self):
+        return [(child.count, child.extend_minima, child.extend_maxima) for child in self.children]
+
+
+    def peek_child(self, j):
+        """
+        Child j, for traversals that do not modify it. Copy-on-write nodes
+        return it without making it writable.
+        """
+        return self.children[j]
+
+
     def get_point_count(self):
         return len(self.points)
 
@@ -74,16 +91,46 @@ class RStarTree:
     def update_bounding_rectangle(self):
         if self.is_leaf:
             P = self.get_points()
-            new_key = rct.bounding_box_points(P)
+            # a leaf emptied by deletions is null until points are added again
+            self.is_null = not P
+            new_key = rct.bounding_box_points(P) if P else rct.EmptyRectangle(1)
         elif self.is_null:
             new_key = rct.EmptyRectangle(1)
         else:
             R = self.get_child_rectangles()
             if R:
-                new_key = rct.bounding_box(R)
+                # children's minima/maxima kept as one (children, 2, d) array
+                self.child_bounds = np.array([[r.minima, r.maxima] for r in R], dtype=float)
+                new_key = rct.Rectangle(self.child_bounds[:, 0].min(axis=0).tolist(),
+                                        self.child_bounds[:, 1].max(axis=0).tolist())
             else:
                 new_key = rct.EmptyRectangle(1)
         self.key = new_key
+        self.update_aggregate()
+
+    def update_aggregate(self):
+        """
+        Recompute the subtree statistics from the points or the children:
+        count, the number of points below the node, and extend_minima /
+        extend_maxima, the bounds of their point_extend (alpha, beta) values,
+        None when the subtree is empty. Called with every bounding rectangle
+        update, so they stay current through inserts, splits, reinserts and
+        deletions.
+        """
+        if self.is_leaf:
+            self.count = len(self.points)
+            columns = list(zip(*[value[1] for value in self.points.values()]))
+            lower = upper = columns
+        else:
+            aggregates = [a for a in self.get_child_aggregates() if a[0]]
+            self.count = sum(a[0] for a in aggregates)
+            lower = list(zip(*[a[1] for a in aggregates]))
+            upper = list(zip(*[a[2] for a in aggregates]))
+        if self.count:
+            self.extend_minima = [min(column) for column in lower]
+            self.extend_maxima = [max(column) for column in upper]
+        else:
+            self.extend_minima = self.extend_maxima = None
 
     def update_tree_bounding_rectangle(self):
         count_child = len(self.children)
@@ -101,6 +148,16 @@ class RStarTree:
         else:
             pass
 
+    def add_points(self, entries):
+        """
+        Add entries (point id, coordinates, extend) to a leaf with a single
+        update of its bounding rectangle.
+        """
+        if self.is_leaf:
+            for point_key, point_value, point_extend in entries:
+                self.points[point_key] = (point_value, point_extend)
+            self.update_bounding_rectangle()
+
     def remove_point_data(self,point_key):
         if self.is_leaf:
             del self.points[point_key]
@@ -115,7 +172,10 @@ class RStarTree:
 
 
     def remove_child(self,rt):
-        self.children.remove(rt)
+        # compare by identity: __eq__ compares rectangles, and sibling leaves
+        # holding duplicate points can have the same rectangle
+        j = next(j for j, child in enumerate(self.children) if child is rt)
+        del self.children[j]
         self.update_bounding_rectangle()
 
     def print_structure(self, level=0):
@@ -135,83 +195,31 @@ NullRT = RStarTree()
 
 
 
-def overlap_enlargement_required(rt, candidate, entry):
+def overlap_enlargement_required(rt, entry):
     """
-
+    For every child of rt, the overlap between the child's rectangle
+    enlarged by entry and the rectangles of its siblings.
     """
-    rects = rt.get_child_rectangles()
-    rects.remove(candidate.key)
-    enlarged_rect = candidate.key.union(entry)
+    lower, upper = rt.child_bounds[:, 0], rt.child_bounds[:, 1]
+    enlarged_lower = np.minimum(lower, entry.minima)
+    enlarged_upper = np.maximum(upper, entry.maxima)
 
-    result = 0.0
-    for r in rects:
-        result += enlarged_rect.intersection_volume(r)
-    return result
+    overlaps = rct.intersection_volumes(enlarged_lower, enlarged_upper, lower, upper)
+    np.fill_diagonal(overlaps, 0.0)
+    return overlaps.sum(axis=1)
 
 
-def volume_enlargement_required(candidate, entry):
+def volume_enlargement_required(rt, entry):
     """
+    For every child of rt, the volume growth needed to accommodate entry.
     """
-    rect = candidate.key
-    vol0 = rect.volume()
-    rect = rect.union(entry)
-    vol1 = rect.volume()
+    lower, upper = rt.child_bounds[:, 0], rt.child_bounds[:, 1]
+    vol0 = rct.volumes(lower, upper)
+    vol1 = rct.volumes(np.minimum(lower, entry.minima), np.maximum(upper, entry.maxima))
     return vol1 - vol0
 
 
-def is_descendant(rt,rtq):
-    """
-    Discern whether rtq descends from rt.
-    -------------------------------------
-    """
-    if rt == rtq:
-        return True
-
-    R = rt.key
-    RQ = rtq.key
-    if (not R.is_proper_superset(RQ)) or rt.is_leaf:
-        return False
-
-    candidates = [ch for ch in rt.children if ch.key.is_proper_superset(RQ)]
-    if not candidates:
-        return False
-    else:
-        return any(is_descendant(ch, rtq) for ch in candidates)
-
-
-def path_to_subtree(rt_from, rt_to, path=[]):
-    """
-    Get path from tree rt_from to subtree rt_to:
-    --------------------------------------------
-    Parameters:
-    -----------
-    rt_from: the starting node
-    rt_to: the subtree of interest
-    path: the path traversed thus far
-
-    Returns:
-    --------
-    updated_path: [rt_from, ..., rt_to]
-    """
-    updated_path = path + [rt_from]
-
-    if rt_from == rt_to:
-        return updated_path
-
-    R = rt_to.key
-    candidates = [ch for ch in rt_from.children if ch.key.is_proper_superset(R)]
-    if not candidates:
-        #TODO: raise error?
-        return []
-    else:
-        try:
-            t = next(ch for ch in candidates if is_descendant(ch, rt_to))
-        except StopIteration:
-            return updated_path
-        return path_to_subtree(t, rt_to, updated_path)
-
-
-def choose_subtree(rt, lvl, entry):
+def choose_subtree(rt, lvl, entry, path=[]):
     """
     Chooses subtree in rt for inserting entry
     -----------------------------------------
@@ -220,30 +228,40 @@ def choose_subtree(rt, lvl, entry):
     rt: R*-tree in which entry will be inserted
     lvl: level of node rt. 0 means root level.
     entry: rectangle to be inserted. may be a point rectangle.
+    path: the nodes above rt, starting from the root
 
     Returns:
     --------
     rt: the chosen subtree
     lvl: the level of the chosen subtree
+    path: the descent taken, [root, ..., rt]
     """
+    path = path + [rt]
     if rt.is_leaf:
-        return rt, lvl
-    if rt.does_point_to_leaves():
-        keyfunc = lambda child: (overlap_enlargement_required(rt, child, entry),
-        volume_enlargement_required(child,entry), child.key.volume())
+        return rt, lvl, path
+    t = rt.children[choose_child(rt, entry)]
+    return choose_subtree(t, lvl + 1, entry, path)
 
-        t = min(rt.children, key = keyfunc)
+
+def choose_child(rt, entry):
+    """
+    Index of the child of the internal node rt that choose_subtree descends
+    into for entry.
+    """
+    volume = rct.volumes(rt.child_bounds[:, 0], rt.child_bounds[:, 1])
+    if rt.does_point_to_leaves():
+        # lexsort uses the last key as the primary one and is stable, so
+        # ties keep the first child like min() did
+        order = np.lexsort((volume, volume_enlargement_required(rt, entry),
+                            overlap_enlargement_required(rt, entry)))
         # should resolve ties by choosing candidate whose volume needs to be
         # enlarged the least. resolve those ties by choosing the rectangle of
         # smallest volume.
         # there may be multiple candidates whose accomodating the entry would
         # not cause any overlap enlargement
     else:
-        keyfunc = lambda child: (volume_enlargement_required(child,entry),
-        child.key.volume())
-
-        t = min(rt.children, key = keyfunc)
-    return choose_subtree(t, lvl + 1, entry)
+        order = np.lexsort((volume, volume_enlargement_required(rt, entry)))
+    return int(order[0])
 
 
 class RTCursor:
@@ -254,28 +272,299 @@ class RTCursor:
         self.M = M
         self.m = m
         self.p = p
+        # counters of the work done by this cursor (see instrument/instrument.py)
+        self.counters = {
+            "inserts": 0,
+            "choose_subtree_levels": 0,
+            "forced_reinserts": 0,
+            "leaf_splits": 0,
+            "node_splits": 0,
+            "mbr_updates": 0,
+            "deletes": 0,
+            "dissolved_nodes": 0,
+            "height_shrinks": 0,
+        }
+        # ids of the k-d trees whose leaf has changed since the tree was loaded
+        self.dirty_kdtrees = set()
+
+
+    def make_node(self, children=[], point_data={}, is_leaf=None):
+        """
+        Create a node for this cursor's tree. Storage backends other than
+        plain memory override this together with discard_node.
+        """
+        return RStarTree(children=children, point_data=point_data, is_leaf=is_leaf)
+
+
+    def discard_node(self, rt):
+        """
+        Called when a split has replaced rt by two new nodes.
+        """
+        pass
 
 
     def insert(self, point_data, point_extend):
         """
         We will only be indexing points.
         """
+        self.counters["inserts"] += 1
         self._insert_point(self.root, 0, point_data, point_extend)
         self.level_actions = {0:False}
 
 
-    def _insert_point(self, rt, rt_lvl, point_data, point_extend):
+    def insert_many(self, pts_tuples):
+        """
+        Insert a batch of points
+        ------------------------
+        The batch is sorted along the Hilbert curve so that consecutive points
+        fall into the same part of the tree. Each run of consecutive points
+        inside the rectangle of one leaf parent shares a single choose_subtree
+        descent to that parent; its points are then distributed over the
+        parent's leaves at once. Every leaf that overflows is split once (into
+        as many leaves as needed) and the nodes above are adjusted and treated
+        for overflow once per run, not once per point.
+
+        Parameters:
+        -----------
+        pts_tuples: list of (point id, [x, y, z, alpha, beta]), as for
+        create_tree_from_pts
+        """
+        if not pts_tuples:
+            return
+        batch = _hilbert_sort(pts_tuples, len(pts_tuples[0][1][0:3]))
+        coords = np.array([v[0:3] for _, v in batch], dtype=float)
+        i = 0
+        while i < len(batch):
+            i = self._insert_group(batch, coords, i)
+
+
+    def _insert_group(self, batch, coords, i):
+        """
+        Insert batch[i] and the points after it that lie inside the rectangle
+        of the same leaf parent. coords holds the coordinates of the batch.
+        Returns the index of the first point left for the next group.
+        """
+        k, v = batch[i]
+        P = v[0:3]
+        st, lvl, path = choose_subtree(self.root, 0, rct.Rectangle(P, P))
+        self.counters["choose_subtree_levels"] += lvl
+        if lvl == 0:
+            # the root is still a leaf
+            self.counters["inserts"] += 1
+            self._add_points(st, lvl, path, [(k, P, v[3:5])])
+            self.level_actions = {0:False}
+            return i + 1
+
+        parent = path[-2]
+        lower = np.minimum(parent.key.minima, coords[i])
+        upper = np.maximum(parent.key.maxima, coords[i])
+        j = i + 1
+        while j < len(batch) and np.all((lower <= coords[j]) & (coords[j] <= upper)):
+            j += 1
+
+        # a point inside the rectangles of some leaves goes to the smallest of
+        # them, as no leaf needs to be enlarged; the others are placed by
+        # choose_subtree from the parent
+        bounds = parent.child_bounds
+        points = coords[i:j, None, :]
+        inside = np.all((bounds[:, 0] <= points) & (points <= bounds[:, 1]), axis=2)
+        volume = np.where(inside, rct.volumes(bounds[:, 0], bounds[:, 1]), np.inf)
+        chosen = np.argmin(volume, axis=1)
+        groups = {}
+        for n in range(i, j):
+            k, v = batch[n]
+            P = v[0:3]
+            if inside[n - i].any():
+                c = int(chosen[n - i])
+            else:
+                c = choose_child(parent, rct.Rectangle(P, P))
+            groups.setdefault(c, []).append((k, P, v[3:5]))
+
+        self.counters["inserts"] += j - i
+        # only the leaves that receive points are taken for writing, before
+        # any split shifts the positions of the parent's children
+        children = {c: parent.children[c] for c in groups}
+        for c, entries in groups.items():
+            self.mark_kdtree_dirty(children[c])
+            children[c].add_points(entries)
+        self.adjust_path(path[:-1])
+        for c in groups:
+            if children[c].get_point_count() > self.M:
+                self.split_leaf(children[c], parent, path[:-1] + [children[c]])
+        if parent.get_child_count() > self.M:
+            self.propagate_overflow_treatment(lvl - 1, path[:-1])
+        self.level_actions = {0:False}
+        return j
+
+
+    def mark_kdtree_dirty(self, leaf):
+        """
+        Flag the k-d tree built over leaf, if any, as out of date.
+        """
+        if getattr(leaf, "kdtree", None) is not None:
+            self.dirty_kdtrees.add(leaf.kdtree)
+
+
+    def find_leaf(self, point_id, coords):
+        """
+        Find the leaf holding a point
+        -----------------------------
+        Only the subtrees whose rectangle contains coords are searched.
+
+        Returns:
+        --------
+        path: [root, ..., leaf], or None if point_id is not indexed at coords
+        """
+        coords = list(coords)
+        target = np.asarray(coords, dtype=float)
+        # the search only reads the nodes; the path to the leaf found is then
+        # taken again, child by child, for writing
+        stack = [([], self.root)]
+        while stack:
+            positions, node = stack.pop()
+            if node.is_null:
+                continue
+            if node.is_leaf:
+                if point_id in node.points and list(node.points[point_id][0]) == coords:
+                    path = [self.root]
+                    for j in positions:
+                        path.append(path[-1].children[j])
+                    return path
+                continue
+            hit = np.all((node.child_bounds[:, 0] <= target) & (target <= node.child_bounds[:, 1]), axis=1)
+            for j in reversed(np.flatnonzero(hit)):
+                stack.append((positions + [int(j)], node.peek_child(int(j))))
+        return None
+
+
+    def delete(self, point_id, coords):
+        """
+        Delete an indexed point
+        -----------------------
+        Parameters:
+        -----------
+        point_id: id of the point
+        coords: its coordinates, used to search only the subtrees that can
+        hold it
+
+        Returns:
+        --------
+        True if the point was found and deleted.
+        """
+        path = self.find_leaf(point_id, coords)
+        if path is None:
+            return False
+        self.counters["deletes"] += 1
+        leaf = path[-1]
+        leaf.remove_point_data(point_id)
+        self.mark_kdtree_dirty(leaf)
+        self.condense_tree(path)
+        self.level_actions = {0:False}
+        return True
+
+
+    def condense_tree(self, path):
+        """
+        Dissolve the underfull nodes on path, bottom-up, and reinsert their
+        entries: the points of a dissolved leaf one by one, the children of a
+        dissolved internal node as whole subtrees at their own height. Then
+        shrink the tree while the root has a single child.
+        """
+        orphans = []
+        kept = [path[0]]
+        for i in range(len(path) - 1, 0, -1):
+            node, parent = path[i], path[i-1]
+            count = node.get_point_count() if node.is_leaf else node.get_child_count()
+            if count < self.m:
+                # height of the node above the leaves
+                orphans.append((len(path) - 1 - i, node))
+                parent.remove_child(node)
+            else:
+                kept.insert(1, node)
+        self.adjust_path(kept)
+
+        subtrees = []
+        points = []
+        for height, node in orphans:
+            self.counters["dissolved_nodes"] += 1
+            if node.is_leaf:
+                self.mark_kdtree_dirty(node)
+                points.extend(((k, v[0]), v[1]) for k, v in node.points.items())
+            else:
+                subtrees.extend((height - 1, node.peek_child(j)) for j in range(node.get_child_count()))
+            self.discard_node(node)
+
+        # subtrees first, from the highest, so that every subtree still finds
+        # a level of its own height to hang from
+        for height, child in sorted(subtrees, key=lambda s: -s[0]):
+            self._insert_subtree(child, height)
+        for point_data, point_extend in points:
+            self._insert_point(self.root, 0, point_data, point_extend)
+            self.level_actions = {0:False}
+
+        while not self.root.is_leaf and self.root.get_child_count() == 1:
+            self.counters["height_shrinks"] += 1
+            old_root = self.root
+            self.root = old_root.children[0]
+            self.discard_node(old_root)
+
+
+    def height(self):
+        """
+        Number of levels below the root (0 for a leaf root).
+        """
+        node = self.root
+        h = 0
+        while not node.is_leaf:
+            node = node.peek_child(0)
+            h += 1
+        return h
+
+
+    def _insert_subtree(self, child, child_height):
+        """
+        Insert the subtree child, whose root is child_height levels above the
+        leaves, as the child of a node one level higher. The node is chosen
+        by least volume enlargement, then least volume.
+        """
+        path = [self.root]
+        node = self.root
+        for _ in range(self.height() - child_height - 1):
+            volume = rct.volumes(node.child_bounds[:, 0], node.child_bounds[:, 1])
+            best = int(np.lexsort((volume, volume_enlargement_required(node, child.key)))[0])
+            node = node.children[best]
+            path.append(node)
+        node.add_child(child)
+        self.adjust_path(path)
+        if node.get_child_count() > self.M:
+            self.propagate_overflow_treatment(len(path) - 1, path)
+        self.level_actions = {0:False}
+
+
+    def _insert_point(self, rt, rt_lvl, point_data, point_extend, path=[]):
+        """
+        Insert a point below rt. path holds the nodes above rt, starting
+        from the root, so that the whole insertion path is known without
+        searching the tree again.
+        """
         P_id, P = point_data
         E = rct.Rectangle(P,P)
 
-        st, lvl = choose_subtree(rt, rt_lvl, E)
+        st, lvl, path = choose_subtree(rt, rt_lvl, E, path)
+        self.counters["choose_subtree_levels"] += lvl - rt_lvl
+        self._add_points(st, lvl, path, [(P_id, P, point_extend)])
 
-        # path = path_to_subtree(rt,st)
-        path = path_to_subtree(self.root, st)
-        point_count = st.get_point_count()
-        if point_count < self.M:
-            st.add_point_data(P_id, P, point_extend)
-            self.update_bounding_rectangle()
+
+    def _add_points(self, st, lvl, path, entries):
+        """
+        Add entries (point id, coordinates, extend) to the leaf st at level
+        lvl, reached through path, then treat the overflow if st holds more
+        than M points.
+        """
+        self.mark_kdtree_dirty(st)
+        st.add_points(entries)
+        if st.get_point_count() <= self.M:
+            self.adjust_path(path)
         elif lvl != 0:
             # overflow not at root
 
@@ -285,10 +574,9 @@ class RTCursor:
                 st_pred = path[-2]
             else:
                 st_pred = NullRT  # Hoặc đặt giá trị mặc định khác nếu cần
-            # add the point and then treat the overflow
-            st.add_point_data(P_id, P, point_extend)
-            self.update_bounding_rectangle()
-            caused_split = self.overflow_treatment(st,lvl,st_pred)
+            # the points are added, treat the overflow
+            self.adjust_path(path)
+            caused_split = self.overflow_treatment(st, lvl, st_pred, path)
             if caused_split and st_pred.get_child_count() > self.M:
                 
                 # Propagate overflow treatment up the insertion path
@@ -299,9 +587,7 @@ class RTCursor:
                 
         else:
             # overflow at root
-            st.add_point_data(P_id, P, point_extend)
-            self.update_bounding_rectangle()
-            _ = self.overflow_treatment(st, lvl, NullRT)
+            _ = self.overflow_treatment(st, lvl, NullRT, [st])
         # Make sure all covering rectangles in insertion path are adjusted
         # to be minimum bounding rectangles
 
@@ -315,75 +601,115 @@ class RTCursor:
     #         for node in t.children:
     #             self._insert_node(self.root, rt_lvl, node)
 
-    def split_leaf(self, t, pred):
+    def split_leaf(self, t, pred, path):
         count = t.get_point_count()
         # print(f"Debug: count = {count}, M = {self.M}")
-        assert count == self.M + 1
-        ax = choose_split_axis_leaf(t, self.M, self.m)
-        idx = choose_split_index_leaf(t, ax, self.M, self.m)
-
-        kf = lambda k: (t.points[k][0])[ax]
-        sorted_along_axis = sorted(list(t.points), key = kf) #########################################################
-
-        # point data for the two new leaves
-        group_1 = {x: t.points[x] for x in sorted_along_axis[0:idx]}
-        group_2 = {x: t.points[x] for x in sorted_along_axis[idx:]}
+        # M+1 points after an insert, possibly more after insert_many
+        assert count > self.M
+        self.counters["leaf_splits"] += 1
+        new_leaves = [self.make_node(children=[], is_leaf=True, point_data=group)
+                      for group in self._leaf_split_groups(t)]
+        self._replace_node(t, new_leaves, pred, path)
 
-        # instantiate the new leaves
-        new_leaf_1 = RStarTree(children=[],is_leaf=True,point_data=group_1)
-        new_leaf_2 = RStarTree(children=[],is_leaf=True,point_data=group_2)
 
-        if pred == NullRT:
-            new_root = RStarTree(children = [new_leaf_1, new_leaf_2], is_leaf=False)
-            self.root = new_root
-        else:
-            # delete original leaf
-            pred.remove_child(t)
-            self.update_bounding_rectangle()
+    def _leaf_split_groups(self, t):
+        """
+        Distribute the points of an overflowing leaf into groups of m to M
+        points. A leaf of M+1 points is split once, a larger one is split
+        again until every group fits.
+        """
+        count = t.get_point_count()
+        # the sort along the chosen axis is reused for the split itself
+        ax, order = choose_split_axis_leaf(t, count - 1, self.m)
+        idx = choose_split_index_leaf(t, order, count - 1, self.m)
+
+        point_keys = list(t.points)
+        sorted_along_axis = [point_keys[i] for i in order]
+
+        groups = []
+        for keys in (sorted_along_axis[0:idx], sorted_along_axis[idx:]):
+            group = {x: t.points[x] for x in keys}
+            if len(group) > self.M:
+                groups.extend(self._leaf_split_groups(RStarTree(children=[], is_leaf=True, point_data=group)))
+            else:
+                groups.append(group)
+        return groups
 
-            # add the new leaves to the predecessor
-            pred.add_child(new_leaf_1)
-            self.update_bounding_rectangle()
-            pred.add_child(new_leaf_2)
-            self.update_bounding_rectangle()
 
+    def split_node(self, t, pred, path):
+        count = t.get_child_count()
+        assert count > self.M
+        self.counters["node_splits"] += 1
+        new_nodes = [self.make_node(children=group, is_leaf=False)
+                     for group in self._node_split_groups(t)]
+        self._replace_node(t, new_nodes, pred, path)
 
 
-    def split_node(self, t, pred):
-        count = t.get_child_count()
-        assert count == self.M + 1
-        ax = choose_split_axis(t, self.M, self.m)
-        idx, islower = choose_split_index(t, ax, M=self.M, m=self.m)
+    def _node_split_groups(self, t):
+        """
+        Distribute the children of an overflowing node into groups of m to M
+        children, like _leaf_split_groups.
+        """
+        children = [t.peek_child(j) for j in range(t.get_child_count())]
+        return self._child_split_groups(children, t.child_bounds)
 
-        kf = lambda ch: ch.key.minima[ax]
-        sorted_along_axis = sorted(t.children, key = kf)
 
-        # children for two new nodes
-        group_1 = sorted_along_axis[0:idx]
-        group_2 = sorted_along_axis[idx:]
+    def _child_split_groups(self, children, bounds):
+        """
+        Split children, whose minima/maxima are the (children, 2, d) array
+        bounds, in two along the chosen distribution, and the halves that
+        still hold more than M children again. The child list is partitioned
+        directly, without building intermediate nodes over the children.
+        """
+        count = len(children)
+        # split along the sort (by lower or upper bound) whose distribution
+        # was chosen
+        ax, orders = choose_split_axis(bounds, count - 1, self.m)
+        idx, islower = choose_split_index(bounds, orders, M=count - 1, m=self.m)
+
+        order = orders[0] if islower else orders[1]
+
+        groups = []
+        for part in (order[0:idx], order[idx:]):
+            group = [children[i] for i in part]
+            if len(group) > self.M:
+                groups.extend(self._child_split_groups(group, bounds[part]))
+            else:
+                groups.append(group)
+        return groups
 
-        # instantiate new nodes
-        node_1 = RStarTree(children=group_1, is_leaf=False)
-        node_2 = RStarTree(children=group_2, is_leaf=False)
 
+    def _replace_node(self, t, new_nodes, pred, path):
+        """
+        Replace the split node t by new_nodes in its predecessor, or under a
+        new root if t was the root.
+        """
         if pred == NullRT:
-            # make new root?
-            new_root = RStarTree(children = [node_1, node_2], is_leaf=False)
+            new_root = self.make_node(children=new_nodes, is_leaf=False)
             self.root = new_root
+            if new_root.get_child_count() > self.M:
+                self.split_node(new_root, NullRT, [new_root])
         else:
-            # delete original node
-            
+            # replace the original node by the new nodes in the predecessor,
+            # then adjust the rectangles above it
             pred.remove_child(t)
-            self.update_bounding_rectangle()
-
-            # add back nodes
-            pred.add_child(node_1)
-            self.update_bounding_rectangle()
-            pred.add_child(node_2)
-            self.update_bounding_rectangle()
+            for node in new_nodes:
+                pred.add_child(node)
+            self.adjust_path(path[:-1])
+        self.discard_node(t)
 
 
-    def overflow_treatment(self, rt, lvl, pred):
+    def overflow_treatment(self, rt, lvl, pred, path):
+        """
+        Treat an overflowing node rt at level lvl
+        -----------------------------------------
+        Parameters:
+        -----------
+        rt: the overflowing node
+        lvl: level of rt. 0 means root level.
+        pred: parent of rt, NullRT if rt is the root
+        path: insertion path [root, ..., pred, rt]
+        """
         split_performed = False
 
         if lvl not in self.level_actions:
@@ -394,21 +720,21 @@ class RTCursor:
             self.level_actions[lvl] = True
             split_performed = False
             if rt.is_leaf:
-                self.leaf_re_insert(rt, lvl)
+                self.leaf_re_insert(rt, lvl, path)
             else:
                 split_performed = True
-                self.split_node(rt, pred)
+                self.split_node(rt, pred, path)
 
         else:
             split_performed = True
             if rt.is_leaf:
-                self.split_leaf(rt, pred)
+                self.split_leaf(rt, pred, path)
             else:
-                self.split_node(rt, pred)
+                self.split_node(rt, pred, path)
         return split_performed
 
 ######################################################################################################################
-    def leaf_re_insert(self, rt, lvl):
+    def leaf_re_insert(self, rt, lvl, path):
         """
         Called on overflowing (M+1 entries) leaf
         """
@@ -421,14 +747,16 @@ class RTCursor:
 
         # Slate the p points most distant from the center to be removed from rt
         to_remove = pts_by_dist[0:self.p]
+        self.counters["forced_reinserts"] += len(to_remove)
 
         # Prepare (key, value) pairs to be reinserted
         to_re_insert = [((k, rt.points[k][0]), rt.points[k][1]) for k in to_remove]
 
-        # Remove the chosen points, updating leaf's bounding rectangle
+        # Remove the chosen points, updating leaf's bounding rectangle and
+        # the rectangles on the path above it
         for pk in to_remove:
             rt.remove_point_data(pk)
-            self.update_bounding_rectangle()
+        self.adjust_path(path)
 
         # close reinsert: because the tree depends on the order of insert
         # inserting pts closer to the center first performs differently
@@ -436,7 +764,7 @@ class RTCursor:
 
         # Iteratively reinsert entries
         for pt_data, pt_extend in to_re_insert:
-            self._insert_point(rt, lvl, pt_data, pt_extend)
+            self._insert_point(rt, lvl, pt_data, pt_extend, path[:-1])
 
 
     # def node_re_insert(self, rt, lvl):
@@ -473,118 +801,137 @@ class RTCursor:
                 if i >= 1:
                     pred = node_list[i-1]
                     
-                    _ = self.overflow_treatment(t, lvl, pred)
+                    _ = self.overflow_treatment(t, lvl, pred, node_list[:i+1])
                     
                 else:
                     pred = NullRT
                     # print('covaodyak')
-                    was_root_split = self.overflow_treatment(t, lvl, pred)
+                    was_root_split = self.overflow_treatment(t, lvl, pred, node_list[:i+1])
             lvl -= 1
         return was_root_split
 
+    def adjust_path(self, path):
+        """
+        Recompute the bounding rectangles on an insertion path, bottom-up.
+        Only the nodes of path are touched, so the cost grows with the tree
+        height rather than with the number of indexed points.
+        """
+        self.counters["mbr_updates"] += len(path)
+        for node in reversed(path):
+            node.update_bounding_rectangle()
+
     def update_bounding_rectangle(self):
         self.root.update_tree_bounding_rectangle()
             
 
-def choose_split_axis_leaf(t, M, m):
-    d = t.key.dimension
-    margins = []
-    for i in range(0,d):
-        kf = lambda k: (t.points[k][0])[i]
-        sorted_by_i = sorted(list(t.points), key = kf)
-
-        S_i = 0.0
-        for j in range(1, M - 2*m + 2):
-            first_split_group = sorted_by_i[0:(m - 1 + j)]
-            bb_1 = rct.bounding_box_points([t.points[k][0] for k in first_split_group])
-
-            second_split_group = sorted_by_i[(m - 1 + j):]
-            bb_2 = rct.bounding_box_points([t.points[k][0] for k in second_split_group])
-
-            S_i += rct.rectangle_perimeter(bb_1) + rct.rectangle_perimeter(bb_2)
-        margins.append((S_i,i))
-
-    return (min(margins))[1]
+def split_distributions(lower, upper, M, m):
+    """
+    Bounding boxes of all candidate distributions of sorted entries
+    ----------------------------------------------------------------
+    Parameters:
+    -----------
+    lower, upper: (M+1, d) arrays of the entries' minima and maxima, already
+    in sort order
+    M, m: maximum and minimum number of entries per node
 
+    Returns:
+    --------
+    bb_1, bb_2: pairs (minima, maxima) of (M-2m+1, d) arrays. Row j bounds
+    the first m+j entries and the remaining entries respectively.
+    """
+    # prefix and suffix boxes computed in a single sweep each
+    prefix_lower = np.minimum.accumulate(lower, axis=0)
+    prefix_upper = np.maximum.accumulate(upper, axis=0)
+    suffix_lower = np.minimum.accumulate(lower[::-1], axis=0)[::-1]
+    suffix_upper = np.maximum.accumulate(upper[::-1], axis=0)[::-1]
 
-def choose_split_index_leaf(t,axis, M, m):
-    kf = lambda k: (t.points[k][0])[axis]
-    sorted_along_axis = sorted(list(t.points), key = kf)
+    split_at = np.arange(m, M - m + 1)
+    bb_1 = (prefix_lower[split_at - 1], prefix_upper[split_at - 1])
+    bb_2 = (suffix_lower[split_at], suffix_upper[split_at])
+    return bb_1, bb_2
 
-    scores = []
-    for j in range(1, M - 2*m + 2):
-        first_split_group = sorted_along_axis[0:(m - 1 + j)]
-        bb_1 = rct.bounding_box_points([t.points[k][0] for k in first_split_group])
 
-        second_split_group = sorted_along_axis[(m - 1 + j):]
-        bb_2 = rct.bounding_box_points([t.points[k][0] for k in second_split_group])
+def _split_margin(lower, upper, M, m):
+    bb_1, bb_2 = split_distributions(lower, upper, M, m)
+    return rct.perimeters(*bb_1).sum() + rct.perimeters(*bb_2).sum()
 
-        overlap_j = bb_1.intersection_volume(bb_2)
-        vol_score_j = bb_1.volume() + bb_2.volume()
 
-        scores.append((overlap_j,vol_score_j, m - 1 + j))
+def _split_scores(lower, upper, M, m):
+    bb_1, bb_2 = split_distributions(lower, upper, M, m)
+    # each distribution's two boxes only, not all pairs of distributions
+    overlap = rct.paired_intersection_volumes(*bb_1, *bb_2)
+    vol_score = rct.volumes(*bb_1) + rct.volumes(*bb_2)
+    return overlap, vol_score
 
-    return (min(scores))[2]
 
+def _leaf_coordinates(t):
+    return np.array(t.get_points(), dtype=float)
 
-def choose_split_axis(t, M, m):
-    d = t.key.dimension
-    child_rects = t.get_child_rectangles()
 
+def choose_split_axis_leaf(t, M, m):
+    """
+    Returns the split axis of an overflowing leaf and the order of its
+    points (positions in t.points) sorted along that axis.
+    """
+    P = _leaf_coordinates(t)
     margins = []
-    for i in range(0,d):
-        lower_kf = lambda ch: ch.minima[i]
-        by_lower_i = sorted(child_rects, key = lower_kf)
-
-        upper_kf = lambda ch: ch.maxima[i]
-        by_upper_i = sorted(child_rects, key = upper_kf)
-
-        S_i = 0.0
-        for j in range(1, M - 2*m + 2):
-            g1 = by_lower_i[0:(m - 1 + j)]
-            g2 = by_lower_i[(m - 1 + j):]
-            g3 = by_upper_i[0:(m - 1 + j)]
-            g4 = by_upper_i[(m - 1 + j):]
-            margin_1 = rct.rectangle_perimeter(rct.bounding_box(g1))
-            margin_2 = rct.rectangle_perimeter(rct.bounding_box(g2))
-            margin_3 = rct.rectangle_perimeter(rct.bounding_box(g3))
-            margin_4 = rct.rectangle_perimeter(rct.bounding_box(g4))
-            S_i += margin_1 + margin_2 + margin_3 + margin_4
+    for i in range(0, P.shape[1]):
+        order = np.argsort(P[:, i], kind='stable')
+        sorted_by_i = P[order]
+        margins.append((_split_margin(sorted_by_i, sorted_by_i, M, m), i, order))
 
-        margins.append((S_i, i))
+    best = min(margins, key = lambda s: (s[0], s[1]))
+    return best[1], best[2]
 
-    return (min(margins))[1]
 
+def choose_split_index_leaf(t, order, M, m):
+    """
+    Returns the number of points, in the given sort order, that go to the
+    first of the two new leaves.
+    """
+    P = _leaf_coordinates(t)[order]
+    overlap, vol_score = _split_scores(P, P, M, m)
+    # ties are resolved by the smallest index, as lexsort is stable
+    return m + int(np.lexsort((vol_score, overlap))[0])
 
-def choose_split_index(t,axis, M, m):
-    child_rects = t.get_child_rectangles()
-
-    lower_kf = lambda ch: ch.minima[axis]
-    by_lower = sorted(child_rects, key = lower_kf)
-
-    upper_kf = lambda ch: ch.maxima[axis]
-    by_upper = sorted(child_rects, key = upper_kf)
 
-    scores = [] # will hold tuples (overlap, volume, index, is_lower)
-    for j in range(1, M - 2*m + 2):
-        bb_1 = rct.bounding_box(by_lower[0:(m - 1 + j)])
-        bb_2 = rct.bounding_box(by_lower[(m - 1 + j):])
+def choose_split_axis(bounds, M, m):
+    """
+    Returns the split axis of an overflowing node and the orders of its
+    children sorted by lower and by upper bound along that axis. bounds is
+    the (children, 2, d) array of the children's minima and maxima.
+    """
+    lower, upper = bounds[:, 0], bounds[:, 1]
 
-        overlap_lower = bb_1.intersection_volume(bb_2)
-        vol_score_lower = bb_1.volume() + bb_2.volume()
+    margins = []
+    for i in range(0, bounds.shape[2]):
+        by_lower_i = np.argsort(lower[:, i], kind='stable')
+        by_upper_i = np.argsort(upper[:, i], kind='stable')
+        S_i = (_split_margin(lower[by_lower_i], upper[by_lower_i], M, m)
+               + _split_margin(lower[by_upper_i], upper[by_upper_i], M, m))
+        margins.append((S_i, i, (by_lower_i, by_upper_i)))
 
-        scores.append((overlap_lower,vol_score_lower, m - 1 + j, True))
+    best = min(margins, key = lambda s: (s[0], s[1]))
+    return best[1], best[2]
 
-        bb_3 = rct.bounding_box(by_upper[0:(m - 1 + j)])
-        bb_4 = rct.bounding_box(by_upper[(m - 1 + j):])
 
-        overlap_upper = bb_3.intersection_volume(bb_4)
-        vol_score_upper = bb_3.volume() + bb_4.volume()
+def choose_split_index(bounds, orders, M, m):
+    """
+    Returns the split index and whether the distribution is taken from the
+    order by lower bound (True) or by upper bound (False).
+    """
+    lower, upper = bounds[:, 0], bounds[:, 1]
+    by_lower, by_upper = orders
 
-        scores.append((overlap_upper, vol_score_upper, m - 1 + j, False))
+    overlap_lower, vol_score_lower = _split_scores(lower[by_lower], upper[by_lower], M, m)
+    overlap_upper, vol_score_upper = _split_scores(lower[by_upper], upper[by_upper], M, m)
 
-    best = min(scores, key = lambda s: (s[0], s[1]))
-    return best[2], best[3]
+    # interleave as (lower j=1, upper j=1, lower j=2, ...) so ties are
+    # resolved by the smallest index, lower bound first
+    overlap = np.stack([overlap_lower, overlap_upper], axis=1).ravel()
+    vol_score = np.stack([vol_score_lower, vol_score_upper], axis=1).ravel()
+    best = int(np.lexsort((vol_score, overlap))[0])
+    return m + best // 2, best % 2 == 0
 
 
 def print_rstree(root, level = 1, order = 1):
@@ -605,7 +952,8 @@ def create_tree_from_pts(pts_tuples, M=4, m=2, p=1, print_output=True):
     # pt_dict = {k: v for k, v in pts_tuples[0:M-1]}
     # print(pts_tuples)
     pt_dict = {k: (v[0:3], v[3:5]) for k, v in pts_tuples[0:M-1]}
-    print(pt_dict)
+    if debug_enabled():
+        print(pt_dict)
     starting_node = RStarTree(children=[], point_data=pt_dict, is_leaf=True)
     retv = RTCursor(starting_node, M=M, m=m, p=p)
     # print('start: ')
@@ -621,8 +969,252 @@ def create_tree_from_pts(pts_tuples, M=4, m=2, p=1, print_output=True):
 
     retv.root.update_bounding_rectangle()
     # print(print_output)
-    if(print_output):
+    if(print_output and debug_enabled()):
         print('Cấu trúc cây:')
         print_rstree(retv.root)
     return retv
 
+
+
+def hilbert_index(coords, order):
+    """
+    Position of a grid cell along the Hilbert curve
+    ------------------------------------------------
+    Parameters:
+    -----------
+    coords: integer cell coordinates, each in [0, 2**order)
+    order: number of bits per coordinate
+
+    Returns:
+    --------
+    h: the Hilbert key, an integer in [0, 2**(order*d))
+    """
+    X = list(coords)
+    d = len(X)
+    # inverse undo excess work (Skilling's AxesToTranspose)
+    Q = 1 << (order - 1)
+    while Q > 1:
+        P = Q - 1
+        for i in range(d):
+            if X[i] & Q:
+                X[0] ^= P
+            else:
+                t = (X[0] ^ X[i]) & P
+                X[0] ^= t
+                X[i] ^= t
+        Q >>= 1
+    # gray encode
+    for i in range(1, d):
+        X[i] ^= X[i-1]
+    t = 0
+    Q = 1 << (order - 1)
+    while Q > 1:
+        if X[d-1] & Q:
+            t ^= Q - 1
+        Q >>= 1
+    for i in range(d):
+        X[i] ^= t
+    # interleave the transposed bits into a single key
+    h = 0
+    for b in range(order - 1, -1, -1):
+        for i in range(d):
+            h = (h << 1) | ((X[i] >> b) & 1)
+    return h
+
+
+def _pack_groups(entries, M, m):
+    """
+    Cut an ordered list of entries into consecutive groups of M entries.
+    If the last group would hold fewer than m entries, the last two groups
+    share their entries evenly so every node respects the minimum fill.
+    """
+    groups = [entries[i:i+M] for i in range(0, len(entries), M)]
+    if len(groups) > 1 and len(groups[-1]) < m:
+        tail = groups[-2] + groups[-1]
+        half = len(tail) // 2
+        groups[-2:] = [tail[:half], tail[half:]]
+    return groups
+
+
+def _str_tile(entries, center, d, M, m, axis=0):
+    """
+    Sort-Tile-Recursive ordering: sort along axis, cut into slabs and
+    recurse on the next axis inside every slab.
+    Returns the entries grouped into nodes of at most M entries.
+    """
+    entries = sorted(entries, key=lambda e: center(e)[axis])
+    if axis == d - 1:
+        return _pack_groups(entries, M, m)
+
+    node_count = -(-len(entries) // M)
+    slab_count = math.ceil(node_count ** (1.0 / (d - axis)))
+    slab_size = M * (-(-node_count // slab_count))
+
+    slabs = [entries[i:i+slab_size] for i in range(0, len(entries), slab_size)]
+    if len(slabs) > 1 and len(slabs[-1]) < m:
+        # too few entries left for a node of their own
+        slabs[-2:] = [slabs[-2] + slabs[-1]]
+
+    groups = []
+    for slab in slabs:
+        groups.extend(_str_tile(slab, center, d, M, m, axis + 1))
+    return groups
+
+
+def _hilbert_sort(pts_tuples, d, order=16):
+    """
+    Sort point tuples (id, values) along the Hilbert curve of their first d
+    coordinates, scaled to the bounding box of the data.
+    """
+    lower = [min(v[i] for _, v in pts_tuples) for i in range(d)]
+    upper = [max(v[i] for _, v in pts_tuples) for i in range(d)]
+    side = (1 << order) - 1
+
+    def keyfunc(pt):
+        v = pt[1]
+        cell = [int((v[i] - lower[i]) / (upper[i] - lower[i]) * side) if upper[i] > lower[i] else 0
+                for i in range(d)]
+        return hilbert_index(cell, order)
+
+    return sorted(pts_tuples, key=keyfunc)
+
+
+def bulk_load(pts_tuples, M=4, m=2, method="str"):
+    """
+    Build an R*-tree bottom-up from a static set of points
+    -------------------------------------------------------
+    Parameters:
+    -----------
+    pts_tuples: list of (point id, [x, y, z, alpha, beta])
+    M: maximum number of entries per node
+    m: minimum number of entries per node
+    method: "str" for Sort-Tile-Recursive, "hilbert" for Hilbert-sort packing
+
+    Returns:
+    --------
+    rt: the root of a tree whose leaves are filled with M points
+    """
+    d = len(pts_tuples[0][1][0:3])
+
+    if method == "str":
+        leaf_groups = _str_tile(pts_tuples, lambda pt: pt[1], d, M, m)
+    elif method == "hilbert":
+        leaf_groups = _pack_groups(_hilbert_sort(pts_tuples, d), M, m)
+    else:
+        raise ValueError(f"Unknown bulk-load method: {method}")
+
+    level = [RStarTree(children=[], is_leaf=True,
+                       point_data={k: (v[0:3], v[3:5]) for k, v in group})
+             for group in leaf_groups]
+
+    # Build the upper levels until a single root remains
+    while len(level) > 1:
+        if method == "str":
+            node_groups = _str_tile(level, lambda ch: ch.key.center(), d, M, m)
+        else:
+            # children are already ordered along the curve
+            node_groups = _pack_groups(level, M, m)
+        level = [RStarTree(children=group, is_leaf=False) for group in node_groups]
+
+    return level[0]
+
+
+def create_tree_from_pts_bulk(pts_tuples, M=4, m=2, p=1, method="str", print_output=True):
+    """
+    Tạo cây bằng cách nạp hàng loạt (bulk loading) các điểm.
+    Trả về RTCursor giống create_tree_from_pts để có thể tiếp tục chèn điểm.
+    """
+    retv = RTCursor(bulk_load(pts_tuples, M=M, m=m, method=method), M=M, m=m, p=p)
+    if(print_output and debug_enabled()):
+        print('Cấu trúc cây:')
+        print_rstree(retv.root)
+    return retv
+
+
+def window_query(rt, window):
+    """
+    Find the leaves whose rectangle intersects a query window
+    ----------------------------------------------------------
+    Parameters:
+    -----------
+    rt: root of the R*-tree
+    window: query rectangle. bound coordinates are degenerate intervals.
+
+    Returns:
+    --------
+    leaves: the intersecting leaves, in depth-first order
+    visited: number of nodes whose rectangle was tested
+    """
+    leaves = []
+    visited = 0
+    stack = [rt]
+    while stack:
+        node = stack.pop()
+        visited += 1
+        if node.is_null or not node.key.intersects(window):
+            continue
+        if node.is_leaf:
+            leaves.append(node)
+        else:
+            stack.extend(reversed(node.children))
+    return leaves, visited
+
+
+def point_query(rt, point):
+    """
+    Find the indexed points equal to point
+    --------------------------------------
+    Returns:
+    --------
+    matches: list of (point id, (coordinates, extend))
+    visited: number of nodes whose rectangle was tested
+    """
+    leaves, visited = window_query(rt, rct.Rectangle(list(point), list(point)))
+    matches = [(k, v) for leaf in leaves for k, v in leaf.points.items() if list(v[0]) == list(point)]
+    return matches, visited
+
+
+def _bounds_within(minima, maxima, window):
+    return all(window.minima[i] <= minima[i] and maxima[i] <= window.maxima[i] for i in range(window.dimension))
+
+
+def _bounds_intersect(minima, maxima, window):
+    return all(minima[i] <= window.maxima[i] and window.minima[i] <= maxima[i] for i in range(window.dimension))
+
+
+def range_count(rt, window, extend_window=None):
+    """
+    Count the indexed points inside a query window
+    ----------------------------------------------
+    Parameters:
+    -----------
+    rt: root of the R*-tree
+    window: query rectangle. bound coordinates are degenerate intervals.
+    extend_window: optional rectangle over the point_extend (alpha, beta)
+    values the counted points must also fall in
+
+    Returns:
+    --------
+    count: number of points inside window (and extend_window). A node
+    whose subtree lies entirely inside the windows adds its stored count
+    without being descended.
+    visited: number of nodes whose rectangle was tested
+    """
+    count = 0
+    visited = 0
+    stack = [rt]
+    while stack:
+        node = stack.pop()
+        visited += 1
+        if node.is_null or not node.count or not node.key.intersects(window):
+            continue
+        if extend_window is not None and not _bounds_intersect(node.extend_minima, node.extend_maxima, extend_window):
+            continue
+        if window.is_proper_superset(node.key) and (extend_window is None or _bounds_within(node.extend_minima, node.extend_maxima, extend_window)):
+            count += node.count
+        elif node.is_leaf:
+            count += sum(1 for coords, extend in node.points.values()
+                         if window.is_element(coords) and (extend_window is None or extend_window.is_element(extend)))
+        else:
+            stack.extend(reversed(node.children))
+    return count, visited
@@ -1,4 +1,5 @@
 import os
+import contextlib
 import sys
 import pandas as pd
 import matplotlib.pyplot as plt
@@ -9,6 +10,10 @@ import json
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import rstar_tree.rstartree as rstartree
+from rstar_tree.diskrtree import create_disk_tree_from_pts
+from rstar_tree.pagefile import write_page_file
+from mdh.triplestore import TripleStore
+import instrument.instrument as instrument
 import pandas as pd
 import sys
 
@@ -69,11 +74,30 @@ def rstartree_to_dict(rstartree):
             "maxima": rstartree.key.maxima
         } if rstartree.key else None,
         "points": rstartree.points,
-        "kdtree": None,
+        # số điểm của cây con và khoảng (alpha, beta) của chúng, dùng cho truy vấn COUNT
+        "count": rstartree.count,
+        "extend_minima": rstartree.extend_minima,
+        "extend_maxima": rstartree.extend_maxima,
+        "kdtree": getattr(rstartree, "kdtree", None),
         "children": [rstartree_to_dict(child) for child in rstartree.children]
     }
     return tree_dict
 
+# Hàm chuyển dict (đọc từ file JSON) trở lại thành RStarTree, giữ ID cây k-d của các lá
+# để RTCursor.delete/insert biết cây k-d nào cần xây lại (RTCursor.dirty_kdtrees)
+def dict_to_rstartree(tree_dict):
+    # khóa của dict trong JSON là chuỗi, ID điểm được đổi lại thành số nguyên
+    point_data = {int(k): (v[0], v[1]) for k, v in tree_dict["points"].items()}
+    children = [dict_to_rstartree(child) for child in tree_dict["children"]]
+    node = rstartree.RStarTree(children=children, point_data=point_data, is_leaf=tree_dict["is_leaf"])
+    node.kdtree = tree_dict.get("kdtree")
+    return node
+
+# Hàm đọc cây R*-tree đã lưu bởi save_rstar_tree, trả về RTCursor để cập nhật cây
+def load_rstar_tree(file_path, M, m, p):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return rstartree.RTCursor(dict_to_rstartree(json.load(f)), M=M, m=m, p=p)
+
 # Hàm lưu trữ bộ mã hóa vào file (đã chỉnh sửa)
 def save_rstar_tree(tree, file_path):
     # Tạo thư mục nếu nó chưa tồn tại
@@ -83,25 +107,64 @@ def save_rstar_tree(tree, file_path):
        json.dump(tree_dict, f, ensure_ascii=False, indent=4)
     print(f"Cấu trúc r*-tree đã được lưu vào file: {file_path}") 
 
-def run_rstar_tree(data, M, m, p, print_output, number_charts, depth_chart):
+# Hàm lưu cây R*-tree trong bộ nhớ thành file trang nhị phân (rstar_tree/pagefile.py),
+# các trang lá đã là cây k-d nên không cần bước --kdtree
+def save_rstar_tree_pages(tree, file_path, page_size=None):
+    write_page_file(tree, file_path, page_size)
+    print(f"Cấu trúc r*-tree dạng trang đã được lưu vào file: {file_path}")
+
+def run_rstar_tree(data, M, m, p, print_output, number_charts, depth_chart, bulk_load=None, pool_size=None, rstar_format="json"):
     mdh_directory = "storage/mdh/" + data
     i=1
-    for file_name in os.listdir(mdh_directory):
-        if file_name.endswith(".csv"):
-            print("\n\nXÂY DỰNG CẤU TRÚC CHỈ MỤC R*-TREE CHO : " + file_name)
-            rdf_file_path = os.path.join(mdh_directory, file_name)
-            # Load dữ liệu
-            df = pd.read_csv(rdf_file_path, usecols=[1, 2, 3, 4, 5])
-            data3 = [x for x in enumerate(df.values.tolist())]
-            # print(data3)
-            # print(rstartree)
-            rt3cursor = rstartree.create_tree_from_pts(pts_tuples=data3, M=M, m=m, p=p, print_output=print_output)
+    file_names = os.listdir(mdh_directory)
+    for file_name in file_names:
+        # kho bộ ba nhị phân (.tri); tệp CSV chỉ được dùng khi không có kho bộ ba tương ứng
+        if file_name.endswith(".tri") or (file_name.endswith(".csv") and file_name.replace(".csv", ".tri") not in file_names):
+            with instrument.track_file(file_name):
+                print("\n\nXÂY DỰNG CẤU TRÚC CHỈ MỤC R*-TREE CHO : " + file_name)
+                rdf_file_path = os.path.join(mdh_directory, file_name)
+                # Load dữ liệu
+                if file_name.endswith(".tri"):
+                    # các dòng được đọc dần từ memmap khi xây cây (TripleRows), không chuyển cả
+                    # tệp thành danh sách; kho bộ ba được đóng sau khi xây xong
+                    store = TripleStore(rdf_file_path)
+                    data3 = store.rows()
+                else:
+                    store = contextlib.nullcontext()
+                    # round_trip: đọc lại đúng giá trị float đã ghi để khớp với bộ mã hóa khi truy vấn
+                    df = pd.read_csv(rdf_file_path, usecols=[1, 2, 3, 4, 5], float_precision="round_trip")
+                    data3 = [x for x in enumerate(df.values.tolist())]
+                with store:
+                    file_name_no_ext = os.path.splitext(file_name)[0]
+                    # print(data3)
+                    # print(rstartree)
+                    if pool_size:
+                        # Xây cây trên đĩa (storage/rstar_tree_disk/), chỉ giữ tối đa pool_size nút trong bộ nhớ.
+                        # Cây này được truy vấn bằng main.py --query=... --pool_size=N (query/query.py
+                        # run_disk_query); không có file JSON nên không vẽ biểu đồ và không xây cây k-d.
+                        rt3cursor = create_disk_tree_from_pts(data3, f"storage/rstar_tree_disk/{data}/{file_name_no_ext}.rtd", M=M, m=m, p=p, pool_size=pool_size)
+                        pool_stats = rt3cursor.pool.stats()
+                        if print_output and instrument.debug_enabled():
+                            print(pool_stats)
+                        instrument.add_counters(rt3cursor.counters)
+                        instrument.add_counters({key: pool_stats[key] for key in ("hits", "misses", "reads", "writes")})
+                        rt3cursor.close()
+                        i += 1
+                        continue
+                    if bulk_load:
+                        # Nạp hàng loạt (STR hoặc Hilbert) thay vì chèn từng điểm
+                        rt3cursor = rstartree.create_tree_from_pts_bulk(pts_tuples=data3, M=M, m=m, p=p, method=bulk_load, print_output=print_output)
+                    else:
+                        rt3cursor = rstartree.create_tree_from_pts(pts_tuples=data3, M=M, m=m, p=p, print_output=print_output)
             
-            rt_3 = rt3cursor.root
-
-            # Lưu r*tree vào file
-            file_name_no_ext = file_name.replace(".csv", "")
-            save_rstar_tree(rt_3, f"storage/rstar_tree/{data}/{file_name_no_ext}.json")
+                    instrument.add_counters(rt3cursor.counters)
+                    rt_3 = rt3cursor.root
+
+                    # Lưu r*tree vào file JSON (storage/rstar_tree/) và/hoặc file trang (storage/pages/, đọc bởi --paged)
+                    if rstar_format in ("json", "both"):
+                        save_rstar_tree(rt_3, f"storage/rstar_tree/{data}/{file_name_no_ext}.json")
+                    if rstar_format in ("pages", "both"):
+                        save_rstar_tree_pages(rt_3, f"storage/pages/{data}/{file_name_no_ext}.rtp")
 
             if(i <= number_charts):
                 # Thiết lập không gian vẽ với matplotlib
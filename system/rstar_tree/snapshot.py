@@ -0,0 +1,236 @@
+import threading
+import contextlib
+
+import rstar_tree.rstartree as rstartree
+
+# Cây R*-tree trong bộ nhớ với cập nhật copy-on-write: một luồng ghi (insert,
+# insert_many, delete) và nhiều luồng đọc truy vấn song song mà không cần khóa.
+# - mỗi nút mang số phiên bản (version) của lần ghi đã tạo ra nó
+# - sau mỗi lần ghi (hoặc mỗi khối `with cursor.batch():`), gốc mới được công bố
+#   (publish); các nút của những phiên bản đã công bố không bao giờ bị sửa nữa
+# - bên ghi chỉ đến được các nút qua `children` của một nút đang ghi, và mỗi nút
+#   con cũ được sao chép (chỉ nút đó, không sao chép cả cây con) trước khi trả về,
+#   nên phiên bản mới dùng chung mọi cây con không thay đổi với phiên bản cũ
+# - bên đọc lấy ảnh chụp (snapshot) của gốc đã công bố gần nhất; phiên bản cũ được
+#   giải phóng khi không còn ảnh chụp nào giữ nó
+
+# Dãy con của một SnapshotNode đang ghi: nút con cũ được sao chép khi truy cập
+class WritableChildren:
+    def __init__(self, node):
+        self.node = node
+
+    def __len__(self):
+        return len(self.node._children)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.node.writable_child(j) for j in range(len(self))[i]]
+        return self.node.writable_child(int(i))
+
+    def __iter__(self):
+        for j in range(len(self)):
+            yield self.node.writable_child(j)
+
+class SnapshotNode(rstartree.RStarTree):
+    def __init__(self, owner, version, is_leaf, point_data=None, children=None):
+        """
+        A node of a copy-on-write R*-tree
+        ---------------------------------
+        Parameters:
+        -----------
+        owner: the SnapshotRTCursor that owns the node
+        version: the write version that created the node. The node may only
+        be modified while owner.version is still equal to it.
+        point_data: for leaves, dictionary point id -> (coordinates, extend)
+        children: for internal nodes, the child nodes
+        """
+        self.owner = owner
+        self.version = version
+        self.is_leaf = is_leaf
+        self.points = dict(point_data) if (is_leaf and point_data) else {}
+        self._children = list(children) if children else []
+        self.kdtree = None
+        self.is_null = not (self.points or self._children)
+        self.update_bounding_rectangle()
+
+    def copy(self, version):
+        """
+        Shallow copy of the node for the given write version. The children
+        themselves are shared until they are accessed for writing.
+        """
+        node = SnapshotNode.__new__(SnapshotNode)
+        node.__dict__.update(self.__dict__)
+        node.version = version
+        node.points = dict(self.points)
+        node._children = list(self._children)
+        return node
+
+    def writable(self):
+        return self.version == self.owner.version
+
+    def writable_child(self, i):
+        child = self._children[i]
+        if child.version != self.version:
+            child = child.copy(self.version)
+            self._children[i] = child
+            self.owner.counters["nodes_copied"] += 1
+        return child
+
+    @property
+    def children(self):
+        # các nút đã công bố được đọc trực tiếp, không sao chép
+        return WritableChildren(self) if self.writable() else self._children
+
+    def get_child_count(self):
+        return len(self._children)
+
+    def peek_child(self, j):
+        return self._children[j]
+
+    def get_child_rectangles(self):
+        return [child.key for child in self._children]
+
+    def get_child_aggregates(self):
+        return [(child.count, child.extend_minima, child.extend_maxima) for child in self._children]
+
+    def does_point_to_leaves(self):
+        return all(child.is_leaf for child in self._children)
+
+    def add_point_data(self, point_key, point_value, point_extend):
+        self.is_null = False
+        super().add_point_data(point_key, point_value, point_extend)
+
+    def add_points(self, entries):
+        self.is_null = False
+        super().add_points(entries)
+
+    def add_child(self, rt):
+        self._children.append(rt)
+        self.is_null = False
+        self.update_bounding_rectangle()
+
+    def remove_child(self, rt):
+        # so sánh theo đối tượng: các nút anh em có thể có cùng hình chữ nhật
+        j = next(j for j, child in enumerate(self._children) if child is rt)
+        del self._children[j]
+        self.update_bounding_rectangle()
+
+# Ảnh chụp chỉ đọc của một phiên bản đã công bố
+class Snapshot:
+    def __init__(self, version, root):
+        self.version = version
+        self.root = root
+
+    def window_query(self, window):
+        return rstartree.window_query(self.root, window)
+
+    def point_query(self, point):
+        return rstartree.point_query(self.root, point)
+
+class SnapshotRTCursor(rstartree.RTCursor):
+    def __init__(self, rt, M, m, p):
+        """
+        RTCursor whose updates are copy-on-write. Each insert, insert_many or
+        delete (or each `with cursor.batch():` block) publishes a new root;
+        readers take `with cursor.snapshot() as snap:` and query snap without
+        any lock while the single writer keeps updating the tree.
+        """
+        self.version = 0
+        self._lock = threading.Lock()
+        self._published = None
+        # phiên bản -> [gốc, số ảnh chụp đang giữ]
+        self._held = {}
+        self._batch = False
+        super().__init__(self._import(rt), M=M, m=m, p=p)
+        self.counters.update({"nodes_copied": 0, "versions_published": 0, "versions_reclaimed": 0})
+        self.publish()
+
+    def _import(self, rt):
+        if rt.is_leaf:
+            node = SnapshotNode(self, self.version, True, point_data=rt.points)
+        else:
+            node = SnapshotNode(self, self.version, False, children=[self._import(child) for child in rt.children])
+        node.kdtree = getattr(rt, "kdtree", None)
+        return node
+
+    def make_node(self, children=[], point_data={}, is_leaf=None):
+        is_leaf = bool(is_leaf or (is_leaf is None and point_data))
+        return SnapshotNode(self, self.version, is_leaf, point_data=point_data, children=children)
+
+    def publish(self):
+        """
+        Make the current root visible to new snapshots and start a new write
+        version: from now on the published nodes are never modified.
+        """
+        with self._lock:
+            self._published = (self.version, self.root)
+            self.version += 1
+            self.counters["versions_published"] += 1
+        self.root = self.root.copy(self.version)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Group several writes into a single published version.
+        """
+        self._batch = True
+        try:
+            yield self
+        finally:
+            self._batch = False
+            self.publish()
+
+    def _written(self):
+        if not self._batch:
+            self.publish()
+
+    def insert(self, point_data, point_extend):
+        super().insert(point_data, point_extend)
+        self._written()
+
+    def insert_many(self, pts_tuples):
+        super().insert_many(pts_tuples)
+        self._written()
+
+    def delete(self, point_id, coords):
+        deleted = super().delete(point_id, coords)
+        self._written()
+        return deleted
+
+    @contextlib.contextmanager
+    def snapshot(self):
+        """
+        Read-only view of the latest published version, valid inside the
+        with block. The version is reclaimed when its last snapshot is
+        released and a newer version has been published.
+        """
+        with self._lock:
+            version, root = self._published
+            self._held.setdefault(version, [root, 0])[1] += 1
+        snap = Snapshot(version, root)
+        try:
+            yield snap
+        finally:
+            snap.root = None
+            with self._lock:
+                held = self._held[version]
+                held[1] -= 1
+                if held[1] == 0:
+                    del self._held[version]
+                    if version != self._published[0]:
+                        self.counters["versions_reclaimed"] += 1
+
+    def live_versions(self):
+        """
+        Versions still reachable: the latest published one and the ones held
+        by snapshots.
+        """
+        with self._lock:
+            return sorted(set(self._held) | {self._published[0]})
+
+# Tạo cây copy-on-write từ các điểm, giống create_tree_from_pts
+def create_snapshot_tree_from_pts(pts_tuples, M=4, m=2, p=1):
+    pt_dict = {k: (v[0:3], v[3:5]) for k, v in pts_tuples[0:M-1]}
+    cursor = SnapshotRTCursor(rstartree.RStarTree(children=[], point_data=pt_dict, is_leaf=True), M=M, m=m, p=p)
+    cursor.insert_many(pts_tuples[M-1:])
+    return cursor
@@ -0,0 +1,57 @@
+import os
+import sys
+import random
+
+# Thêm đường dẫn để nhập các module cần thiết
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rstar_tree.rectangle as rct
+from rstar_tree.diskrtree import create_disk_tree_from_pts, open_disk_tree
+
+def random_points(n, seed=0):
+    rng = random.Random(seed)
+    return [(i, [rng.random(), rng.choice([0.1, 0.2, 0.3]), rng.random(), float(rng.randint(0, 9)), float(rng.randint(0, 5))])
+            for i in range(n)]
+
+# Các id điểm trong cây trên đĩa, đọc qua window_query trên toàn bộ không gian
+def stored_ids(cursor):
+    leaves, _ = cursor.window_query(rct.Rectangle([0.0] * 3, [1.0] * 3))
+    return [point_id for leaf in leaves for point_id in leaf.points]
+
+def test_create_disk_tree_more_than_M_points(tmp_path):
+    pts = random_points(500)
+    cursor = create_disk_tree_from_pts(pts, str(tmp_path / "tree.rtd"), M=4, m=2, p=1, pool_size=8)
+    ids = stored_ids(cursor)
+    cursor.close()
+    assert sorted(ids) == list(range(500))
+
+def test_disk_tree_insert_many_and_reopen(tmp_path):
+    pts = random_points(3000, seed=1)
+    file_path = str(tmp_path / "tree.rtd")
+    cursor = create_disk_tree_from_pts(pts[:10], file_path, M=4, m=2, p=1, pool_size=8)
+    # insert_many chia nút tràn thành nhiều nhóm, kể cả khi các con là PagedNode
+    cursor.insert_many(pts[10:])
+    cursor.close()
+
+    cursor = open_disk_tree(file_path, pool_size=8)
+    assert sorted(stored_ids(cursor)) == list(range(3000))
+    for point_id, values in pts[::97]:
+        leaves, _ = cursor.window_query(rct.Rectangle(values[0:3], values[0:3]))
+        assert any(point_id in leaf.points for leaf in leaves)
+    cursor.close()
+
+def test_run_disk_matches_scan(tmp_path):
+    from query.query import run_disk
+    pts = random_points(600, seed=2)
+    file_path = str(tmp_path / "tree.rtd")
+    create_disk_tree_from_pts(pts, file_path, M=6, m=2, p=2, pool_size=8).close()
+
+    cursor = open_disk_tree(file_path, pool_size=8)
+    for y in (0.1, 0.2, 0.3):
+        box = ([0.2, y, 0.0], [0.7, y, 1.0])
+        expected = {tuple(values) for _, values in pts
+                    if all(box[0][i] <= values[i] <= box[1][i] for i in range(3))}
+        tupleset, _ = run_disk(cursor, box)
+        assert tupleset == expected
+    assert run_disk(cursor, None) == (set(), 0)
+    cursor.close()
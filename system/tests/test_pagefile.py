@@ -0,0 +1,31 @@
+import os
+import sys
+import json
+import random
+
+# Thêm đường dẫn để nhập các module cần thiết
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rstar_tree.rstartree as rstartree
+from rstar_tree.rtvis_3d import rstartree_to_dict
+from rstar_tree.pagefile import write_page_file, PagedRStarTree
+from query.query import run_paged
+
+def test_pages_from_memory_match_json_and_scan(tmp_path):
+    rng = random.Random(3)
+    pts = [(i, [rng.random(), rng.choice([0.1, 0.2, 0.3]), rng.random(), float(rng.randint(0, 9)), float(rng.randint(0, 5))])
+           for i in range(700)]
+    cursor = rstartree.create_tree_from_pts(pts, M=6, m=2, p=2, print_output=False)
+
+    # file trang ghi trực tiếp từ cây trong bộ nhớ giống hệt file chuyển từ JSON
+    write_page_file(cursor.root, str(tmp_path / "memory.rtp"))
+    write_page_file(json.loads(json.dumps(rstartree_to_dict(cursor.root))), str(tmp_path / "json.rtp"))
+    assert (tmp_path / "memory.rtp").read_bytes() == (tmp_path / "json.rtp").read_bytes()
+
+    with PagedRStarTree(str(tmp_path / "memory.rtp")) as paged_tree:
+        for y in (0.1, 0.2, 0.3):
+            box = ([0.2, y, 0.0], [0.7, y, 1.0])
+            expected = {tuple(values) for _, values in pts
+                        if all(box[0][i] <= values[i] <= box[1][i] for i in range(3))}
+            tupleset, _ = run_paged(paged_tree, box)
+            assert tupleset == expected
@@ -0,0 +1,81 @@
+import os
+import sys
+import random
+
+# Thêm đường dẫn để nhập các module cần thiết
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rstar_tree.rstartree as rstartree
+
+# Các id điểm ở các lá, theo thứ tự duyệt
+def leaf_ids(node):
+    if node.is_leaf:
+        return list(node.points)
+    return [point_id for child in node.children for point_id in leaf_ids(child)]
+
+def test_delete_with_duplicate_points():
+    # một nửa số điểm trùng tọa độ: nhiều lá anh em có cùng hình chữ nhật
+    rng = random.Random(5)
+    pts = [(i, ([0.5, 0.5, 0.5] if i % 2 else [rng.random() for _ in range(3)]) + [1.0, 2.0]) for i in range(400)]
+    cursor = rstartree.create_tree_from_pts(pts, M=4, m=2, p=1, print_output=False)
+    deleted = set()
+    for point_id, values in pts[1:19:2] + pts[0:40:4]:
+        assert cursor.delete(point_id, values[0:3])
+        deleted.add(point_id)
+
+    ids = leaf_ids(cursor.root)
+    assert len(ids) == len(set(ids))
+    assert set(ids) == set(range(400)) - deleted
+    for point_id, values in pts:
+        assert (cursor.find_leaf(point_id, values[0:3]) is not None) == (point_id not in deleted)
+
+def random_point(rng):
+    return [rng.random(), rng.choice([0.1, 0.2, 0.3]), rng.random(), float(rng.randint(0, 9)), float(rng.randint(0, 5))]
+
+# So sánh range_count (có và không có khoảng alpha, beta) và count_phase trên cây đã lưu
+# với phép quét toàn bộ các điểm còn lại, trên các hộp ngẫu nhiên và các hộp có y cố định
+def assert_counts_match_scan(cursor, points, rng):
+    import json
+    import rstar_tree.rectangle as rct
+    from rstar_tree.rtvis_3d import rstartree_to_dict
+    from query.query import count_phase
+
+    tree_dict = json.loads(json.dumps(rstartree_to_dict(cursor.root)))
+    inside = lambda values, lower, upper: all(lower[i] <= values[i] <= upper[i] for i in range(len(lower)))
+    for k in range(40):
+        lower = [rng.random() * 0.6, 0.1, rng.random() * 0.6]
+        upper = [lower[0] + rng.random() * 0.4, rng.choice([0.1, 0.2, 0.3]), lower[2] + rng.random() * 0.4]
+        if k % 2:
+            lower[1] = upper[1]
+        window = rct.Rectangle(lower, upper)
+        extend_lower = [float(rng.randint(0, 5)), float(rng.randint(0, 2))]
+        extend_window = rct.Rectangle(extend_lower, [extend_lower[0] + rng.randint(0, 4), extend_lower[1] + rng.randint(0, 3)])
+
+        expected = sum(1 for values in points.values() if inside(values, lower, upper))
+        assert rstartree.range_count(cursor.root, window)[0] == expected
+        assert count_phase(tree_dict, (lower, upper))[0] == expected
+        expected_extend = sum(1 for values in points.values()
+                              if inside(values, lower, upper) and inside(values[3:5], extend_window.minima, extend_window.maxima))
+        assert rstartree.range_count(cursor.root, window, extend_window)[0] == expected_extend
+
+    # cây nằm trọn trong hộp: số điểm được lấy từ gốc mà không duyệt xuống
+    everything = rct.Rectangle([0.0] * 3, [1.0] * 3)
+    assert rstartree.range_count(cursor.root, everything) == (len(points), 1)
+    assert count_phase(tree_dict, ([0.0] * 3, [1.0] * 3)) == (len(points), 1)
+
+def test_counts_match_scan_after_insert_insert_many_and_delete():
+    rng = random.Random(11)
+    pts = [(i, random_point(rng)) for i in range(600)]
+    cursor = rstartree.create_tree_from_pts(pts, M=6, m=2, p=2, print_output=False)
+    points = dict(pts)
+    assert_counts_match_scan(cursor, points, rng)
+
+    batch = [(i, random_point(rng)) for i in range(600, 1500)]
+    cursor.insert_many(batch)
+    points.update(batch)
+    assert_counts_match_scan(cursor, points, rng)
+
+    # xóa gộp các nút thiếu và chèn lại các phần tử của chúng
+    for point_id in rng.sample(sorted(points), 500):
+        assert cursor.delete(point_id, points.pop(point_id)[0:3])
+    assert_counts_match_scan(cursor, points, rng)
@@ -0,0 +1,39 @@
+import os
+import sys
+import random
+
+# Thêm đường dẫn để nhập các module cần thiết
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import rstar_tree.rectangle as rct
+from rstar_tree.snapshot import create_snapshot_tree_from_pts
+
+def random_points(n, seed=0):
+    rng = random.Random(seed)
+    return [(i, [rng.random() for _ in range(3)] + [1.0, 2.0]) for i in range(n)]
+
+def snapshot_ids(snap):
+    leaves, _ = snap.window_query(rct.Rectangle([0.0] * 3, [1.0] * 3))
+    return sorted(point_id for leaf in leaves for point_id in leaf.points)
+
+def test_snapshot_is_isolated_from_writes():
+    pts = random_points(3000)
+    cursor = create_snapshot_tree_from_pts(pts[:2000], M=8, m=3, p=2)
+    with cursor.snapshot() as snap:
+        cursor.insert_many(pts[2000:])
+        for point_id, values in pts[:500]:
+            assert cursor.delete(point_id, values[0:3])
+        assert snapshot_ids(snap) == list(range(2000))
+    with cursor.snapshot() as snap:
+        assert snapshot_ids(snap) == list(range(500, 3000))
+
+def test_delete_copies_only_the_modified_path():
+    pts = random_points(4000, seed=1)
+    cursor = create_snapshot_tree_from_pts(pts, M=8, m=3, p=2)
+    for point_id, values in pts[:200:2]:
+        copied = cursor.counters["nodes_copied"]
+        dissolved = cursor.counters["dissolved_nodes"]
+        assert cursor.delete(point_id, values[0:3])
+        if cursor.counters["dissolved_nodes"] == dissolved:
+            # chỉ các nút trên đường từ gốc đến lá chứa điểm được sao chép
+            assert cursor.counters["nodes_copied"] - copied <= cursor.height()
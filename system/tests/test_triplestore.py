@@ -0,0 +1,26 @@
+import os
+import sys
+
+import numpy as np
+
+# Thêm đường dẫn để nhập các module cần thiết
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import mdh.triplestore as triplestore
+from mdh.triplestore import TripleStore, write_triple_store
+
+def test_rows_match_points(tmp_path, monkeypatch):
+    # khối nhỏ để việc duyệt đi qua nhiều khối
+    monkeypatch.setattr(triplestore, "CHUNK_ROWS", 7)
+    rng = np.random.default_rng(0)
+    points = np.column_stack([rng.random((50, 3)), rng.integers(0, 9, (50, 2))])
+    file_path = write_triple_store(points, str(tmp_path / "t_triples_data.tri"))
+    with TripleStore(file_path) as store:
+        expected = list(enumerate(store.points().tolist()))
+        rows = store.rows()
+        assert len(rows) == 50
+        assert list(rows) == expected
+        assert rows[3] == expected[3] and rows[-1] == expected[-1]
+        assert list(rows[10:23]) == expected[10:23]
+        assert list(rows[10:23][2:]) == expected[12:23]
+        assert rows[::10] == expected[::10]